@@ -11,6 +11,7 @@ import app.services.chat_service as chat_service
 from app.utils.auth import get_current_user, AuthData
 from typing import List
 from fastapi import UploadFile, Form    
+from fastapi.responses import StreamingResponse
 
 chat_router = APIRouter()
 
@@ -88,6 +89,21 @@ async def send_user_message(
     return {"success": True, "message": "Message sent successfully", "data": result}
 
 
+@chat_router.post("/{chat_id}/user/message/stream")
+async def stream_user_message(
+    chat_id: str,
+    message: SendUserMessageRequest,
+    auth_data: AuthData = Depends(get_current_user),
+):
+    """Send a message and stream the answer as Server-Sent Events."""
+    events = await chat_service.stream_user_message(chat_id, auth_data.user_id, message)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @chat_router.put("/{chat_id}/user/message/{message_id}")
 async def update_user_message(
     chat_id: str,
@@ -116,7 +132,8 @@ async def upload_user_file(category_id: str = Form(...),
     return {
         "message": "File uploaded successfully",
         "success": True,
-        "data": result
+        "data": result["files"],
+        "rejected": result["rejected"]
     }
 
 # @chat_router.post("/upload")
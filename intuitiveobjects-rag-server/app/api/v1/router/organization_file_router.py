@@ -49,7 +49,8 @@ async def upload_google_drive_file(
     return {
         "message": "File uploaded successfully", 
         "success": True, 
-        "data": result
+        "data": result["files"],
+        "rejected": result["rejected"]
     }
 
 
@@ -71,5 +72,6 @@ async def upload_local_drive_file(
     return {
         "message": "File uploaded successfully",
         "success": True,
-        "data": result
+        "data": result["files"],
+        "rejected": result["rejected"]
     }
\ No newline at end of file
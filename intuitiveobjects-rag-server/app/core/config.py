@@ -41,6 +41,10 @@ class Settings(BaseModel):
     # File Configuration
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", "10485760"))
     MAX_FILES_PER_FOLDER: int = int(os.getenv("MAX_FILES_PER_FOLDER", "20"))
+    # Bytes held in memory at a time when piping files between Drive, GridFS and disk
+    STREAM_CHUNK_SIZE: int = int(os.getenv("STREAM_CHUNK_SIZE", str(1024 * 1024)))
+    # Files of one upload request processed at the same time
+    UPLOAD_CONCURRENCY: int = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
     ALLOWED_FILE_EXTENSIONS: List[str] = [".pdf"]
     
     # GOOGLE DRIVE SETTINGS
@@ -51,9 +55,80 @@ class Settings(BaseModel):
 
     GOOGLE_DRIVE_FILE_UPLOAD_QUEUE: str = os.getenv("GOOGLE_DRIVE_FILE_UPLOAD_QUEUE")
     MD_FILE_CONVERSION_QUEUE: str= os.getenv("MD_FILE_CONVERSION_QUEUE")
-    NOTIFY_QUEUE: str = os.getenv("NOTIFY_QUEUE")
+    # Broadcast to every API process; each delivers to its own sockets
+    NOTIFY_EXCHANGE: str = os.getenv("NOTIFY_EXCHANGE", "document_notify_fanout")
+    # Document events for the same doc within this window are merged into one emit
+    NOTIFY_COALESCE_WINDOW_MS: int = int(os.getenv("NOTIFY_COALESCE_WINDOW_MS", "250"))
     SPLITED_PDF_FOLDER_PATH: str = os.getenv("SPLITED_PDF_FOLDER_PATH", "splited_pdf_pages")
     MD_FILE_FOLDER_PATH: str = os.getenv("MD_FILE_FOLDER_PATH", "output_md_files")
+    # Concurrent jobs per ingestion worker process (RabbitMQ prefetch follows these)
+    RAW_WORKER_SLOTS: int = int(os.getenv("RAW_WORKER_SLOTS", "8"))
+    MD_WORKER_SLOTS: int = int(os.getenv("MD_WORKER_SLOTS", "2"))
+    DOCUMENT_WORKER_SLOTS: int = int(os.getenv("DOCUMENT_WORKER_SLOTS", "1"))
+    # Processes converting PDF pages to Markdown in parallel (each loads its own Docling models)
+    MD_CONVERSION_WORKERS: int = int(os.getenv("MD_CONVERSION_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+    # Page classifier thresholds: a page exceeding any of them is converted with Docling
+    PAGE_MAX_BLOCKS: int = int(os.getenv("PAGE_MAX_BLOCKS", "25"))
+    PAGE_MAX_WIDE_BLOCKS: int = int(os.getenv("PAGE_MAX_WIDE_BLOCKS", "5"))
+    PAGE_MIN_TEXT_CHARS: int = int(os.getenv("PAGE_MIN_TEXT_CHARS", "1"))
+    PAGE_MAX_IMAGE_AREA_RATIO: float = float(os.getenv("PAGE_MAX_IMAGE_AREA_RATIO", "0"))
+    PAGE_MAX_VECTOR_LINES: int = int(os.getenv("PAGE_MAX_VECTOR_LINES", "200"))
+
+    # Docling PDF pipeline
+    DOCLING_DO_OCR: bool = os.getenv("DOCLING_DO_OCR", "true").lower() == "true"
+    DOCLING_DO_TABLE_STRUCTURE: bool = os.getenv("DOCLING_DO_TABLE_STRUCTURE", "true").lower() == "true"
+    DOCLING_TABLE_MODE: str = os.getenv("DOCLING_TABLE_MODE", "accurate")  # 'accurate' or 'fast'
+    DOCLING_NUM_THREADS: int = int(os.getenv("DOCLING_NUM_THREADS", "4"))
+    DOCLING_DEVICE: str = os.getenv("DOCLING_DEVICE", "auto")  # 'auto', 'cpu', 'cuda' or 'mps'
+    # Warm converters kept by workers that convert whole documents in-process
+    DOCLING_POOL_SIZE: int = int(os.getenv("DOCLING_POOL_SIZE", "1"))
+
+    # Document embeddings: texts per forward pass, torch threads (0 = torch default),
+    # backend "torch" or "onnx" (CPU; EMBEDDING_ONNX_FILE picks e.g. a quantized model file)
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    EMBEDDING_TORCH_THREADS: int = int(os.getenv("EMBEDDING_TORCH_THREADS", "0"))
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch")
+    EMBEDDING_ONNX_FILE: str = os.getenv("EMBEDDING_ONNX_FILE", "")
+    # Stored vectors were not normalized; changing this requires re-indexing
+    EMBEDDING_NORMALIZE: bool = os.getenv("EMBEDDING_NORMALIZE", "false").lower() == "true"
+
+    # RAG pipeline concurrency (per process)
+    RETRIEVAL_CONCURRENCY: int = int(os.getenv("RETRIEVAL_CONCURRENCY", "4"))
+    RERANK_CONCURRENCY: int = int(os.getenv("RERANK_CONCURRENCY", "2"))
+    GENERATION_CONCURRENCY: int = int(os.getenv("GENERATION_CONCURRENCY", "4"))
+    # Concurrent per-page LLM calls while extracting section metadata during indexing
+    METADATA_CONCURRENCY: int = int(os.getenv("METADATA_CONCURRENCY", "4"))
+    METADATA_MODEL: str = os.getenv("METADATA_MODEL", "gemma2:2b")
+    # File-level tag extraction: characters per LLM window and windows sampled per file
+    TAG_WINDOW_CHARS: int = int(os.getenv("TAG_WINDOW_CHARS", "8000"))
+    TAG_MAX_WINDOWS: int = int(os.getenv("TAG_MAX_WINDOWS", "6"))
+    # Send every page to the LLM for a summary; otherwise only pages without Markdown headings
+    METADATA_LLM_SUMMARIES: bool = os.getenv("METADATA_LLM_SUMMARIES", "false").lower() == "true"
+    # Pairs per cross-encoder forward pass when reranking retrieved chunks
+    RERANK_BATCH_SIZE: int = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+
+    # Query embedding / rerank score caches (entries per cache, seconds to live)
+    QUERY_EMBEDDING_CACHE_SIZE: int = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+    RERANK_SCORE_CACHE_SIZE: int = int(os.getenv("RERANK_SCORE_CACHE_SIZE", "50000"))
+    MODEL_CACHE_TTL: float = float(os.getenv("MODEL_CACHE_TTL", "3600"))
+
+    # Semantic answer cache (per organization / category / ACL scope)
+    ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+    ANSWER_CACHE_SIZE: int = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+    ANSWER_CACHE_TTL: float = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+
+    # User profile / category name / org app config resolution cache
+    USER_CONTEXT_CACHE_SIZE: int = int(os.getenv("USER_CONTEXT_CACHE_SIZE", "10000"))
+    USER_CONTEXT_CACHE_TTL: float = float(os.getenv("USER_CONTEXT_CACHE_TTL", "300"))
+    # Content-hash cache of converted pages, page metadata and chunk embeddings (Mongo)
+    PAGE_CACHE_ENABLED: bool = os.getenv("PAGE_CACHE_ENABLED", "true").lower() == "true"
+    PAGE_CACHE_MAX_BYTES: int = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    # Writes between size checks; eviction removes least recently used entries
+    PAGE_CACHE_EVICT_EVERY: int = int(os.getenv("PAGE_CACHE_EVICT_EVERY", "200"))
+
+    # Seconds between checks of the BM25 store for documents indexed by other processes
+    BM25_SYNC_INTERVAL: float = float(os.getenv("BM25_SYNC_INTERVAL", "5"))
     
 
     class Config:
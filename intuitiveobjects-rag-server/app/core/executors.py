@@ -0,0 +1,68 @@
+import asyncio
+import functools
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Max in-flight work per pipeline stage, per process
+STAGE_LIMITS: Dict[str, int] = {
+    "retrieval": settings.RETRIEVAL_CONCURRENCY,
+    "rerank": settings.RERANK_CONCURRENCY,
+    "generation": settings.GENERATION_CONCURRENCY,
+    "metadata": settings.METADATA_CONCURRENCY,
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+# Semaphores bind to the loop that first waits on them, so each event loop gets its own set
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _stage_limit(stage: str) -> int:
+    if stage not in STAGE_LIMITS:
+        raise ValueError(f"Unknown pipeline stage: {stage}")
+    return max(1, STAGE_LIMITS[stage])
+
+
+def get_stage_executor(stage: str) -> ThreadPoolExecutor:
+    """Bounded thread pool for blocking (CPU / disk) work of a stage."""
+    executor = _executors.get(stage)
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=_stage_limit(stage), thread_name_prefix=f"rag-{stage}"
+        )
+        _executors[stage] = executor
+    return executor
+
+
+async def run_in_stage(stage: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking call on the stage's executor without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_stage_executor(stage), functools.partial(func, *args, **kwargs)
+    )
+
+
+@asynccontextmanager
+async def stage_slot(stage: str):
+    """Concurrency slot for async (non-blocking) work of a stage, e.g. LLM calls."""
+    loop_semaphores = _semaphores.setdefault(asyncio.get_running_loop(), {})
+    semaphore = loop_semaphores.get(stage)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(_stage_limit(stage))
+        loop_semaphores[stage] = semaphore
+    async with semaphore:
+        yield
+
+
+def shutdown_executors():
+    for stage, executor in _executors.items():
+        executor.shutdown(wait=False, cancel_futures=True)
+        logger.info(f"Stopped {stage} executor")
+    _executors.clear()
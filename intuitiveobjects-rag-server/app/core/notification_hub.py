@@ -0,0 +1,119 @@
+import json
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Optional, Set
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from app.core.config import settings
+from app.core.rabbitmq_client import rabbitmq_client
+from app.db.mongodb import document_collection
+from app.serializers.organization_file_serializers import OrganizationFileEntity
+
+logger = logging.getLogger(__name__)
+
+
+async def publish_notification(event: Dict):
+    """
+    Broadcast a notification event to every API process.
+    document_notify events may carry the serialized record under "document".
+    """
+    await rabbitmq_client.publish_fanout(settings.NOTIFY_EXCHANGE, json.dumps(event))
+
+
+def user_room(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+class NotificationHub:
+    """
+    Delivers document events to the sockets of this API process.
+
+    Events for users with no socket here are dropped before any DB work. Events for the
+    same doc_id within the coalescing window collapse into the latest one. Each flush
+    reads the documents that arrived without a payload in a single query, then emits
+    once per document to the user's room.
+    """
+
+    def __init__(self, sio, window_ms: Optional[int] = None):
+        self.sio = sio
+        self.window = (window_ms if window_ms is not None else settings.NOTIFY_COALESCE_WINDOW_MS) / 1000
+        self.connected_clients: Dict[str, Set[str]] = defaultdict(set)
+        # user_id -> doc_id -> serialized document, or None when it must be read
+        self._pending: Dict[str, Dict[str, Optional[Dict]]] = defaultdict(dict)
+        self._flush_task: Optional[asyncio.Task] = None
+        self.received = 0
+        self.skipped_offline = 0
+        self.coalesced = 0
+        self.emitted = 0
+        self.db_reads = 0
+
+    def is_online(self, user_id: Optional[str]) -> bool:
+        return bool(user_id) and bool(self.connected_clients.get(user_id))
+
+    async def add_client(self, user_id: str, sid: str):
+        self.connected_clients[user_id].add(sid)
+        await self.sio.enter_room(sid, user_room(user_id))
+
+    def remove_client(self, sid: str) -> Optional[str]:
+        for user_id, sids in self.connected_clients.items():
+            if sid in sids:
+                sids.remove(sid)
+                if not sids:
+                    del self.connected_clients[user_id]
+                return user_id
+        return None
+
+    def document_event(self, user_id: Optional[str], doc_id: str, document: Optional[Dict] = None):
+        self.received += 1
+        if not self.is_online(user_id):
+            self.skipped_offline += 1
+            return
+
+        pending = self._pending[user_id]
+        if doc_id in pending:
+            self.coalesced += 1
+            # A payload-less event must not throw away a payload we already have
+            document = document or pending[doc_id]
+        pending[doc_id] = document
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Notification flush failed: {e}")
+
+    async def flush(self):
+        pending, self._pending = self._pending, defaultdict(dict)
+        # Users may have disconnected while their events waited
+        pending = {user_id: docs for user_id, docs in pending.items() if self.is_online(user_id)}
+
+        missing = [doc_id for docs in pending.values() for doc_id, doc in docs.items() if doc is None]
+        loaded = {}
+        if missing:
+            self.db_reads += 1
+            cursor = document_collection().find({"_id": {"$in": [ObjectId(doc_id) for doc_id in set(missing)]}})
+            async for file in cursor:
+                loaded[str(file["_id"])] = jsonable_encoder(OrganizationFileEntity(file))
+
+        for user_id, docs in pending.items():
+            for doc_id, document in docs.items():
+                document = document or loaded.get(doc_id)
+                if document is None:
+                    continue
+                await self.sio.emit("document_notify", document, room=user_room(user_id))
+                self.emitted += 1
+
+    def stats(self) -> Dict:
+        return {
+            "connected_users": len(self.connected_clients),
+            "received": self.received,
+            "skipped_offline": self.skipped_offline,
+            "coalesced": self.coalesced,
+            "emitted": self.emitted,
+            "db_reads": self.db_reads,
+        }
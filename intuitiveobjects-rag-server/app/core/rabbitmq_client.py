@@ -19,6 +19,7 @@ class AsyncRabbitMQClient:
         self.password = password
         self.connection: aio_pika.RobustConnection | None = None
         self.channel: aio_pika.abc.AbstractChannel | None = None
+        self._exchanges = {}
 
     async def connect(self):
         try:
@@ -30,6 +31,7 @@ class AsyncRabbitMQClient:
                 heartbeat=120,  # default is 60
             )
             self.channel = await self.connection.channel()
+            self._exchanges = {}
             print(f"✅ Connected to RabbitMQ at {self.host}:{self.port}")
         except Exception as e:
             print(f"❌ Failed to connect to RabbitMQ: {e}")
@@ -60,6 +62,36 @@ class AsyncRabbitMQClient:
         await queue_obj.consume(callback, no_ack=False)
         print(f"🎧 Consuming messages from queue: {queue}")
 
+    async def _fanout_exchange(self, exchange: str):
+        if exchange not in self._exchanges:
+            self._exchanges[exchange] = await self.channel.declare_exchange(
+                exchange, aio_pika.ExchangeType.FANOUT, durable=True
+            )
+        return self._exchanges[exchange]
+
+    async def publish_fanout(self, exchange: str, message: str):
+        """Publish to every queue bound to a fanout exchange (one per consuming process)."""
+        if not self.channel:
+            raise RuntimeError("Channel is not initialized. Call `connect()` first.")
+
+        exchange_obj = await self._fanout_exchange(exchange)
+        await exchange_obj.publish(aio_pika.Message(body=message.encode()), routing_key="")
+
+    async def consume_fanout(
+        self,
+        exchange: str,
+        callback: Callable[[aio_pika.IncomingMessage], Awaitable[None]],
+    ):
+        """Consume a fanout exchange through a private queue that lives as long as this process."""
+        if not self.channel:
+            raise RuntimeError("Channel is not initialized. Call `connect()` first.")
+
+        exchange_obj = await self._fanout_exchange(exchange)
+        queue_obj = await self.channel.declare_queue(exclusive=True, auto_delete=True)
+        await queue_obj.bind(exchange_obj)
+        await queue_obj.consume(callback, no_ack=False)
+        print(f"🎧 Consuming broadcasts from exchange: {exchange}")
+
     async def close(self):
         if self.channel:
             await self.channel.close()
@@ -0,0 +1,66 @@
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable
+import aio_pika
+from app.core.rabbitmq_client import rabbitmq_client
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerRuntime:
+    """
+    Consume one queue with a fixed number of concurrent job slots.
+
+    Prefetch equals the slot count, so RabbitMQ never hands this process more
+    jobs than it can run at once. Handlers must keep blocking work off the event
+    loop (executors / process pools) so heartbeats and the other slots keep running.
+    """
+
+    def __init__(self, queue: str, handler: Callable[[aio_pika.IncomingMessage], Awaitable[None]], slots: int):
+        self.queue = queue
+        self.handler = handler
+        self.slots = max(1, slots)
+        self._semaphore = asyncio.Semaphore(self.slots)
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def _run_job(self, message: aio_pika.IncomingMessage):
+        async with self._semaphore:
+            self.active += 1
+            start = time.perf_counter()
+            succeeded = False
+            try:
+                await self.handler(message)
+                succeeded = True
+                self.completed += 1
+            except Exception as e:
+                # Handlers ack their own messages; anything escaping is a bug, don't lose the job silently
+                self.failed += 1
+                logger.error(f"Unhandled error in {self.queue} job: {e}")
+            finally:
+                # An unsettled delivery would hold one prefetch slot until the process restarts
+                if not message.processed:
+                    try:
+                        if succeeded:
+                            logger.warning(f"{self.queue} handler returned without acking; acking")
+                            await message.ack()
+                        else:
+                            await message.nack(requeue=False)
+                    except Exception as e:
+                        logger.error(f"Failed to settle {self.queue} message: {e}")
+                self.active -= 1
+                logger.info(
+                    f"{self.queue} job finished in {time.perf_counter() - start:.1f}s "
+                    f"(active={self.active}/{self.slots}, completed={self.completed}, failed={self.failed})"
+                )
+
+    async def start(self):
+        await rabbitmq_client.channel.set_qos(prefetch_count=self.slots)
+        await rabbitmq_client.consume_message(self.queue, self._run_job)
+        print(f"🧵 {self.queue}: {self.slots} concurrent job slots")
+
+    async def run_forever(self):
+        await self.start()
+        await asyncio.Future()
@@ -117,10 +117,24 @@ def google_auth_collection():
     """Get google auth collection"""
     return get_collection("google_auth")
 
+
+def page_cache_collection():
+    """Get the page cache collection (converted pages, page metadata, embeddings)"""
+    return get_collection("page_cache")
+
 def get_fs():
     """Get the GridFS bucket."""
     return Database.fs
 
 def get_client():
     """Get the database client"""
-    return Database.client
\ No newline at end of file
+    return Database.client
+
+async def ensure_indexes():
+    """Create the indexes hot queries rely on; safe to call on every startup."""
+    # Upload dedup looks documents up by content hash within an organization
+    await document_collection().create_index(
+        [("organization_id", 1), ("hash_key", 1)], name="organization_hash_key"
+    )
+    # Page cache eviction drops the least recently used entries first
+    await page_cache_collection().create_index([("last_used_at", 1)], name="last_used_at")
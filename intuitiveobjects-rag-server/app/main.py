@@ -1,7 +1,7 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from app.db.mongodb import connect_to_mongodb, close_mongodb_connection
+from app.db.mongodb import connect_to_mongodb, close_mongodb_connection, ensure_indexes
 from app.api.v1.routes import router as v1_router
 from app.api.v2.routes import router as v2_router
 from app.core.exception_handlers import (
@@ -10,46 +10,25 @@ from app.core.exception_handlers import (
 )
 from contextlib import asynccontextmanager
 from app.core.rabbitmq_client import rabbitmq_client
+from app.core.notification_hub import NotificationHub, user_room
 import socketio
-from collections import defaultdict
 from app.core.config import settings
 import aio_pika
 import json
-from app.serializers.organization_file_serializers import OrganizationFileEntity
 from app.utils.auth import get_current_user
-from app.db.mongodb import organization_file_collection,document_collection, close_mongodb_connection
-from bson import ObjectId
-from fastapi.encoders import jsonable_encoder
+from app.db.mongodb import organization_file_collection, close_mongodb_connection
 from fastapi.responses import HTMLResponse
 import markdown
 import os
+from app.utils import pages_wise_metadata
 from app.utils.pages_wise_metadata import main
+from app.core.executors import shutdown_executors
+from app.utils.cache import cache_stats
 
 
 
-connected_clients = defaultdict(set)
-
 sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
-
-async def document_notify(user_id: str, data: dict):
-    """
-    Notify connected clients about a document-related event.
-    """
-    doc_id = data.get("doc_id")
-
-    file = await document_collection().find_one({"_id": ObjectId(doc_id)})
-
-    if not file:
-        # Optionally log or handle the missing file case
-        return
-
-    organization_file = OrganizationFileEntity(file)
-    
-    if not user_id or user_id not in connected_clients:
-        return
-
-    for sid in connected_clients[user_id]:
-        await sio.emit("document_notify", jsonable_encoder(organization_file), to=sid)
+notification_hub = NotificationHub(sio)
 
 
 async def on_message(message: aio_pika.IncomingMessage):    
@@ -59,32 +38,29 @@ async def on_message(message: aio_pika.IncomingMessage):
     # get user_id from the message data
     user_id = data.get("user_id")
     
-    print(f"User ID: {user_id}")
-    
-    if not user_id:
-        await message.ack()
-        
     match data.get("event_type"):
         case "document_notify":
-            await document_notify(user_id, data)
+            # Offline users are dropped and bursts coalesced before any DB read
+            notification_hub.document_event(user_id, data.get("doc_id"), data.get("document"))
         case _:
-            return "Something else"
-        
-    for sid in connected_clients[user_id]:
-        await sio.emit("message", data, to=sid)
+            if notification_hub.is_online(user_id):
+                await sio.emit("message", data, room=user_room(user_id))
     await message.ack()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await connect_to_mongodb()
+    await ensure_indexes()
     await rabbitmq_client.connect()
-    await rabbitmq_client.consume_message(settings.NOTIFY_QUEUE, on_message)
+    # Every API process gets every event and serves its own sockets
+    await rabbitmq_client.consume_fanout(settings.NOTIFY_EXCHANGE, on_message)
     
     # Initialize pages-wise metadata
     await main()
 
     yield
+    shutdown_executors()
     await close_mongodb_connection()
 
 app = FastAPI(
@@ -125,6 +101,21 @@ async def root():
     return {"message": "Welcome to Demo API with MongoDB"}
 
 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return {"caches": cache_stats()}
+
+
+@app.get("/embeddings/stats")
+async def get_embedding_stats():
+    return pages_wise_metadata.processor.embedding_model.embeddings.stats()
+
+
+@app.get("/notifications/stats")
+async def get_notification_stats():
+    return notification_hub.stats()
+
+
 @sio.event
 async def connect(sid, environ, auth):
     print(f"Client connected: {sid} and auth: {auth}")
@@ -134,7 +125,7 @@ async def connect(sid, environ, auth):
             raise HTTPException(status_code=401, detail="Unauthorized")
         auth_data = get_current_user(token)
         print(f"Client connected: {sid} with user_id: {auth_data.user_id}")
-        connected_clients[auth_data.user_id].add(sid)
+        await notification_hub.add_client(auth_data.user_id, sid)
     except Exception as e:
         print(f"Error connecting client: {e}")
         await sio.emit("error", "Unauthorized")
@@ -143,11 +134,9 @@ async def connect(sid, environ, auth):
 
 @sio.event
 async def disconnect(sid):
-    for user_id, sids in connected_clients.items():
-        if sid in sids:
-            sids.remove(sid)
-            print(f"Client disconnected: {sid} for user_id: {user_id}")
-            break
+    user_id = notification_hub.remove_client(sid)
+    if user_id:
+        print(f"Client disconnected: {sid} for user_id: {user_id}")
     print(f"Client disconnected: {sid}")
 
 OUTPUT_MD_DIR = "output_md_files"
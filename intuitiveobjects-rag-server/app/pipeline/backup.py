@@ -18,7 +18,7 @@ from langchain.chains import RetrievalQA
 from datetime import datetime
 from bson import ObjectId
 from app.db.mongodb import document_collection,organization_file_collection, connect_to_mongodb
-from app.core.rabbitmq_client import rabbitmq_client
+from app.core.notification_hub import publish_notification
 import json
 from app.core.config import settings
 from app.services.organization_admin_services import get_updated_app_config,get_organization_app_configs
@@ -127,14 +127,11 @@ class PDFProcessor:
                         "format": "markdown",
                         "tables": tables,
                     }
-                    await rabbitmq_client.send_message(
-                        settings.NOTIFY_QUEUE,
-                        json.dumps({
-                            "event_type": "document_notify",
-                            "doc_id": doc_id,
-                            "user_id": user_id,
-                        })
-                    )
+                    await publish_notification({
+                        "event_type": "document_notify",
+                        "doc_id": doc_id,
+                        "user_id": user_id,
+                    })
 
                     subfolder_pages.append(page_data)
                     yield page_data
@@ -650,14 +647,11 @@ class PDFProcessor:
                     }
                 }
             )
-            await rabbitmq_client.send_message(
-                settings.NOTIFY_QUEUE,
-                json.dumps({
-                    "event_type": "document_notify",
-                    "doc_id": doc_id,
-                    "user_id": user_id,
-                })
-            )   
+            await publish_notification({
+                "event_type": "document_notify",
+                "doc_id": doc_id,
+                "user_id": user_id,
+            })
              # Fetch document to get organization_id
             doc_result = await document_collection().find_one({"_id": ObjectId(doc_id)})
             if not doc_result:
@@ -754,14 +748,11 @@ class PDFProcessor:
                 }
             )
             
-            await rabbitmq_client.send_message(
-                settings.NOTIFY_QUEUE,
-                json.dumps({
-                    "event_type": "document_notify",
-                    "doc_id": doc_id,
-                    "user_id": user_id,
-                })
-            )
+            await publish_notification({
+                "event_type": "document_notify",
+                "doc_id": doc_id,
+                "user_id": user_id,
+            })
             
             # Update indexed files set
             self.indexed_files.add(folder_path)
@@ -0,0 +1,105 @@
+"""
+Compare the in-process PyMuPDF table detector with tabula on a folder of PDFs.
+
+    python -m app.pipeline.benchmark_table_detection <fixtures_dir> [--labels labels.json]
+
+labels.json (optional) maps a PDF file name to the 1-based page numbers that
+really contain tables, e.g. {"report.pdf": [2, 5]}. With labels, both detectors
+are scored against them; without, tabula's decision is used as the reference.
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import statistics
+from pathlib import Path
+import fitz
+from app.pipeline.table_detection import detect_tables
+
+
+def _tabula_has_table(page_pdf: bytes) -> bool:
+    import tabula
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        tmp.write(page_pdf)
+        tmp.flush()
+        try:
+            return bool(tabula.read_pdf(tmp.name, pages=1, multiple_tables=True))
+        except Exception:
+            return False
+
+
+def _score(decisions, reference):
+    tp = sum(1 for d, r in zip(decisions, reference) if d and r)
+    fp = sum(1 for d, r in zip(decisions, reference) if d and not r)
+    fn = sum(1 for d, r in zip(decisions, reference) if not d and r)
+    tn = len(decisions) - tp - fp - fn
+    return {
+        "accuracy": round((tp + tn) / len(decisions), 4) if decisions else 0.0,
+        "precision": round(tp / (tp + fp), 4) if tp + fp else 0.0,
+        "recall": round(tp / (tp + fn), 4) if tp + fn else 0.0,
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+    }
+
+
+def _latency(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    return {
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+        "total_s": round(sum(ordered), 2),
+    }
+
+
+def run_benchmark(fixtures_dir: str, labels_path: str = None) -> dict:
+    labels = {}
+    if labels_path:
+        with open(labels_path) as f:
+            labels = {name: set(pages) for name, pages in json.load(f).items()}
+
+    pymupdf_decisions, tabula_decisions, truth = [], [], []
+    pymupdf_times, tabula_times = [], []
+
+    for pdf_path in sorted(Path(fixtures_dir).glob("*.pdf")):
+        with fitz.open(pdf_path) as pdf_doc:
+            for page_index in range(len(pdf_doc)):
+                with fitz.open() as page_doc:
+                    page_doc.insert_pdf(pdf_doc, from_page=page_index, to_page=page_index)
+                    page_pdf = page_doc.tobytes()
+
+                start = time.perf_counter()
+                pymupdf_decisions.append(detect_tables(pdf_doc[page_index])["has_table"])
+                pymupdf_times.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                tabula_decisions.append(_tabula_has_table(page_pdf))
+                tabula_times.append(time.perf_counter() - start)
+
+                truth.append(page_index + 1 in labels.get(pdf_path.name, set()))
+
+    reference = truth if labels else tabula_decisions
+    report = {
+        "pages": len(pymupdf_decisions),
+        "reference": "labels" if labels else "tabula",
+        "pymupdf": {**_score(pymupdf_decisions, reference), **_latency(pymupdf_times)},
+        "tabula": {**_score(tabula_decisions, reference), **_latency(tabula_times)},
+    }
+    if pymupdf_times and tabula_times:
+        report["speedup"] = round(sum(tabula_times) / max(sum(pymupdf_times), 1e-9), 1)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark PyMuPDF table detection against tabula")
+    parser.add_argument("fixtures_dir", help="Folder of PDF files")
+    parser.add_argument("--labels", help="JSON file mapping PDF name to pages that contain tables")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.fixtures_dir):
+        sys.exit(f"Not a directory: {args.fixtures_dir}")
+    print(json.dumps(run_benchmark(args.fixtures_dir, args.labels), indent=2))
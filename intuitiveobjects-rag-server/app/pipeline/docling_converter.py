@@ -0,0 +1,142 @@
+import io
+import time
+import queue
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def build_pipeline_options(num_threads: Optional[int] = None):
+    """PDF pipeline options from settings (OCR, table structure mode, accelerator threads/device)."""
+    from docling.datamodel.pipeline_options import (
+        PdfPipelineOptions,
+        TableFormerMode,
+        AcceleratorOptions,
+        AcceleratorDevice,
+    )
+
+    options = PdfPipelineOptions()
+    options.do_ocr = settings.DOCLING_DO_OCR
+    options.do_table_structure = settings.DOCLING_DO_TABLE_STRUCTURE
+    options.table_structure_options.mode = (
+        TableFormerMode.FAST if settings.DOCLING_TABLE_MODE == "fast" else TableFormerMode.ACCURATE
+    )
+    options.accelerator_options = AcceleratorOptions(
+        num_threads=num_threads or settings.DOCLING_NUM_THREADS,
+        device=AcceleratorDevice(settings.DOCLING_DEVICE),
+    )
+    return options
+
+
+def create_converter(num_threads: Optional[int] = None):
+    """
+    Build a DocumentConverter and load its PDF models up front.
+    Returns (converter, model_load_ms).
+    """
+    from docling.datamodel.base_models import InputFormat
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+
+    start = time.perf_counter()
+    converter = DocumentConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(pipeline_options=build_pipeline_options(num_threads)),
+        }
+    )
+    converter.initialize_pipeline(InputFormat.PDF)
+    model_load_ms = round((time.perf_counter() - start) * 1000, 1)
+    logger.info(f"Docling converter ready, models loaded in {model_load_ms} ms")
+    return converter, model_load_ms
+
+
+def health_check_pdf() -> bytes:
+    """A one-page PDF with a line of text, used to check a converter end to end."""
+    import fitz
+
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), "health check")
+        return doc.tobytes()
+
+
+class DoclingConverterPool:
+    """
+    Fixed set of warm converters shared by the jobs of one worker process.
+
+    Converters are created once (at worker startup via warm_up) and checked out
+    for one conversion at a time; conversions run on threads so the event loop
+    and RabbitMQ heartbeats stay responsive.
+    """
+
+    def __init__(self, size: Optional[int] = None):
+        self.size = max(1, size or settings.DOCLING_POOL_SIZE)
+        self._idle: "queue.Queue" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.model_load_ms = []
+        self.conversions = 0
+        self.conversion_ms = 0.0
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            converter, load_ms = create_converter()
+            self.model_load_ms.append(load_ms)
+            return converter
+        return self._idle.get()
+
+    def convert_sync(self, source):
+        converter = self._checkout()
+        try:
+            start = time.perf_counter()
+            result = converter.convert(source)
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.conversions += 1
+                self.conversion_ms += elapsed
+            return result
+        finally:
+            self._idle.put(converter)
+
+    async def convert(self, source):
+        """Convert a path or DocumentStream on a worker thread with a pooled converter."""
+        return await asyncio.to_thread(self.convert_sync, source)
+
+    async def warm_up(self):
+        """Create and initialize every converter now instead of on the first job."""
+        await asyncio.gather(*(asyncio.to_thread(self._warm_one) for _ in range(self.size)))
+        logger.info(f"Docling converter pool warmed: {self.stats()}")
+
+    def _warm_one(self):
+        self._idle.put(self._checkout())
+
+    async def health_check(self) -> Dict:
+        from docling.datamodel.base_models import DocumentStream
+
+        start = time.perf_counter()
+        try:
+            source = DocumentStream(name="health_check.pdf", stream=io.BytesIO(health_check_pdf()))
+            result = await self.convert(source)
+            ok = "health check" in result.document.export_to_markdown()
+            error = None if ok else "unexpected conversion output"
+        except Exception as e:
+            ok, error = False, str(e)
+        return {"ok": ok, "latency_ms": round((time.perf_counter() - start) * 1000, 1), "error": error}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "converters": self._created,
+                "model_load_ms": list(self.model_load_ms),
+                "conversions": self.conversions,
+                "avg_conversion_ms": round(self.conversion_ms / self.conversions, 1) if self.conversions else 0.0,
+            }
@@ -0,0 +1,128 @@
+import time
+import logging
+import threading
+from typing import Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+from app.core.config import settings
+from app.utils.page_cache import content_hash
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingEngine(Embeddings):
+    """
+    SentenceTransformer embeddings with explicit batching and throughput metrics.
+
+    Texts are sorted by length before batching so each batch pads to similar lengths,
+    and results are returned in input order. The backend is torch (CPU or CUDA) or
+    ONNX Runtime, optionally with a quantized model file, for CPU-only nodes.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_folder: Optional[str] = None,
+        device: str = "cpu",
+        batch_size: Optional[int] = None,
+        torch_threads: Optional[int] = None,
+        backend: Optional[str] = None,
+        normalize: Optional[bool] = None,
+    ):
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = max(1, batch_size or settings.EMBEDDING_BATCH_SIZE)
+        self.normalize = settings.EMBEDDING_NORMALIZE if normalize is None else normalize
+        self.torch_threads = torch_threads if torch_threads is not None else settings.EMBEDDING_TORCH_THREADS
+        self.backend = backend or settings.EMBEDDING_BACKEND
+        self._lock = threading.Lock()
+        self.texts = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self.last_rate = 0.0
+        self.model = self._load(cache_folder)
+
+    def _load(self, cache_folder: Optional[str]):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if self.torch_threads:
+            # Process-wide; also applies to other torch models in this process
+            torch.set_num_threads(self.torch_threads)
+
+        if self.backend == "onnx":
+            model_kwargs = {"file_name": settings.EMBEDDING_ONNX_FILE} if settings.EMBEDDING_ONNX_FILE else None
+            try:
+                return SentenceTransformer(
+                    self.model_name, cache_folder=cache_folder, device="cpu",
+                    backend="onnx", model_kwargs=model_kwargs,
+                )
+            except Exception as e:
+                # ONNX export needs optimum[onnxruntime]; keep indexing working without it
+                logger.warning(f"ONNX embedding backend unavailable, using torch: {e}")
+                self.backend = "torch"
+
+        return SentenceTransformer(self.model_name, cache_folder=cache_folder, device=self.device)
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        start = time.perf_counter()
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        batches = 0
+        for offset in range(0, len(order), self.batch_size):
+            batch = order[offset:offset + self.batch_size]
+            encoded = self.model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                normalize_embeddings=self.normalize,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+            )
+            for i, vector in zip(batch, encoded):
+                vectors[i] = vector.tolist()
+            batches += 1
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.texts += len(texts)
+            self.batches += batches
+            self.seconds += elapsed
+            self.last_rate = len(texts) / elapsed if elapsed else 0.0
+        if len(texts) > 1:
+            logger.info(
+                f"Embedded {len(texts)} texts in {batches} batches, {elapsed:.2f}s "
+                f"({self.last_rate:.1f} texts/s, {self.backend}/{self.device})"
+            )
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+    def cache_model(self) -> str:
+        """Cache namespace for document vectors; changes whenever settings that shape the vectors change."""
+        options = (
+            self.model_name,
+            self.backend,
+            settings.EMBEDDING_ONNX_FILE if self.backend == "onnx" else "",
+            self.normalize,
+        )
+        return "embeddings:" + content_hash(repr(options))[:16]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "backend": self.backend,
+                "device": self.device,
+                "batch_size": self.batch_size,
+                "normalize": self.normalize,
+                "texts": self.texts,
+                "batches": self.batches,
+                "seconds": round(self.seconds, 2),
+                "texts_per_second": round(self.texts / self.seconds, 1) if self.seconds else 0.0,
+                "last_texts_per_second": round(self.last_rate, 1),
+            }
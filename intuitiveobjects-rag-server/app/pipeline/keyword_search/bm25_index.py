@@ -0,0 +1,328 @@
+import os
+import math
+import time
+import heapq
+import pickle
+import logging
+import threading
+import numpy as np
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+from nltk.tokenize import word_tokenize
+
+logger = logging.getLogger(__name__)
+
+BM25_STORE = "app/pipeline/bm25_store"
+BM25_FILE_PREFIX = "bm25_index_"
+BM25_FILE_SUFFIX = ".pkl"
+
+
+def default_tokenizer(text: str) -> List[str]:
+    # Same tokenization PDFProcessor.build_bm25 uses when fitting per-document models
+    return word_tokenize(text.lower())
+
+
+class _Partition:
+    """
+    Postings for one (category, source_type) slice of the corpus.
+
+    Chunks are addressed by their position in `entries`; per-chunk lengths and
+    owners live in arrays aligned with it so scoring and ACL filtering are
+    vector operations over chunk indices.
+    """
+
+    def __init__(self):
+        self.doc_ids = set()
+        self.entries: List[Dict] = []
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.lengths = np.zeros(0, dtype=np.float64)
+        self.owners = np.zeros(0, dtype=object)
+        self.dirty = True
+
+    def rebuild(self, docs: Dict[str, List[Dict]], key: Tuple[str, str]):
+        entries = []
+        postings = defaultdict(lambda: ([], []))
+        for doc_id in sorted(self.doc_ids):
+            for entry in docs.get(doc_id, []):
+                if (entry["category"], entry["source_type"]) != key:
+                    continue
+                idx = len(entries)
+                entries.append(entry)
+                for term, tf in entry["tf"].items():
+                    indices, tfs = postings[term]
+                    indices.append(idx)
+                    tfs.append(tf)
+        self.entries = entries
+        self.postings = {
+            term: (np.asarray(indices, dtype=np.int64), np.asarray(tfs, dtype=np.float64))
+            for term, (indices, tfs) in postings.items()
+        }
+        self.lengths = np.asarray([entry["length"] for entry in entries], dtype=np.float64)
+        self.owners = np.asarray([entry["user_id"] for entry in entries], dtype=object)
+        self.dirty = False
+
+    def allowed_mask(self, private: bool, user_id: str) -> Optional[np.ndarray]:
+        """None when every chunk is visible, else a boolean mask of visible chunks."""
+        if not private:
+            return None
+        return self.owners == user_id
+
+
+class BM25Index:
+    """
+    Resident inverted BM25 index over the chunks of every indexed document.
+
+    Chunks are partitioned by (category, source_type) so a query only walks the
+    postings of the user's category, while document frequencies and average
+    chunk length are corpus-wide, which keeps scores comparable across documents.
+    The per-document pickles in BM25_STORE remain the persistent source of truth;
+    the index is loaded from them once and then updated incrementally.
+    """
+
+    def __init__(self, tokenizer: Callable[[str], List[str]] = default_tokenizer, k1: float = 1.5, b: float = 0.75):
+        self.tokenizer = tokenizer
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._docs: Dict[str, List[Dict]] = {}
+        self._partitions: Dict[Tuple[str, str], _Partition] = {}
+        self._doc_freq: Counter = Counter()
+        self._total_chunks = 0
+        self._total_length = 0
+        self._file_mtimes: Dict[str, float] = {}
+        self._last_sync = 0.0
+        # Held for a whole disk sync, so only one caller ever reloads pickles
+        self._sync_lock = threading.Lock()
+
+    # ------------------------------------------------------------------ updates
+
+    def add_document(self, doc_id: str, corpus: List[Dict], term_freqs: Optional[List[Dict[str, int]]] = None):
+        """Add (or replace) one document's BM25 chunks."""
+        entries = []
+        for i, chunk in enumerate(corpus):
+            tf = term_freqs[i] if term_freqs is not None else Counter(self.tokenizer(chunk["text"]))
+            entries.append({
+                "text": chunk["text"],
+                "category": str(chunk.get("category", "unknown")).strip().lower(),
+                "user_id": str(chunk.get("user_id", "unknown")).strip().lower(),
+                "source_type": str(chunk.get("source_type", "unknown")).strip().lower(),
+                "source": chunk.get("source", "unknown"),
+                "tf": dict(tf),
+                "length": sum(tf.values()),
+            })
+
+        with self._lock:
+            self._remove_locked(doc_id)
+            self._docs[doc_id] = entries
+            for entry in entries:
+                self._doc_freq.update(entry["tf"].keys())
+                self._total_chunks += 1
+                self._total_length += entry["length"]
+                key = (entry["category"], entry["source_type"])
+                partition = self._partitions.setdefault(key, _Partition())
+                partition.doc_ids.add(doc_id)
+                partition.dirty = True
+
+    def remove_document(self, doc_id: str):
+        with self._lock:
+            self._remove_locked(doc_id)
+            self._file_mtimes.pop(doc_id, None)
+
+    def _remove_locked(self, doc_id: str):
+        entries = self._docs.pop(doc_id, None)
+        if not entries:
+            return
+        for entry in entries:
+            self._doc_freq.subtract(entry["tf"].keys())
+            self._total_chunks -= 1
+            self._total_length -= entry["length"]
+            key = (entry["category"], entry["source_type"])
+            partition = self._partitions.get(key)
+            if partition:
+                partition.doc_ids.discard(doc_id)
+                partition.dirty = True
+                if not partition.doc_ids:
+                    del self._partitions[key]
+        self._doc_freq += Counter()  # drop terms whose count fell to zero
+
+    def clear(self):
+        with self._lock:
+            self._docs.clear()
+            self._partitions.clear()
+            self._doc_freq = Counter()
+            self._total_chunks = 0
+            self._total_length = 0
+            self._file_mtimes.clear()
+
+    def mark_persisted(self, doc_id: str, file_path: str):
+        """Record the on-disk pickle of a document added in-process, so sync does not reload it."""
+        try:
+            with self._lock:
+                self._file_mtimes[doc_id] = os.path.getmtime(file_path)
+        except OSError:
+            pass
+
+    # ------------------------------------------------------------- persistence
+
+    def sync_from_disk(self, store_dir: str = BM25_STORE):
+        """Load new or changed per-document pickles and drop documents whose pickle is gone."""
+        with self._sync_lock:
+            self._sync(store_dir)
+
+    def _sync(self, store_dir: str):
+        self._last_sync = time.monotonic()
+        if not os.path.isdir(store_dir):
+            self.clear()
+            return
+
+        on_disk = {}
+        for filename in os.listdir(store_dir):
+            if filename.startswith(BM25_FILE_PREFIX) and filename.endswith(BM25_FILE_SUFFIX):
+                doc_id = filename[len(BM25_FILE_PREFIX):-len(BM25_FILE_SUFFIX)]
+                on_disk[doc_id] = os.path.join(store_dir, filename)
+
+        with self._lock:
+            removed = [doc_id for doc_id in self._docs if doc_id not in on_disk]
+            for doc_id in removed:
+                self.remove_document(doc_id)
+
+        loaded = 0
+        for doc_id, file_path in on_disk.items():
+            try:
+                mtime = os.path.getmtime(file_path)
+                if self._file_mtimes.get(doc_id) == mtime:
+                    continue
+                with open(file_path, "rb") as f:
+                    data = pickle.load(f)
+                corpus = data["corpus"]
+                self.add_document(doc_id, corpus, term_freqs=self._pickled_term_freqs(data, corpus))
+                with self._lock:
+                    self._file_mtimes[doc_id] = mtime
+                loaded += 1
+            except Exception as e:
+                logger.error(f"Failed to load BM25 index {file_path}: {e}")
+
+        if loaded or removed:
+            logger.info(
+                f"BM25 index synced: +{loaded} / -{len(removed)} documents, "
+                f"{self._total_chunks} chunks in {len(self._partitions)} partitions"
+            )
+
+    def maybe_sync(self, store_dir: str = BM25_STORE, interval: float = 5.0):
+        """
+        Sync from disk at most once per interval (picks up documents indexed by workers).
+        The reload runs in a background thread and only one runs at a time; queries keep
+        using the current partitions meanwhile instead of paying for the load.
+        """
+        if time.monotonic() - self._last_sync < interval:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        # Claim this interval before the thread starts so concurrent callers return early
+        self._last_sync = time.monotonic()
+        try:
+            threading.Thread(target=self._background_sync, args=(store_dir,), name="bm25-sync", daemon=True).start()
+        except Exception:
+            self._sync_lock.release()
+            raise
+
+    def _background_sync(self, store_dir: str):
+        try:
+            self._sync(store_dir)
+        except Exception as e:
+            logger.error(f"BM25 index sync failed: {e}")
+        finally:
+            self._sync_lock.release()
+
+    @staticmethod
+    def _pickled_term_freqs(data: Dict, corpus: List[Dict]) -> Optional[List[Dict[str, int]]]:
+        # BM25Okapi keeps per-chunk term frequencies; reuse them instead of re-tokenizing
+        doc_freqs = getattr(data.get("bm25"), "doc_freqs", None)
+        if doc_freqs is not None and len(doc_freqs) == len(corpus):
+            return doc_freqs
+        return None
+
+    # ------------------------------------------------------------------- query
+
+    def search(self, query_tokens: List[str], category: str, user_id: Optional[str] = None, top_n: int = 10) -> List[Dict]:
+        """
+        Score the chunks of one category against the query and return the global top_n.
+        PRIVATE_DRIVE chunks are only returned to their owner. Ties are broken by
+        partition and chunk position, so equal scores always come back in the same order.
+        """
+        category = (category or "").strip().lower()
+        user_id = (user_id or "").strip().lower()
+        query_terms = Counter(q.lower() for q in query_tokens)
+
+        with self._lock:
+            if not self._total_chunks or not query_terms or top_n <= 0:
+                return []
+            avgdl = self._total_length / self._total_chunks
+            idf = {term: self._idf(term) for term in query_terms}
+
+            candidates = []
+            for key in sorted(self._partitions):
+                partition = self._partitions[key]
+                if key[0] != category or not partition.doc_ids:
+                    continue
+                if partition.dirty:
+                    partition.rebuild(self._docs, key)
+                if not partition.entries:
+                    continue
+
+                scores = np.zeros(len(partition.entries), dtype=np.float64)
+                norms = self.k1 * (1 - self.b + self.b * partition.lengths / avgdl)
+                for term, count in query_terms.items():
+                    posting = partition.postings.get(term)
+                    if posting is None:
+                        continue
+                    indices, tfs = posting
+                    scores[indices] += count * idf[term] * tfs * (self.k1 + 1) / (tfs + norms[indices])
+
+                matched = scores > 0
+                mask = partition.allowed_mask(key[1] == "private_drive", user_id)
+                if mask is not None:
+                    matched &= mask
+                hit_indices = np.flatnonzero(matched)
+                if not len(hit_indices):
+                    continue
+                # Keep at most top_n per partition before the global merge; select by
+                # (score desc, position) so ties at the cut are kept deterministically
+                if len(hit_indices) > top_n:
+                    hit_indices = hit_indices[np.lexsort((hit_indices, -scores[hit_indices]))[:top_n]]
+                candidates.extend(
+                    (float(scores[idx]), key, int(idx), partition.entries[idx]) for idx in hit_indices
+                )
+
+        best = heapq.nsmallest(top_n, candidates, key=lambda c: (-c[0], c[1], c[2]))
+        return [
+            {
+                "text": entry["text"],
+                "score": score,
+                "metadata": {
+                    "category": entry["category"],
+                    "source": entry["source"],
+                    "user_id": entry["user_id"],
+                    "source_type": entry["source_type"],
+                },
+            }
+            for score, _key, _idx, entry in best
+        ]
+
+    def _idf(self, term: str) -> float:
+        df = self._doc_freq.get(term, 0)
+        # Non-negative BM25 idf so very common terms never push scores below zero
+        return math.log(1 + (self._total_chunks - df + 0.5) / (df + 0.5))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "documents": len(self._docs),
+                "chunks": self._total_chunks,
+                "terms": len(self._doc_freq),
+                "partitions": {f"{c}/{s}": len(p.doc_ids) for (c, s), p in self._partitions.items()},
+            }
+
+
+# Process-wide index shared by ingestion and query paths
+bm25_index = BM25Index()
@@ -0,0 +1,98 @@
+from typing import Dict, List, Optional
+import fitz
+from app.core.config import settings
+from app.pipeline.table_detection import detect_tables
+
+ROUTE_DOCLING = "docling"
+ROUTE_PYMUPDF = "pymupdf"
+
+
+def default_thresholds() -> Dict:
+    return {
+        "max_blocks": settings.PAGE_MAX_BLOCKS,
+        "max_wide_blocks": settings.PAGE_MAX_WIDE_BLOCKS,
+        "min_text_chars": settings.PAGE_MIN_TEXT_CHARS,
+        "max_image_area_ratio": settings.PAGE_MAX_IMAGE_AREA_RATIO,
+        "max_vector_lines": settings.PAGE_MAX_VECTOR_LINES,
+    }
+
+
+def extract_page_features(page: fitz.Page) -> Dict:
+    """Compute every routing feature of a page in one pass over its content."""
+    page_area = max(page.rect.width * page.rect.height, 1.0)
+    text = page.get_text("text").strip()
+    blocks = page.get_text("blocks") or []
+
+    image_area = 0.0
+    images = page.get_images(full=True)
+    for image in images:
+        for rect in page.get_image_rects(image[0]):
+            image_area += rect.width * rect.height
+
+    vector_lines = 0
+    for drawing in page.get_drawings():
+        vector_lines += sum(1 for item in drawing["items"] if item[0] in ("l", "re"))
+
+    # Table detection is the most expensive feature; skip it when no ruling lines exist
+    tables = detect_tables(page) if vector_lines else {"has_table": False, "bboxes": []}
+
+    image_area_ratio = min(image_area / page_area, 1.0)
+    return {
+        "text_chars": len(text),
+        "text_density": round(len(text) / page_area, 5),
+        "block_count": len(blocks),
+        "wide_blocks": sum(1 for b in blocks if b[2] - b[0] > 250 and b[3] - b[1] < 80),
+        "image_count": len(images),
+        "image_area_ratio": round(image_area_ratio, 4),
+        "vector_lines": vector_lines,
+        "table_count": len(tables["bboxes"]),
+        "table_bboxes": tables["bboxes"],
+        # No extractable text, but the page is painted: a scan that needs OCR
+        "needs_ocr": not text and (bool(images) or vector_lines > 0),
+    }
+
+
+def classify_page(features: Dict, thresholds: Optional[Dict] = None) -> Dict:
+    """
+    Pick the cheapest converter that handles the page.
+    Returns {"route": "docling" | "pymupdf", "reasons": [...]}; reasons lists every
+    feature that ruled out pymupdf4llm.
+    """
+    thresholds = thresholds or default_thresholds()
+    reasons: List[str] = []
+
+    if features["needs_ocr"]:
+        reasons.append("ocr")
+    elif features["text_chars"] < thresholds["min_text_chars"]:
+        reasons.append("no_text")
+    if features["table_count"]:
+        reasons.append("table")
+    if features["image_count"] and features["image_area_ratio"] > thresholds["max_image_area_ratio"]:
+        reasons.append("images")
+    if features["block_count"] > thresholds["max_blocks"]:
+        reasons.append("dense_blocks")
+    if features["wide_blocks"] > thresholds["max_wide_blocks"]:
+        reasons.append("row_layout")
+    if features["vector_lines"] > thresholds["max_vector_lines"]:
+        reasons.append("vector_graphics")
+
+    return {"route": ROUTE_DOCLING if reasons else ROUTE_PYMUPDF, "reasons": reasons}
+
+
+def summarize_routing(results: List[Dict]) -> Dict:
+    """Aggregate per-page conversion results into per-route page counts and timings."""
+    routes: Dict[str, Dict] = {}
+    reasons: Dict[str, int] = {}
+    for result in results:
+        route = result.get("route") or "failed"
+        stats = routes.setdefault(route, {"pages": 0, "total_ms": 0.0})
+        stats["pages"] += 1
+        stats["total_ms"] += result.get("convert_ms", 0.0)
+        for reason in result.get("reasons", []):
+            reasons[reason] = reasons.get(reason, 0) + 1
+
+    for stats in routes.values():
+        stats["total_ms"] = round(stats["total_ms"], 1)
+        stats["avg_ms"] = round(stats["total_ms"] / stats["pages"], 1) if stats["pages"] else 0.0
+
+    return {"pages": len(results), "routes": routes, "reasons": reasons}
@@ -0,0 +1,253 @@
+import os
+import io
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, Union
+import fitz
+import pymupdf4llm
+from app.core.config import settings
+from app.pipeline.page_classifier import extract_page_features, classify_page, default_thresholds, ROUTE_DOCLING
+from app.pipeline.docling_converter import create_converter, health_check_pdf
+from app.utils.page_cache import PAGE_MARKDOWN, content_hash
+
+ROUTE_CACHE = "cache"
+
+logger = logging.getLogger(__name__)
+
+# Set in each pool process by _init_worker, so Docling models load once per process
+_converter = None
+_model_load_ms = None
+_torch_threads = None
+
+
+def _init_worker(torch_threads: int):
+    os.environ["TORCH_CPP_LOG_LEVEL"] = "ERROR"
+    os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
+    logging.getLogger("docling").setLevel(logging.WARNING)
+
+    import torch
+    # Split the cores between pool processes instead of every process using all of them
+    torch.set_num_threads(torch_threads)
+
+    global _torch_threads
+    _torch_threads = torch_threads
+    _get_converter()
+
+
+def _get_converter():
+    global _converter, _model_load_ms
+    if _converter is None:
+        _converter, _model_load_ms = create_converter(num_threads=_torch_threads)
+    return _converter
+
+
+def _worker_info() -> Dict:
+    _get_converter()
+    return {"pid": os.getpid(), "model_load_ms": _model_load_ms}
+
+
+def _health_check() -> Dict:
+    start = time.perf_counter()
+    try:
+        markdown = _docling_markdown(0, health_check_pdf())
+        ok = "health check" in markdown
+        error = None if ok else "unexpected conversion output"
+    except Exception as e:
+        ok, error = False, str(e)
+    return {"pid": os.getpid(), "ok": ok, "latency_ms": round((time.perf_counter() - start) * 1000, 1), "error": error}
+
+
+def iter_page_pdfs(pdf_source: Union[bytes, str, os.PathLike]) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yield (page_number, single-page PDF bytes) for every page, 1-based.
+    pdf_source is PDF bytes or a file path; a path is read lazily by PyMuPDF, so
+    only the page being split is held in memory.
+    """
+    if isinstance(pdf_source, bytes):
+        opened = fitz.open(stream=pdf_source, filetype="pdf")
+    else:
+        opened = fitz.open(pdf_source, filetype="pdf")
+    with opened as pdf_doc:
+        for page_index in range(len(pdf_doc)):
+            with fitz.open() as page_doc:
+                page_doc.insert_pdf(pdf_doc, from_page=page_index, to_page=page_index)
+                page_pdf = page_doc.tobytes()
+            yield page_index + 1, page_pdf
+
+
+def _docling_markdown(page_number: int, page_pdf: bytes) -> str:
+    from docling.datamodel.base_models import DocumentStream
+
+    source = DocumentStream(name=f"page_{page_number}.pdf", stream=io.BytesIO(page_pdf))
+    return _get_converter().convert(source).document.export_to_markdown()
+
+
+def convert_page(page_number: int, page_pdf: bytes) -> Dict:
+    """
+    Classify and convert one single-page PDF (as bytes) to Markdown; runs inside a pool process.
+    Returns {"page_number", "markdown", "route", "reasons", "features", "convert_ms", "error"};
+    markdown is None when both converters failed.
+    """
+    start = time.perf_counter()
+    result = {"page_number": page_number, "markdown": None, "route": None, "reasons": [], "features": None, "error": None}
+    try:
+        with fitz.open(stream=page_pdf, filetype="pdf") as page_doc:
+            features = extract_page_features(page_doc[0])
+            decision = classify_page(features)
+            result.update(route=decision["route"], reasons=decision["reasons"], features=features)
+            if decision["route"] == ROUTE_DOCLING:
+                markdown = _docling_markdown(page_number, page_pdf)
+            else:
+                markdown = pymupdf4llm.to_markdown(page_doc)
+        result["markdown"] = markdown.strip()
+    except Exception as e:
+        result["error"] = str(e)
+        try:
+            result["markdown"] = _docling_markdown(page_number, page_pdf).strip()
+            result["route"] = ROUTE_DOCLING
+            result["reasons"] = result["reasons"] + ["fallback"]
+        except Exception as e2:
+            result["route"] = None
+            result["error"] = f"{e}; docling: {e2}"
+    result["convert_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def conversion_cache_model() -> str:
+    """Cache namespace for converted pages; changes whenever settings that shape the Markdown change."""
+    options = (
+        settings.DOCLING_DO_OCR,
+        settings.DOCLING_DO_TABLE_STRUCTURE,
+        settings.DOCLING_TABLE_MODE,
+        sorted(default_thresholds().items()),
+    )
+    return "pages:" + content_hash(repr(options))[:16]
+
+
+class PageConversionEngine:
+    """
+    Process pool that converts PDF pages to Markdown in parallel.
+
+    Each pool process keeps its own warm DocumentConverter. Results are handed to
+    `on_page` as soon as each page finishes and returned in page order.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = max(1, workers or settings.MD_CONVERSION_WORKERS)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+            # spawn: the worker already holds torch/CUDA state that must not be forked
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(torch_threads,),
+            )
+            logger.info(f"Started page conversion pool with {self.workers} processes")
+        return self._pool
+
+    async def convert_pages(
+        self,
+        pdf_source: Union[bytes, str, os.PathLike],
+        on_page: Optional[Callable[[Dict], Awaitable[None]]] = None,
+        page_cache=None,
+    ) -> List[Dict]:
+        """
+        Convert every page of a PDF (bytes or path); returns results in page order.
+        Pages are split lazily, keeping at most two per pool process in flight.
+        With a page_cache, pages whose PDF bytes were converted before are served from it
+        (route "cache") and new conversions are stored. The cache is checked once per
+        document: a first pass hashes every page, then one get_many looks them all up.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        max_in_flight = self.workers * 2
+
+        cache_model = conversion_cache_model() if page_cache else None
+        digests = {}
+        cached = {}
+        if page_cache:
+            digests = await asyncio.to_thread(
+                lambda: {page_number: content_hash(page_pdf) for page_number, page_pdf in iter_page_pdfs(pdf_source)}
+            )
+            cached = await page_cache.get_many(PAGE_MARKDOWN, cache_model, list(digests.values()))
+        pages = iter_page_pdfs(pdf_source)
+
+        order = []
+        results = {}
+        in_flight = set()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(in_flight) < max_in_flight:
+                    item = next(pages, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    page_number, page_pdf = item
+                    order.append(page_number)
+                    if page_cache:
+                        markdown = cached.get(digests[page_number])
+                        if markdown is not None:
+                            result = {
+                                "page_number": page_number, "markdown": markdown, "route": ROUTE_CACHE,
+                                "reasons": [], "features": None, "convert_ms": 0.0, "error": None,
+                            }
+                            results[page_number] = result
+                            if on_page:
+                                await on_page(result)
+                            continue
+                    in_flight.add(loop.run_in_executor(pool, convert_page, page_number, page_pdf))
+                if not in_flight:
+                    break
+
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    results[result["page_number"]] = result
+                    if page_cache and result["markdown"] is not None and not result["error"]:
+                        await page_cache.set(PAGE_MARKDOWN, cache_model, digests[result["page_number"]], result["markdown"])
+                    if on_page:
+                        await on_page(result)
+        except BrokenProcessPool:
+            # A pool process died (e.g. out of memory); start a fresh pool next time
+            self.shutdown()
+            raise
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+        return [results[page_number] for page_number in order]
+
+    async def warm_up(self) -> List[Dict]:
+        """Start the pool processes and load their models before the first job arrives."""
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        infos = await asyncio.gather(*(loop.run_in_executor(pool, _worker_info) for _ in range(self.workers)))
+        infos = list({info["pid"]: info for info in infos}.values())
+        logger.info(f"Page conversion pool warmed: {infos}")
+        return infos
+
+    async def health_check(self) -> Dict:
+        """Run a one-page Docling conversion through the pool."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_pool(), _health_check)
+        except BrokenProcessPool as e:
+            self.shutdown()
+            return {"ok": False, "latency_ms": None, "error": f"pool broken: {e}"}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+page_conversion_engine = PageConversionEngine()
@@ -3,6 +3,9 @@ from chromadb.utils import embedding_functions
 import logging
 import os
 import shutil
+from app.utils.vector_store import invalidate_all_vector_stores
+from app.pipeline.keyword_search.bm25_index import bm25_index
+from app.utils.cache import bump_corpus_version
 
 logging.basicConfig(
     level=logging.DEBUG,
@@ -35,6 +38,11 @@ def reset_chroma_collection():
         )
         logger.info("New collection created successfully.")
 
+        # Cached handles in this process point at the deleted collection
+        invalidate_all_vector_stores()
+        # Cached embeddings/scores/answers in every process refer to the old corpus
+        bump_corpus_version()
+
         # --- NEW: reset BM25 store ---
         BM25_DIR = "app/pipeline/bm25_store"
         try:
@@ -42,6 +50,7 @@ def reset_chroma_collection():
                 logger.info(f"Removing existing BM25 store at: {BM25_DIR}")
                 shutil.rmtree(BM25_DIR)
             os.makedirs(BM25_DIR, exist_ok=True)
+            bm25_index.clear()
             logger.info(f"BM25 store reset at: {BM25_DIR}")
         except Exception as e:
             logger.error(f"Failed to reset BM25 store: {e}")
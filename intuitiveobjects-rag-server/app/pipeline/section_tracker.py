@@ -0,0 +1,83 @@
+import re
+from typing import Dict, List, Tuple
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+
+
+def _clean_heading(text: str) -> str:
+    # Docling / pymupdf4llm wrap headings in emphasis now and then
+    return re.sub(r"[*_`]+", "", text).strip()
+
+
+def parse_headings(markdown_text: str) -> List[Tuple[int, str]]:
+    """Markdown ATX headings as (level, title) in page order; fenced code is skipped."""
+    headings = []
+    in_fence = False
+    for line in markdown_text.splitlines():
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            continue
+        match = HEADING_PATTERN.match(line.strip())
+        if match:
+            title = _clean_heading(match.group(2))
+            if title:
+                headings.append((len(match.group(1)), title))
+    return headings
+
+
+def extractive_summary(markdown_text: str, max_chars: int = 300) -> str:
+    """First sentences of the page body (headings, tables and fences skipped), for pages the LLM never sees."""
+    body = " ".join(
+        line.strip() for line in markdown_text.splitlines()
+        if line.strip() and not line.lstrip().startswith(("#", "|", "```", "~~~"))
+    )
+    if not body:
+        return "Content available"
+    summary = ""
+    for sentence in re.split(r"(?<=[.!?])\s+", body):
+        if summary and len(summary) + len(sentence) + 1 > max_chars:
+            break
+        summary = f"{summary} {sentence}".strip()
+    return summary[:max_chars]
+
+
+class SectionTracker:
+    """
+    Running section hierarchy of a document, fed one page at a time in page order.
+
+    A heading closes every open section at its level or deeper, so the stack always
+    holds the path to the current section. Pages without headings stay in the
+    section that was open when they started.
+    """
+
+    def __init__(self):
+        self.stack: List[Tuple[int, str]] = []
+
+    def _push(self, level: int, title: str):
+        while self.stack and self.stack[-1][0] >= level:
+            self.stack.pop()
+        self.stack.append((level, title))
+
+    def observe_headings(self, headings: List[Tuple[int, str]]):
+        for level, title in headings:
+            self._push(level, title)
+
+    def observe_titles(self, titles: List[str]):
+        """Titles inferred without heading levels (e.g. by the LLM) replace the current section."""
+        level = self.stack[-1][0] if self.stack else 1
+        for title in titles:
+            self._push(level, title)
+
+    def current(self, page_titles: List[str] = None) -> Dict[str, str]:
+        """
+        {"title", "section_title"} after the page was observed; title is the hierarchy
+        ("Chapter > Section"), section_title the last title on the page or the open section.
+        """
+        if not self.stack:
+            return {"title": "Untitled", "section_title": "Untitled"}
+        title = " > ".join(t for _, t in self.stack)
+        section_title = page_titles[-1] if page_titles else self.stack[-1][1]
+        return {"title": title, "section_title": section_title}
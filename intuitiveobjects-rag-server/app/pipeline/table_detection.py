@@ -0,0 +1,25 @@
+from typing import Dict
+import fitz
+
+# Smallest grid PyMuPDF must find before we call it a table; single ruled
+# lines (underlines, header/footer rules) produce 1-row or 1-column "tables"
+MIN_TABLE_ROWS = 2
+MIN_TABLE_COLS = 2
+
+
+def detect_tables(page: fitz.Page, min_rows: int = MIN_TABLE_ROWS, min_cols: int = MIN_TABLE_COLS) -> Dict:
+    """
+    In-process table detection with PyMuPDF's find_tables (ruling-line strategy).
+    Returns {"has_table": bool, "bboxes": [(x0, y0, x1, y1), ...]}.
+    """
+    try:
+        tables = page.find_tables(strategy="lines")
+    except Exception:
+        return {"has_table": False, "bboxes": []}
+
+    bboxes = [
+        tuple(round(v, 2) for v in table.bbox)
+        for table in tables.tables
+        if table.row_count >= min_rows and table.col_count >= min_cols
+    ]
+    return {"has_table": bool(bboxes), "bboxes": bboxes}
@@ -0,0 +1,76 @@
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+UNKNOWN = "Unknown"
+
+
+def normalize_tags(tags: List[str]) -> List[str]:
+    """Flatten comma-separated tag entries ("author, date") into single tag names."""
+    normalized = []
+    for tag in tags or []:
+        normalized.extend(t.strip() for t in tag.split(",") if t.strip())
+    return normalized
+
+
+def group_pages_by_file(pages: List[Dict]) -> Dict[str, List[Dict]]:
+    """Pages keyed by the folder they were read from: one entry per file, per ZIP member for archives."""
+    groups: Dict[str, List[Dict]] = defaultdict(list)
+    for page in pages:
+        groups[str(Path(page["source"]).parent)].append(page)
+    return dict(groups)
+
+
+def build_page_windows(pages: List[Dict], max_chars: int, max_windows: int) -> List[str]:
+    """
+    Pack consecutive page texts into windows of at most max_chars (a longer page is cut).
+    When there are more than max_windows, keep evenly spaced ones, always the first,
+    which usually holds the title block.
+    """
+    windows, current = [], ""
+    for page in pages:
+        text = page.get("text", "").strip()
+        if not text:
+            continue
+        text = text[:max_chars]
+        if current and len(current) + len(text) + 2 > max_chars:
+            windows.append(current)
+            current = ""
+        current = f"{current}\n\n{text}" if current else text
+    if current:
+        windows.append(current)
+
+    if len(windows) <= max_windows:
+        return windows
+    step = (len(windows) - 1) / (max_windows - 1) if max_windows > 1 else 0
+    picked = sorted({round(i * step) for i in range(max_windows)})
+    return [windows[i] for i in picked]
+
+
+def _vote_key(value: str) -> str:
+    return re.sub(r"\s+", " ", value).strip().casefold()
+
+
+def merge_tag_votes(window_values: List[Dict[str, str]], tags: List[str]) -> Dict[str, str]:
+    """
+    Per tag, the value most windows agree on (case/whitespace-insensitive); "Unknown"
+    never wins over a real value. Ties go to the earliest window.
+    """
+    merged = {}
+    for tag in tags:
+        votes = Counter()
+        first_seen = {}
+        for position, values in enumerate(window_values):
+            value = str(values.get(tag, UNKNOWN)).strip()
+            if not value or value == UNKNOWN:
+                continue
+            key = _vote_key(value)
+            votes[key] += 1
+            first_seen.setdefault(key, (position, value))
+        if not votes:
+            merged[tag] = UNKNOWN
+            continue
+        best = max(votes, key=lambda key: (votes[key], -first_seen[key][0]))
+        merged[tag] = first_seen[best][1]
+    return merged
@@ -15,6 +15,7 @@ from app.models.message_model import Message, MessageRole
 from app.db.mongodb import message_collection
 from app.db.mongodb import user_query_collection
 from app.utils.llm import expand_user_query
+from app.services.user_context_service import get_user_context
 from app.serializers.message_serializers import messageListEntity, messageEntity
 from bson.objectid import ObjectId
 from app.utils.functions import inject_image_markdown
@@ -23,6 +24,7 @@ import markdown
 from app.data.questions import sample_question_and_answer
 import logging
 import json
+from fastapi.encoders import jsonable_encoder
 
 
 logging.basicConfig(level=logging.INFO)
@@ -282,88 +284,108 @@ async def delete_user_chat(chat_id: str, user_id: str):
 """
     Send User Message
 """
-async def send_user_message(chat_id: str, user_id: str, message: SendUserMessageRequest):
-    try:
-        # Check chat exists
-        existing_chat = await chat_collection().find_one(
-            {"_id": ObjectId(chat_id), "user_id": user_id}
-        )
-        if not existing_chat:
-            raise HTTPException(status_code=404, detail="Chat not found")
+async def _store_user_message(chat_id: str, user_id: str, message: SendUserMessageRequest):
+    """Persist the user's message and its expanded query; returns (message_id, expanded_query)."""
+    # Check chat exists
+    existing_chat = await chat_collection().find_one(
+        {"_id": ObjectId(chat_id), "user_id": user_id}
+    )
+    if not existing_chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    # === STEP 1: Store user message with explicit timestamp ===
+    user_message_timestamp = datetime.utcnow()
+    request_message = Message(
+        chat_id=chat_id,
+        content=message.content,
+        role=MessageRole.user,
+        created_at=user_message_timestamp,
+        updated_at=user_message_timestamp,
+    )
+    request_result = await message_collection().insert_one(request_message.model_dump())
+    print(f'request result with inserted_id >>>>>>>> {request_result}')
+    if not request_result.inserted_id:
+        raise HTTPException(status_code=500, detail="Failed to send message")
+
+    # Fetch last two conversation entries from user_query_collection
+    user_queries = await user_query_collection().find(
+        {"chat_id": chat_id}
+    ).sort("created_at", -1).to_list(length=2)
+
+    if not user_queries:
+        expanded_query = message.content
+        print(f'expanded_query without user_queries: {expanded_query}')
+    else:
+        conversation = [{"role": "user", "content": q["content"]} for q in user_queries]
+        expanded_query = await expand_user_query(conversation, message.content, user_id)
+        print(f'expanded_query with user_queries: {expanded_query}')
+
+    # Store expanded query in user_query_collection
+    expanded_message = Message(
+        chat_id=chat_id,
+        content=expanded_query,
+        role=MessageRole.user,
+        created_at=user_message_timestamp,
+        updated_at=user_message_timestamp,
+    )
+    await user_query_collection().insert_one(expanded_message.model_dump())
 
-        # === STEP 1: Store user message with explicit timestamp ===
-        user_message_timestamp = datetime.utcnow()
-        request_message = Message(
-            chat_id=chat_id,
-            content=message.content,
-            role=MessageRole.user,
-            created_at=user_message_timestamp,
-            updated_at=user_message_timestamp,
-        )
-        request_result = await message_collection().insert_one(request_message.model_dump())
-        print(f'request result with inserted_id >>>>>>>> {request_result}')
-        if not request_result.inserted_id:
-            raise HTTPException(status_code=500, detail="Failed to send message")
+    return request_result.inserted_id, expanded_message.content
 
-        # Fetch last two conversation entries from user_query_collection
-        user_queries = await user_query_collection().find(
-            {"chat_id": chat_id}
-        ).sort("created_at", -1).to_list(length=2)
-
-        if not user_queries:
-            expanded_query = message.content
-            print(f'expanded_query without user_queries: {expanded_query}')
-        else:
-            conversation = [{"role": "user", "content": q["content"]} for q in user_queries]
-            expanded_query = await expand_user_query(conversation, message.content, user_id)
-            print(f'expanded_query with user_queries: {expanded_query}')
-
-        # Store expanded query in user_query_collection
-        expanded_message = Message(
-            chat_id=chat_id,
-            content=expanded_query,
-            role=MessageRole.user,
-            created_at=user_message_timestamp,
-            updated_at=user_message_timestamp,
-        )
-        await user_query_collection().insert_one(expanded_message.model_dump())
+
+async def _store_assistant_message(chat_id: str, ai_answer: str, sources: list, error: str = None):
+    """
+    Persist the assistant answer to messages and user_queries; returns the message id.
+    `error` marks an answer whose generation failed (e.g. a partially streamed one).
+    """
+    # === STEP 3: Capture assistant response timestamp AFTER RAG completes ===
+    assistant_message_timestamp = datetime.utcnow()
+    
+    # Store assistant response
+    response_message = Message(
+        chat_id=chat_id,
+        content=ai_answer,
+        sources=sources,
+        role=MessageRole.assistant,
+        created_at=assistant_message_timestamp,
+        updated_at=assistant_message_timestamp,
+    )
+    response_record = response_message.model_dump()
+    if error:
+        response_record["error"] = error
+    response_result = await message_collection().insert_one(response_record)
+    if not response_result.inserted_id:
+        raise HTTPException(status_code=500, detail="Failed to send message")
+
+    # Store assistant response in user_query_collection
+    assistant_message = Message(
+        chat_id=chat_id,
+        content=ai_answer.strip(),
+        role=MessageRole.assistant,
+        created_at=assistant_message_timestamp,
+        updated_at=assistant_message_timestamp,
+    )
+    await user_query_collection().insert_one(assistant_message.model_dump())
+
+    return response_result.inserted_id
+
+
+async def send_user_message(chat_id: str, user_id: str, message: SendUserMessageRequest):
+    try:
+        request_message_id, expanded_query = await _store_user_message(chat_id, user_id, message)
 
         # === STEP 2: Call RAG pipeline (this takes time) ===
         from app.utils.pages_wise_metadata import processor
-        rag_response = await processor.ask_question(user_id, expanded_message.content)
+        rag_response = await processor.ask_question(user_id, expanded_query)
 
         ai_answer = rag_response.get("answer", "No answer found.")
         sources = rag_response.get("sources", [])
 
-        # === STEP 3: Capture assistant response timestamp AFTER RAG completes ===
-        assistant_message_timestamp = datetime.utcnow()
-        
-        # Store assistant response
-        response_message = Message(
-            chat_id=chat_id,
-            content=ai_answer,
-            sources=sources,
-            role=MessageRole.assistant,
-            created_at=assistant_message_timestamp,
-            updated_at=assistant_message_timestamp,
-        )
-        response_result = await message_collection().insert_one(response_message.model_dump())
-        if not response_result.inserted_id:
-            raise HTTPException(status_code=500, detail="Failed to send message")
-
-        # Store assistant response in user_query_collection
-        assistant_message = Message(
-            chat_id=chat_id,
-            content=ai_answer.strip(),
-            role=MessageRole.assistant,
-            created_at=assistant_message_timestamp,
-            updated_at=assistant_message_timestamp,
-        )
-        await user_query_collection().insert_one(assistant_message.model_dump())
+        response_message_id = await _store_assistant_message(chat_id, ai_answer, sources)
 
         # Fetch both inserted messages
-        request_message_db = await message_collection().find_one({"_id": request_result.inserted_id})
-        response_message_db = await message_collection().find_one({"_id": response_result.inserted_id})
+        request_message_db = await message_collection().find_one({"_id": request_message_id})
+        response_message_db = await message_collection().find_one({"_id": response_message_id})
 
         return {
             "response_message": messageEntity(response_message_db),
@@ -374,6 +396,56 @@ async def send_user_message(chat_id: str, user_id: str, message: SendUserMessage
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+"""
+    Stream User Message
+"""
+async def stream_user_message(chat_id: str, user_id: str, message: SendUserMessageRequest):
+    """
+    Store the user message, then return an async iterator of Server-Sent Events:
+    `request_message`, one `token` per generated chunk, and a final `response_message`
+    emitted after the answer has been persisted.
+    """
+    try:
+        request_message_id, expanded_query = await _store_user_message(chat_id, user_id, message)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events():
+        from app.utils.pages_wise_metadata import processor
+
+        request_message_db = await message_collection().find_one({"_id": request_message_id})
+        yield _sse_event("request_message", messageEntity(request_message_db))
+
+        final_event = {}
+        async for event in processor.ask_question_stream(user_id, expanded_query):
+            if event["type"] == "token":
+                yield _sse_event("token", {"content": event["content"]})
+            else:
+                final_event = event
+
+        ai_answer = final_event.get("answer") or "No answer found."
+        sources = final_event.get("sources", [])
+        if final_event.get("error"):
+            yield _sse_event("error", {"detail": final_event["error"]})
+        try:
+            response_message_id = await _store_assistant_message(
+                chat_id, ai_answer, sources, error=final_event.get("error")
+            )
+            response_message_db = await message_collection().find_one({"_id": response_message_id})
+            yield _sse_event("response_message", messageEntity(response_message_db))
+        except Exception as e:
+            logger.error(f"Failed to store streamed answer for chat {chat_id}: {e}")
+            yield _sse_event("error", {"detail": str(e)})
+
+    return events()
+
+
 
 """
     Update User Chat
@@ -459,29 +531,17 @@ from fastapi import UploadFile
 from typing import List
 from app.models.organization_file_model import OrganizationFile
 from app.serializers.organization_file_serializers import OrganizationFileEntity
-from app.db.mongodb import organization_admin_collection, document_collection, get_fs , organization_user_collection 
 from app.core.config import settings
-from app.core.rabbitmq_client import rabbitmq_client  
-import hashlib
+from app.services.document_upload_service import ingest_uploaded_files
 
 async def user_file_upload(
     category_id: str, files: UploadFile, tags: List[str], user_id: str
 ):
-    existing_org_admin = await organization_admin_collection().find_one(
-        {"_id": ObjectId(user_id)}
-    )
-    if existing_org_admin:
-        organization_id = existing_org_admin["organization_id"]
-    else:
-        existing_org_user = await organization_user_collection().find_one(
-            {"_id": ObjectId(user_id)}
-        )
-        if not existing_org_user:
-            raise HTTPException(status_code=404, detail="User not found")
-        organization_id = existing_org_user["organization_id"]
+    user_context = await get_user_context(user_id)
+    organization_id = user_context["organization_id"]
 
     if category_id == "someCategoryId":
-      category_id = existing_org_user["category_id"]
+      category_id = user_context["category_id"]
  
     if not files or len(files) == 0:
         raise HTTPException(status_code=400, detail="Files required")
@@ -489,186 +549,15 @@ async def user_file_upload(
     if not len(files) <= settings.MAX_FILES_PER_FOLDER:
         raise HTTPException(status_code=400, detail="10 files only allowed")
         
-    processed_files = []
-    rejected_files = []
-    
-    for file in files:
-        content = await file.read()
-        
-        # validate the file size
-        if len(content) > settings.MAX_FILE_SIZE:
-            rejected_files.append({
-                "filename": file.filename,
-                "reason": f"File size exceeds {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB limit"
-            })
-            continue
-        
-        new_doc = {
-            "organization_id": organization_id,
-            "uploaded_by": user_id,
-            "category_id": category_id,
-            "filename": file.filename,
-            "file_size": file.size,
-            "mime_type": file.content_type,
-            "file_id": None,
-            "tags": tags or [],
-            "hash_key": None,
-            "source_type": "PRIVATE_DRIVE",
-            "current_stage": None,
-            "status_history": [],
-            "created_at": datetime.now(),
-            "updated_at": datetime.now(),
-        }
-        
-        # insert into database
-        doc_result = await document_collection().insert_one(
-            new_doc
-        )
-        
-        # update status
-        update_data = {
-            "$set": {
-                "current_stage": "UPLOAD_JOB_QUEUED",
-                "updated_at": datetime.now(),
-            },
-            "$push": {
-                "status_history": {
-                    "stage": "UPLOAD_JOB_QUEUED",
-                    "status": "completed",
-                    "timestamp": datetime.now(),
-                    "error_message": None,
-                    "retry_count": 0
-                }
-            }
-        }
-
-        await document_collection().update_one(
-            {"_id": doc_result.inserted_id},
-            update_data
-        )
-    
-        # create the file hash
-        hash_key = hashlib.sha256(content).hexdigest()
-        
-        # check if the file already exist for the organization
-        is_duplicate = await document_collection().find_one({
-            "hash_key": hash_key,
-            "organization_id": organization_id,
-            "current_stage": "COMPLETED"
-        })
-        
-        # if duplicate reject the file
-        if is_duplicate:
-            await document_collection().update_one(
-                {"_id": doc_result.inserted_id},
-                {
-                    "$set": {
-                        "current_stage": "FILE_ALREADY_EXISTS_SKIPPED",
-                        "updated_at": datetime.now(),
-                    },
-                    "$push": {
-                        "status_history": {
-                            "stage": "FILE_ALREADY_EXISTS_SKIPPED",
-                            "status": "completed",
-                            "timestamp": datetime.now(),
-                            "error_message": None,
-                            "retry_count": 0
-                        }
-                    }
-                }
-            )
-
-            doc =  await document_collection().find_one(
-                {"_id": doc_result.inserted_id}
-            )
-            processed_files.append(OrganizationFileEntity(doc))    
-            continue
-
-        await document_collection().update_one(
-            {"_id": doc_result.inserted_id},
-            {
-                "$set": {
-                    "current_stage": "RAW_FILE_UPLOAD_STARTED",
-                    "updated_at": datetime.now(),
-                    "hash_key": hash_key
-                },
-                "$push": {
-                    "status_history": {
-                        "stage": "RAW_FILE_UPLOAD_STARTED",
-                        "status": "completed",
-                        "timestamp": datetime.now(),
-                        "error_message": None,
-                        "retry_count": 0
-                    }
-                }
-            }
-        )
-        
-        grid_fs_id = await get_fs().upload_from_stream(
-            new_doc["filename"],
-            content,
-            metadata={
-                "type": new_doc["mime_type"],
-                "organization_id": new_doc["organization_id"],
-                "uploaded_by": user_id,
-                "doc_id": str(doc_result.inserted_id),
-                "doc_type": "RAW",
-                "source": "PRIVATE_DRIVE",
-                "uploaded_at": datetime.now()
-            }
-        )
-
-        await document_collection().update_one(
-            {"_id": doc_result.inserted_id},
-            {
-                "$set": {
-                    "current_stage": "RAW_FILE_UPLOAD_UPLOADED",
-                    "updated_at": datetime.now(),
-                },
-                "$push": {
-                    "status_history": {
-                        "stage": "RAW_FILE_UPLOAD_UPLOADED",
-                        "status": "completed",
-                        "timestamp": datetime.now(),
-                        "error_message": None,
-                        "retry_count": 0
-                    }
-                }
-            }
-        )
-        
-        rabbitmq_job = {
-            "doc_id": str(doc_result.inserted_id),
-            "user_id": user_id,
-        }
-                
-        await rabbitmq_client.send_message(
-            settings.MD_FILE_CONVERSION_QUEUE,
-            json.dumps(rabbitmq_job)
-        )
-
-        await document_collection().update_one(
-            {"_id": doc_result.inserted_id},
-            {
-                "$set": {
-                    "current_stage": "MD_CONVERSION_JOB_QUEUED",
-                    "updated_at": datetime.now(),
-                },
-                "$push": {
-                    "status_history": {
-                        "stage": "MD_CONVERSION_JOB_QUEUED",
-                        "status": "completed",
-                        "timestamp": datetime.now(),
-                        "error_message": None,
-                        "retry_count": 0
-                    }
-                }
-            }
-        )
-
-        doc = await document_collection().find_one(
-            {"_id": doc_result.inserted_id}
-        )
-        processed_files.append(OrganizationFileEntity(doc))
+    # Files stream to GridFS concurrently; size limit and duplicate check happen while/after streaming
+    outcome = await ingest_uploaded_files(
+        files,
+        organization_id=organization_id,
+        category_id=category_id,
+        tags=tags,
+        user_id=user_id,
+        source_type="PRIVATE_DRIVE", extra_fields={"uploaded_by": user_id},
+    )
+    processed_files = [OrganizationFileEntity(doc) for doc in outcome["documents"]]
     
-    return processed_files
\ No newline at end of file
+    return {"files": processed_files, "rejected": outcome["rejected"]}
\ No newline at end of file
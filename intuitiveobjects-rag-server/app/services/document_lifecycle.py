@@ -0,0 +1,80 @@
+from typing import Dict, Optional
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument
+from fastapi.encoders import jsonable_encoder
+from app.db.mongodb import document_collection
+from app.core.notification_hub import publish_notification
+from app.serializers.organization_file_serializers import OrganizationFileEntity
+
+
+def status_entry(stage: str, status: str = "completed", error_message: Optional[str] = None, **extra) -> Dict:
+    """A status_history entry, for records inserted with their history already filled in."""
+    return {
+        "stage": stage,
+        "status": status,
+        "timestamp": datetime.now(),
+        "error_message": error_message,
+        "retry_count": 0,
+        **extra,
+    }
+
+
+def _literal(value):
+    # Pipeline updates evaluate their values; $literal keeps "$..." strings and dicts as data
+    return {"$literal": value}
+
+
+async def transition(
+    doc_id,
+    stage: str,
+    user_id: Optional[str] = None,
+    status: str = "completed",
+    error_message: Optional[str] = None,
+    fields: Optional[Dict] = None,
+    history: Optional[Dict] = None,
+    notify: bool = True,
+) -> Optional[Dict]:
+    """
+    Move a document to `stage` in one atomic find_one_and_update and return the updated record.
+
+    The appended status_history entry carries duration_ms, the time spent since the
+    previous entry. `fields` are extra top-level fields to set, `history` extra keys
+    for the entry. With a user_id the notification is published with the document
+    attached, so the notify consumer never reads it back.
+    """
+    now = datetime.now()
+    entry = {key: _literal(value) for key, value in status_entry(stage, status, error_message, **(history or {})).items()}
+    entry["timestamp"] = _literal(now)
+    entry["duration_ms"] = {
+        "$subtract": [_literal(now), {"$arrayElemAt": ["$status_history.timestamp", -1]}]
+    }
+
+    update = {
+        "current_stage": _literal(stage),
+        "updated_at": _literal(now),
+        "status_history": {
+            "$concatArrays": [{"$ifNull": ["$status_history", []]}, [entry]]
+        },
+    }
+    for key, value in (fields or {}).items():
+        update[key] = _literal(value)
+
+    doc = await document_collection().find_one_and_update(
+        {"_id": ObjectId(doc_id)},
+        [{"$set": update}],
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc and notify and user_id:
+        await notify_document(doc, user_id)
+    return doc
+
+
+async def notify_document(doc: Dict, user_id: str):
+    """Publish a document_notify event that carries the serialized document."""
+    await publish_notification({
+        "event_type": "document_notify",
+        "doc_id": str(doc["_id"]),
+        "user_id": user_id,
+        "document": jsonable_encoder(OrganizationFileEntity(doc)),
+    })
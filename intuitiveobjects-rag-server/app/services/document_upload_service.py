@@ -0,0 +1,134 @@
+from fastapi import UploadFile
+from typing import Dict, List
+import asyncio
+from bson import ObjectId
+from datetime import datetime
+import json
+from app.db.mongodb import document_collection
+from app.core.config import settings
+from app.core.rabbitmq_client import rabbitmq_client
+from app.utils.file_streams import stream_upload_to_gridfs, UploadTooLarge
+from app.services.document_lifecycle import status_entry
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def ingest_uploaded_file(
+    file: UploadFile,
+    organization_id: str,
+    category_id: str,
+    tags: List[str],
+    user_id: str,
+    source_type: str,
+    extra_fields: Dict = None,
+) -> Dict:
+    """
+    Stream one multipart upload into GridFS and queue it for Markdown conversion.
+
+    The file is hashed while it streams, and the (organization_id, hash_key) duplicate
+    check runs before any document record exists. Too-large uploads and duplicates never
+    keep their GridFS bytes.
+    Returns {"document": doc} or {"rejected": {"filename", "reason"}}; doc is the
+    record as inserted, so callers never need to re-read it.
+    """
+    # Pre-generated so the GridFS metadata can point at the document before it is inserted
+    doc_id = ObjectId()
+    try:
+        grid_in, digest = await stream_upload_to_gridfs(
+            file,
+            metadata={
+                "type": file.content_type,
+                "organization_id": organization_id,
+                "uploaded_by": user_id,
+                "doc_id": str(doc_id),
+                "doc_type": "RAW",
+                "source": source_type,
+                "uploaded_at": datetime.now()
+            },
+            max_size=settings.MAX_FILE_SIZE,
+        )
+    except UploadTooLarge:
+        return {
+            "rejected": {
+                "filename": file.filename,
+                "reason": f"File size exceeds {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB limit"
+            }
+        }
+
+    hash_key = digest["sha256"]
+    new_doc = {
+        "_id": doc_id,
+        "organization_id": organization_id,
+        "category_id": category_id,
+        "filename": file.filename,
+        "file_size": digest["size"],
+        "mime_type": file.content_type,
+        "file_id": None,
+        "tags": tags or [],
+        "hash_key": hash_key,
+        "source_type": source_type,
+        "current_stage": None,
+        "status_history": [],
+        "created_at": datetime.now(),
+        "updated_at": datetime.now(),
+        **(extra_fields or {}),
+    }
+
+    # check if the file already exist for the organization
+    is_duplicate = await document_collection().find_one({
+        "organization_id": organization_id,
+        "hash_key": hash_key,
+        "current_stage": "COMPLETED"
+    }, {"_id": 1})
+
+    if is_duplicate:
+        # Drop the streamed chunks; the record only tells the user why nothing was ingested
+        await grid_in.abort()
+        new_doc["current_stage"] = "FILE_ALREADY_EXISTS_SKIPPED"
+        new_doc["status_history"] = [status_entry("FILE_ALREADY_EXISTS_SKIPPED")]
+        await document_collection().insert_one(new_doc)
+        return {"document": new_doc}
+
+    await grid_in.close()
+
+    # Every stage up to queuing is already done, so the record is written once with its
+    # full history; it exists before the job is published, so the worker always finds it
+    stages = ("UPLOAD_JOB_QUEUED", "RAW_FILE_UPLOAD_STARTED", "RAW_FILE_UPLOAD_UPLOADED", "MD_CONVERSION_JOB_QUEUED")
+    new_doc["current_stage"] = stages[-1]
+    new_doc["status_history"] = [status_entry(stage) for stage in stages]
+    await document_collection().insert_one(new_doc)
+
+    await rabbitmq_client.send_message(
+        settings.MD_FILE_CONVERSION_QUEUE,
+        json.dumps({
+            "doc_id": str(doc_id),
+            "user_id": user_id,
+        })
+    )
+    return {"document": new_doc}
+
+
+async def ingest_uploaded_files(files: List[UploadFile], **kwargs) -> Dict:
+    """
+    Run ingest_uploaded_file for every file, UPLOAD_CONCURRENCY at a time.
+    Returns {"documents": [...], "rejected": [...]} in upload order.
+    """
+    semaphore = asyncio.Semaphore(settings.UPLOAD_CONCURRENCY)
+
+    async def ingest(file: UploadFile):
+        async with semaphore:
+            return await ingest_uploaded_file(file, **kwargs)
+
+    outcomes = await asyncio.gather(*(ingest(file) for file in files), return_exceptions=True)
+    result = {"documents": [], "rejected": []}
+    for file, outcome in zip(files, outcomes):
+        if isinstance(outcome, Exception):
+            # A failed file is reported next to the ones that were queued, not as a request error
+            logger.error(f"Failed to ingest {file.filename}: {outcome}")
+            result["rejected"].append({"filename": file.filename, "reason": "Failed to store file"})
+        elif "document" in outcome:
+            result["documents"].append(outcome["document"])
+        else:
+            result["rejected"].append(outcome["rejected"])
+    return result
@@ -28,6 +28,11 @@ from bson.objectid import ObjectId
 from fastapi import HTTPException
 from app.db.mongodb import organization_app_config_collection
 from app.utils.google import get_google_credentials
+from app.services.user_context_service import (
+    invalidate_user,
+    invalidate_category,
+    invalidate_app_config,
+)
 
 async def create_organization_admin(
     organization_id: str, organization_admin: CreateOrganizationAdminSchema
@@ -134,6 +139,7 @@ async def delete_organization_admin(organization_admin_id: str):
     await organization_admin_collection().delete_one(
         {"_id": ObjectId(organization_admin_id)}
     )
+    invalidate_user(organization_admin_id)
 
     return OrganizationAdminEntity(existing_organization_admin)
 
@@ -284,6 +290,7 @@ async def update_category(
     await category_collection().update_one(
         {"_id": ObjectId(category_id)}, {"$set": updated_category.model_dump()}
     )
+    invalidate_category(category_id)
 
     updated_category = await category_collection().find_one(
         {"_id": ObjectId(category_id)}
@@ -322,6 +329,7 @@ async def delete_category(category_id: str, user_id: str):
         )
 
     await category_collection().delete_one({"_id": ObjectId(category_id)})
+    invalidate_category(category_id)
 
     return CategoryEntity(existing_category)
 
@@ -369,6 +377,7 @@ async def create_organization_app_config(
             {"_id": existing_config["_id"]},
             {"$set": config_data}
         )
+        invalidate_app_config(organization_id)
         updated_config = await organization_app_config_collection().find_one(
             {"_id": existing_config["_id"]}
         )
@@ -377,6 +386,7 @@ async def create_organization_app_config(
         # Create new config
         config_data["created_at"] = datetime.utcnow()
         result = await organization_app_config_collection().insert_one(config_data)
+        invalidate_app_config(organization_id)
         new_config = await organization_app_config_collection().find_one(
             {"_id": result.inserted_id}
         )
@@ -1,16 +1,16 @@
 from app.models.organization_file_model import OrganizationFile
 from fastapi import UploadFile, HTTPException
 from app.db.mongodb import (
-    organization_admin_collection,
-    organization_user_collection,
     organization_file_collection,
     get_fs,
     document_collection,
     ingestion_status_collection,
+    category_collection,
     get_client
 )
 from bson import ObjectId
 import os
+import asyncio
 import io
 from app.core.config import settings
 from app.serializers.organization_file_serializers import (
@@ -20,12 +20,18 @@ from app.serializers.organization_file_serializers import (
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from typing import List
-import hashlib
 from datetime import datetime
 from app.core.rabbitmq_client import rabbitmq_client
 import json
 from app.schema.organization_file_schema import UploadGoogleDriveSchema
 from app.utils.google import get_google_credentials
+from app.utils.cache import bump_corpus_version
+from app.services.user_context_service import get_user_context
+from app.services.document_upload_service import ingest_uploaded_files
+from app.services.document_lifecycle import status_entry
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 async def organization_upload_file(
@@ -33,18 +39,8 @@ async def organization_upload_file(
 ):
     # Resolve organization id for the caller: admin OR normal organization user
     print("Uploading file for user:", user_id)
-    existing_org_admin = await organization_admin_collection().find_one(
-        {"_id": ObjectId(user_id)}
-    )
-    if existing_org_admin:
-        organization_id = existing_org_admin["organization_id"]
-    else:
-        existing_org_user = await organization_user_collection().find_one(
-            {"_id": ObjectId(user_id)}
-        )
-        if not existing_org_user:
-            raise HTTPException(status_code=404, detail="User not found")
-        organization_id = existing_org_user["organization_id"]
+    user_context = await get_user_context(user_id)
+    organization_id = user_context["organization_id"]
 
 
     file_name = file.filename
@@ -80,18 +76,8 @@ async def organization_upload_file(
 
 async def organization_get_files(user_id: str):
     # allow admin OR organization user to fetch files for their organization
-    existing_org_admin = await organization_admin_collection().find_one(
-        {"_id": ObjectId(user_id)}
-    )
-    if existing_org_admin:
-        organization_id = existing_org_admin["organization_id"]
-    else:
-        existing_org_user = await organization_user_collection().find_one(
-            {"_id": ObjectId(user_id)}
-        )
-        if not existing_org_user:
-            raise HTTPException(status_code=404, detail="User not found")
-        organization_id = existing_org_user["organization_id"]
+    user_context = await get_user_context(user_id)
+    organization_id = user_context["organization_id"]
 
 
     files = (await document_collection().find({"organization_id": organization_id}).to_list(None))
@@ -101,14 +87,8 @@ async def organization_get_files(user_id: str):
 
 async def organization_delete_file(file_id: str, user_id: str):
     # allow admin OR user who belongs to organization to delete (admin-only deletion is preserved if desired)
-    existing_org_admin = await organization_admin_collection().find_one({"_id": ObjectId(user_id)})
-    if existing_org_admin:
-        organization_id = existing_org_admin["organization_id"]
-    else:
-        existing_org_user = await organization_user_collection().find_one({"_id": ObjectId(user_id)})
-        if not existing_org_user:
-            raise HTTPException(status_code=404, detail="User not found")
-        organization_id = existing_org_user["organization_id"]
+    user_context = await get_user_context(user_id)
+    organization_id = user_context["organization_id"]
 
 
     print("Deleting file:", file_id)
@@ -121,22 +101,40 @@ async def organization_delete_file(file_id: str, user_id: str):
 
     await organization_file_collection().delete_one({"_id": ObjectId(file_id)})
 
+    # Remove the file's chunks so retrieval stops returning them. Imported here so
+    # importing this module does not load the retrieval models
+    from app.utils.pages_wise_metadata import processor
+    try:
+        await asyncio.to_thread(processor.remove_document, file_id)
+    except Exception as e:
+        logger.error(f"Failed to remove indexed chunks of {file_id}: {e}")
+
+    # Cached answers for this category may cite the deleted file
+    category_id = existing_file.get("category_id")
+    category_doc = await category_collection().find_one({"_id": ObjectId(category_id)}) if category_id else None
+    if not category_doc:
+        logger.warning(f"Category {category_id} of deleted file {file_id} not found; invalidating all caches")
+    bump_corpus_version(category_doc.get("name") if category_doc else None)
+
     return OrganizationFileEntity(existing_file)
 
 
+def get_drive_file_metadata(creds, file_id: str) -> dict:
+    """Blocking; builds its own Drive client per call since httplib2 connections are not thread-safe."""
+    drive_service = build('drive', 'v3', credentials=creds)
+    return drive_service.files().get(
+        fileId=file_id,
+        fields="id, name, mimeType, size"
+    ).execute()
+
+
 async def organization_google_drive_upload_file(
     files_data: UploadGoogleDriveSchema,
     user_id: str
 ):
     # resolve organization id from admin or normal user
-    existing_org_admin = await organization_admin_collection().find_one({"_id": ObjectId(user_id)})
-    if existing_org_admin:
-        organization_id = existing_org_admin["organization_id"]
-    else:
-        existing_org_user = await organization_user_collection().find_one({"_id": ObjectId(user_id)})
-        if not existing_org_user:
-            raise HTTPException(status_code=404, detail="User not found")
-        organization_id = existing_org_user["organization_id"]
+    user_context = await get_user_context(user_id)
+    organization_id = user_context["organization_id"]
 
     # check filedata exists in payload
     if not files_data.files or len(files_data.files) == 0:
@@ -153,110 +151,86 @@ async def organization_google_drive_upload_file(
     if not creds:
         raise HTTPException(status_code=400, detail="Google Invalid or expired credentials")
     
-    # build drive service 
-    drive_service = build('drive', 'v3', credentials=creds)
+    semaphore = asyncio.Semaphore(settings.UPLOAD_CONCURRENCY)
     
-    processed_files = []
-    rejected_files = []
-    
-    # loop through the files
-    for file_id in files_data.files:
-        try:
-            # get file meta data
-            file_meta_data = drive_service.files().get(
-                    fileId=file_id,
-                    fields="id, name, mimeType, size"
-                ).execute()
-        except HttpError as e:
-            if e.resp.status == 404:
-                raise HTTPException(status_code=404, detail="File not found")
-            raise HTTPException(status_code=400, detail=f"Error accessing file: {e}")
-        
-        file_mime_type = file_meta_data.get("mimeType")
-        file_name = file_meta_data.get("name", "Unknowm")
-        file_size = file_meta_data.get("size", "Unknown")
-        mime_type = file_meta_data.get("mimeType", "Unknown")
-        
-        # check file type is valid
-        if(file_mime_type != "application/pdf"):
-            rejected_files.append({
-                "filename": file_name,
-                "reason": f"Invalid file type {file_mime_type}"
-            })
-            continue
-        
-        # check file size
-        if int(file_size) > settings.MAX_FILE_SIZE:
-            rejected_files.append({
+    async def queue_drive_file(file_id: str):
+        async with semaphore:
+            try:
+                # get file meta data (blocking HTTP call, so run it in a thread)
+                file_meta_data = await asyncio.to_thread(get_drive_file_metadata, creds, file_id)
+            except HttpError as e:
+                # One inaccessible file must not fail the files queued next to it
+                reason = "File not found" if e.resp.status == 404 else f"Error accessing file: {e}"
+                return {"rejected": {"filename": file_id, "reason": reason}}
+            
+            file_mime_type = file_meta_data.get("mimeType")
+            file_name = file_meta_data.get("name", "Unknowm")
+            file_size = file_meta_data.get("size", "Unknown")
+            mime_type = file_meta_data.get("mimeType", "Unknown")
+            
+            # check file type is valid
+            if(file_mime_type != "application/pdf"):
+                return {"rejected": {
+                    "filename": file_name,
+                    "reason": f"Invalid file type {file_mime_type}"
+                }}
+            
+            # check file size
+            if int(file_size) > settings.MAX_FILE_SIZE:
+                return {"rejected": {
+                    "filename": file_name,
+                    "reason": f"File size exceeds {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB limit"
+                }}
+            
+            # create one document with its initial status; inserted before the job is queued
+            new_doc = {
+                "organization_id": organization_id,
+                "category_id": files_data.category_id,
                 "filename": file_name,
-                "reason": f"File size exceeds {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB limit"
-            })
-            continue
-        
-        # create one document with status
-        new_doc = {
-            "organization_id": existing_org_admin["organization_id"],
-            "category_id": files_data.category_id,
-            "filename": file_name,
-            "file_size": file_size,
-            "mime_type": mime_type,
-            "file_id": file_id,
-            "tags": files_data.tags or [],
-            "hash_key": None,
-            "source_type": "GOOGLE_DRIVE",
-            "current_stage": None,
-            "status_history": [],
-            "created_at": datetime.now(),
-            "updated_at": datetime.now(),
-        }
-        
-        # insert into database
-        doc_result = await document_collection().insert_one(
-            new_doc
-        )
-        
-        # insert into queue
-        rabbitmq_job = {
-            "doc_id": str(doc_result.inserted_id),
-            "user_id": user_id
-        }
-                
-        await rabbitmq_client.send_message(
-            settings.GOOGLE_DRIVE_FILE_UPLOAD_QUEUE,
-            json.dumps(rabbitmq_job)
-        )
-        
-        # update status
-        update_data = {
-            "$set": {
+                "file_size": file_size,
+                "mime_type": mime_type,
+                "file_id": file_id,
+                "tags": files_data.tags or [],
+                "hash_key": None,
+                "source_type": "GOOGLE_DRIVE",
                 "current_stage": "UPLOAD_JOB_QUEUED",
+                "status_history": [status_entry("UPLOAD_JOB_QUEUED")],
+                "created_at": datetime.now(),
                 "updated_at": datetime.now(),
-            },
-            "$push": {
-                "status_history": {
-                    "stage": "UPLOAD_JOB_QUEUED",
-                    "status": "completed",
-                    "timestamp": datetime.now(),
-                    "error_message": None,
-                    "retry_count": 0
-                }
             }
-        }
-
-        await document_collection().update_one(
-            {"_id": doc_result.inserted_id},
-            update_data
-        )
-
-        updated_doc = await document_collection().find_one(
-            {"_id": doc_result.inserted_id}
-        )
-
-        processed_files.append(
-            OrganizationFileEntity(updated_doc)
-        )
             
-    return processed_files
+            # insert into database
+            doc_result = await document_collection().insert_one(
+                new_doc
+            )
+            
+            # insert into queue
+            rabbitmq_job = {
+                "doc_id": str(doc_result.inserted_id),
+                "user_id": user_id
+            }
+                    
+            await rabbitmq_client.send_message(
+                settings.GOOGLE_DRIVE_FILE_UPLOAD_QUEUE,
+                json.dumps(rabbitmq_job)
+            )
+            return {"document": new_doc}
+    
+    # Files are looked up and queued concurrently; the response is built from the inserted records
+    outcomes = await asyncio.gather(
+        *(queue_drive_file(file_id) for file_id in files_data.files), return_exceptions=True
+    )
+    processed_files, rejected_files = [], []
+    for file_id, outcome in zip(files_data.files, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Failed to queue Google Drive file {file_id}: {outcome}")
+            rejected_files.append({"filename": file_id, "reason": "Failed to queue file"})
+        elif "document" in outcome:
+            processed_files.append(OrganizationFileEntity(outcome["document"]))
+        else:
+            rejected_files.append(outcome["rejected"])
+            
+    return {"files": processed_files, "rejected": rejected_files}
     
     
 
@@ -266,21 +240,11 @@ async def organization_local_drive_upload(
     tags: List[str],
     user_id: str
 ): 
-    existing_org_admin = await organization_admin_collection().find_one(
-        {"_id": ObjectId(user_id)}
-    )
-    if existing_org_admin:
-        organization_id = existing_org_admin["organization_id"]
-    else:
-        existing_org_user = await organization_user_collection().find_one(
-            {"_id": ObjectId(user_id)}
-        )
-        if not existing_org_user:
-            raise HTTPException(status_code=404, detail="User not found")
-        organization_id = existing_org_user["organization_id"]
+    user_context = await get_user_context(user_id)
+    organization_id = user_context["organization_id"]
 
     if category_id == "someCategoryId":
-      category_id = existing_org_user["category_id"]
+      category_id = user_context["category_id"]
 
     
     if not files or len(files) == 0:
@@ -289,185 +253,15 @@ async def organization_local_drive_upload(
     if not len(files) <= settings.MAX_FILES_PER_FOLDER:
         raise HTTPException(status_code=400, detail="10 files only allowed")
         
-    processed_files = []
-    rejected_files = []
-    
-    for file in files:
-        content = await file.read()
-        
-        # validate the file size
-        if len(content) > settings.MAX_FILE_SIZE:
-            rejected_files.append({
-                "filename": file.filename,
-                "reason": f"File size exceeds {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB limit"
-            })
-            continue
-        
-        new_doc = {
-            "organization_id": organization_id,
-            "category_id": category_id,
-            "filename": file.filename,
-            "file_size": file.size,
-            "mime_type": file.content_type,
-            "file_id": None,
-            "tags": tags or [],
-            "hash_key": None,
-            "source_type": "LOCAL_DRIVE",
-            "current_stage": None,
-            "status_history": [],
-            "created_at": datetime.now(),
-            "updated_at": datetime.now(),
-        }
-        
-        # insert into database
-        doc_result = await document_collection().insert_one(
-            new_doc
-        )
-        
-        # update status
-        update_data = {
-            "$set": {
-                "current_stage": "UPLOAD_JOB_QUEUED",
-                "updated_at": datetime.now(),
-            },
-            "$push": {
-                "status_history": {
-                    "stage": "UPLOAD_JOB_QUEUED",
-                    "status": "completed",
-                    "timestamp": datetime.now(),
-                    "error_message": None,
-                    "retry_count": 0
-                }
-            }
-        }
-
-        await document_collection().update_one(
-            {"_id": doc_result.inserted_id},
-            update_data
-        )
-    
-        # create the file hash
-        hash_key = hashlib.sha256(content).hexdigest()
-        
-        # check if the file already exist for the organization
-        is_duplicate = await document_collection().find_one({
-            "hash_key": hash_key,
-            "organization_id": organization_id,
-            "current_stage": "COMPLETED"
-        })
-        
-        # if duplicate reject the file
-        if is_duplicate:
-            await document_collection().update_one(
-                {"_id": doc_result.inserted_id},
-                {
-                    "$set": {
-                        "current_stage": "FILE_ALREADY_EXISTS_SKIPPED",
-                        "updated_at": datetime.now(),
-                    },
-                    "$push": {
-                        "status_history": {
-                            "stage": "FILE_ALREADY_EXISTS_SKIPPED",
-                            "status": "completed",
-                            "timestamp": datetime.now(),
-                            "error_message": None,
-                            "retry_count": 0
-                        }
-                    }
-                }
-            )
-
-            doc =  await document_collection().find_one(
-                {"_id": doc_result.inserted_id}
-            )
-            processed_files.append(OrganizationFileEntity(doc))    
-            continue
-
-        await document_collection().update_one(
-            {"_id": doc_result.inserted_id},
-            {
-                "$set": {
-                    "current_stage": "RAW_FILE_UPLOAD_STARTED",
-                    "updated_at": datetime.now(),
-                    "hash_key": hash_key
-                },
-                "$push": {
-                    "status_history": {
-                        "stage": "RAW_FILE_UPLOAD_STARTED",
-                        "status": "completed",
-                        "timestamp": datetime.now(),
-                        "error_message": None,
-                        "retry_count": 0
-                    }
-                }
-            }
-        )
-        
-        grid_fs_id = await get_fs().upload_from_stream(
-            new_doc["filename"],
-            content,
-            metadata={
-                "type": new_doc["mime_type"],
-                "organization_id": new_doc["organization_id"],
-                "uploaded_by": user_id,
-                "doc_id": str(doc_result.inserted_id),
-                "doc_type": "RAW",
-                "source": "LOCAL_DRIVE",
-                "uploaded_at": datetime.now()
-            }
-        )
-
-        await document_collection().update_one(
-            {"_id": doc_result.inserted_id},
-            {
-                "$set": {
-                    "current_stage": "RAW_FILE_UPLOAD_UPLOADED",
-                    "updated_at": datetime.now(),
-                },
-                "$push": {
-                    "status_history": {
-                        "stage": "RAW_FILE_UPLOAD_UPLOADED",
-                        "status": "completed",
-                        "timestamp": datetime.now(),
-                        "error_message": None,
-                        "retry_count": 0
-                    }
-                }
-            }
-        )
-        
-        rabbitmq_job = {
-            "doc_id": str(doc_result.inserted_id),
-            "user_id": user_id,
-        }
-                
-        await rabbitmq_client.send_message(
-            settings.MD_FILE_CONVERSION_QUEUE,
-            json.dumps(rabbitmq_job)
-        )
-
-        await document_collection().update_one(
-            {"_id": doc_result.inserted_id},
-            {
-                "$set": {
-                    "current_stage": "MD_CONVERSION_JOB_QUEUED",
-                    "updated_at": datetime.now(),
-                },
-                "$push": {
-                    "status_history": {
-                        "stage": "MD_CONVERSION_JOB_QUEUED",
-                        "status": "completed",
-                        "timestamp": datetime.now(),
-                        "error_message": None,
-                        "retry_count": 0
-                    }
-                }
-            }
-        )
-
-        doc = await document_collection().find_one(
-            {"_id": doc_result.inserted_id}
-        )
-        processed_files.append(OrganizationFileEntity(doc))
+    # Files stream to GridFS concurrently; size limit and duplicate check happen while/after streaming
+    outcome = await ingest_uploaded_files(
+        files,
+        organization_id=organization_id,
+        category_id=category_id,
+        tags=tags,
+        user_id=user_id,
+        source_type="LOCAL_DRIVE",
+    )
+    processed_files = [OrganizationFileEntity(doc) for doc in outcome["documents"]]
     
-    return processed_files
\ No newline at end of file
+    return {"files": processed_files, "rejected": outcome["rejected"]}
\ No newline at end of file
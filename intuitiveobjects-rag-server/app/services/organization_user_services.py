@@ -14,6 +14,7 @@ from app.db.mongodb import (
 )
 from app.utils.auth import hash_password, verify_password, generate_token
 from bson.objectid import ObjectId
+from app.services.user_context_service import invalidate_user
 from app.serializers.organization_user_serializers import (
     OrganizationUserEntity,
     OrganizationUserListEntity,
@@ -151,6 +152,7 @@ async def update_organization_user(
         {"_id": ObjectId(organization_user_id)},
         {"$set": organization_user_data.model_dump()},
     )
+    invalidate_user(organization_user_id)
     updated_organization_user = await organization_user_collection().find_one(
         {"_id": ObjectId(organization_user_id)}
     )
@@ -176,6 +178,7 @@ async def delete_organization_user(organization_user_id: str, user_id: str):
     await organization_user_collection().delete_one(
         {"_id": ObjectId(organization_user_id)}
     )
+    invalidate_user(organization_user_id)
 
     return OrganizationUserEntity(existing_organization_user)
 
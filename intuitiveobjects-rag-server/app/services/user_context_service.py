@@ -0,0 +1,94 @@
+import copy
+import logging
+from typing import Dict, Optional
+from bson.objectid import ObjectId
+from cachetools import TTLCache
+from fastapi import HTTPException
+from app.core.config import settings
+from app.db.mongodb import (
+    organization_admin_collection,
+    organization_user_collection,
+    category_collection,
+)
+
+logger = logging.getLogger(__name__)
+
+# Per-process caches; the services that write users, categories and app configs
+# invalidate them, and the TTL bounds staleness for writes made by other processes.
+_user_profiles = TTLCache(maxsize=settings.USER_CONTEXT_CACHE_SIZE, ttl=settings.USER_CONTEXT_CACHE_TTL)
+_category_names = TTLCache(maxsize=settings.USER_CONTEXT_CACHE_SIZE, ttl=settings.USER_CONTEXT_CACHE_TTL)
+_app_configs = TTLCache(maxsize=settings.USER_CONTEXT_CACHE_SIZE, ttl=settings.USER_CONTEXT_CACHE_TTL)
+
+
+async def _get_user_profile(user_id: str) -> Dict:
+    profile = _user_profiles.get(user_id)
+    if profile is not None:
+        return profile
+
+    # Admins and organization users both upload and chat; admins are checked first
+    existing_user = await organization_admin_collection().find_one({"_id": ObjectId(user_id)})
+    role = "admin"
+    if not existing_user:
+        existing_user = await organization_user_collection().find_one({"_id": ObjectId(user_id)})
+        role = "user"
+    if not existing_user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    profile = {
+        "user_id": user_id,
+        "role": role,
+        "organization_id": existing_user.get("organization_id"),
+        "category_id": existing_user.get("category_id"),
+    }
+    _user_profiles[user_id] = profile
+    return profile
+
+
+async def get_category_name(category_id: Optional[str]) -> str:
+    if not category_id:
+        return "unknown"
+    name = _category_names.get(category_id)
+    if name is not None:
+        return name
+
+    category_doc = await category_collection().find_one({"_id": ObjectId(category_id)})
+    name = category_doc.get("name", "unknown") if category_doc else "unknown"
+    _category_names[category_id] = name
+    return name
+
+
+async def get_app_config(organization_id: str) -> Dict:
+    """Organization app config (or the defaults), cached per organization."""
+    config = _app_configs.get(organization_id)
+    if config is None:
+        from app.services.organization_admin_services import get_updated_app_config
+
+        config = await get_updated_app_config(organization_id)
+        _app_configs[organization_id] = config
+    return copy.deepcopy(config)
+
+
+async def get_user_context(user_id: str, with_category: bool = False, with_config: bool = False) -> Dict:
+    """
+    Resolve a user's organization and role, plus the category name and app config when asked.
+    Returns {"user_id", "role", "organization_id", "category_id"}, with "category_name"
+    (with_category) and "app_config" (with_config).
+    """
+    context = dict(await _get_user_profile(user_id))
+    if with_category:
+        context["category_name"] = await get_category_name(context["category_id"])
+    if with_config:
+        context["app_config"] = await get_app_config(context["organization_id"])
+    return context
+
+
+def invalidate_user(user_id: str):
+    _user_profiles.pop(str(user_id), None)
+
+
+def invalidate_category(category_id: str):
+    _category_names.pop(str(category_id), None)
+
+
+def invalidate_app_config(organization_id: str):
+    _app_configs.pop(organization_id, None)
@@ -0,0 +1,294 @@
+import os
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+import numpy as np
+from cachetools import TTLCache
+from langchain_core.embeddings import Embeddings
+from app.core.config import settings
+from app.utils.vector_store import PERSIST_DIRECTORY
+
+logger = logging.getLogger(__name__)
+
+# One small marker file per category (plus one for the whole corpus). Ingestion
+# workers and the API run in different processes, so the markers live next to
+# the Chroma store and every process compares them before trusting its caches.
+CORPUS_VERSION_DIR = os.path.join(PERSIST_DIRECTORY, "corpus_versions")
+ALL_CATEGORIES = "_all"
+
+
+def _version_file(category: Optional[str]) -> str:
+    name = ALL_CATEGORIES
+    if category:
+        name = hashlib.md5(category.strip().lower().encode("utf-8")).hexdigest()
+    return os.path.join(CORPUS_VERSION_DIR, f"{name}.version")
+
+
+def bump_corpus_version(category: Optional[str] = None) -> str:
+    """
+    Mark the corpus as changed. Bumping a category also bumps the corpus-wide
+    version; bumping without a category (e.g. after a reset) invalidates everything.
+    """
+    os.makedirs(CORPUS_VERSION_DIR, exist_ok=True)
+    version = uuid.uuid4().hex
+    targets = [_version_file(None)]
+    if category:
+        targets.append(_version_file(category))
+    for path in targets:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, path)
+    logger.info(f"Corpus version bumped for {category or 'all categories'}: {version}")
+    return version
+
+
+def get_corpus_version(category: Optional[str] = None) -> str:
+    """Current version token of a category (or of the whole corpus when category is None)."""
+    parts = []
+    for path in ([_version_file(None)] + ([_version_file(category)] if category else [])):
+        try:
+            with open(path) as f:
+                parts.append(f.read().strip())
+        except OSError:
+            parts.append("0")
+    return ":".join(parts)
+
+
+def normalize_text(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+class ModelCache:
+    """
+    Bounded TTL cache for model outputs, keyed by model name plus normalized input.
+
+    Caches whose outputs depend on the corpus drop their entries when the corpus
+    version changes, checked at most once per `version_check_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: float,
+        version_check_interval: float = 1.0,
+        corpus_dependent: bool = True,
+    ):
+        self.name = name
+        self.corpus_dependent = corpus_dependent
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked_at = 0.0
+        self._version_check_interval = version_check_interval
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _ensure_current(self):
+        if not self.corpus_dependent:
+            return
+        now = time.monotonic()
+        if now - self._version_checked_at < self._version_check_interval:
+            return
+        self._version_checked_at = now
+        version = get_corpus_version()
+        if self._version is not None and version != self._version:
+            self._cache.clear()
+            self.invalidations += 1
+            logger.info(f"{self.name} cache cleared after corpus change")
+        self._version = version
+
+    def get_many(self, model_name: str, keys: List[Hashable]) -> Dict[Hashable, object]:
+        """Return the cached values for the keys that are present."""
+        found = {}
+        with self._lock:
+            self._ensure_current()
+            for key in keys:
+                value = self._cache.get((model_name, key))
+                if value is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    found[key] = value
+        return found
+
+    def get(self, model_name: str, key: Hashable):
+        return self.get_many(model_name, [key]).get(key)
+
+    def set(self, model_name: str, key: Hashable, value):
+        with self._lock:
+            self._cache[(model_name, key)] = value
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+# Query vectors depend only on the model and the query text, never on the corpus
+query_embedding_cache = ModelCache(
+    "query_embedding",
+    maxsize=settings.QUERY_EMBEDDING_CACHE_SIZE,
+    ttl=settings.MODEL_CACHE_TTL,
+    corpus_dependent=False,
+)
+rerank_score_cache = ModelCache(
+    "rerank_score",
+    maxsize=settings.RERANK_SCORE_CACHE_SIZE,
+    ttl=settings.MODEL_CACHE_TTL,
+)
+
+
+def rerank_cache_key(query: str, text: str) -> Tuple[str, str]:
+    """(query hash, chunk hash) over normalized text."""
+    return (
+        hashlib.md5(normalize_text(query).encode("utf-8")).hexdigest(),
+        hashlib.md5(normalize_text(text).encode("utf-8")).hexdigest(),
+    )
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper that serves repeated query embeddings from query_embedding_cache."""
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: ModelCache = query_embedding_cache):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_text(text)
+        vector = self.cache.get(self.model_name, key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.set(self.model_name, key, vector)
+        return list(vector)
+
+
+SHARED_SCOPE = "shared"
+
+
+def user_scope(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+class SemanticAnswerCache:
+    """
+    Answers to previous questions, bucketed by (organization, category, ACL scope).
+
+    Answers built only from shared chunks go to the SHARED_SCOPE bucket and can be
+    served to anyone in the category; answers that used PRIVATE_DRIVE chunks are
+    only served back to their owner. Each entry records the category's corpus
+    version and is ignored once a document in that category is indexed or deleted.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, threshold: float, max_buckets: int = 1024):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._buckets = TTLCache(maxsize=max_buckets, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, organization_id: str, category: str, user_id: str, embedding: Sequence[float]) -> Optional[Dict]:
+        """Best cached result whose question is at least `threshold` cosine-similar, or None."""
+        version = get_corpus_version(category)
+        query = self._normalize(embedding)
+        best, best_score = None, self.threshold
+
+        with self._lock:
+            for scope in (SHARED_SCOPE, user_scope(user_id)):
+                bucket = self._buckets.get((organization_id, category, scope))
+                if not bucket:
+                    continue
+                for key, entry in list(bucket.items()):
+                    if entry["version"] != version:
+                        del bucket[key]
+                        self.stale += 1
+                        continue
+                    score = float(np.dot(entry["embedding"], query))
+                    if score >= best_score:
+                        best, best_score = entry, score
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        logger.info(f"Answer cache hit for '{best['question']}' (similarity {best_score:.3f})")
+        return {"answer": best["answer"], "sources": best["sources"]}
+
+    def store(self, organization_id: str, category: str, scope: str, question: str,
+              embedding: Sequence[float], version: str, result: Dict):
+        """Remember an answer; version must be the corpus version read before retrieval started."""
+        entry = {
+            "question": question,
+            "embedding": self._normalize(embedding),
+            "version": version,
+            "answer": result["answer"],
+            "sources": result["sources"],
+        }
+        bucket_key = (organization_id, category, scope)
+        with self._lock:
+            bucket = self._buckets.get(bucket_key)
+            if bucket is None:
+                bucket = TTLCache(maxsize=self.maxsize, ttl=self.ttl)
+            bucket[normalize_text(question)] = entry
+            # Re-inserting refreshes the bucket's own TTL
+            self._buckets[bucket_key] = bucket
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "name": "semantic_answer",
+                "buckets": len(self._buckets),
+                "size": sum(len(bucket) for bucket in self._buckets.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "stale_evictions": self.stale,
+            }
+
+
+answer_cache = SemanticAnswerCache(
+    maxsize=settings.ANSWER_CACHE_SIZE,
+    ttl=settings.ANSWER_CACHE_TTL,
+    threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+)
+
+
+def cache_stats() -> List[Dict]:
+    return [query_embedding_cache.stats(), rerank_score_cache.stats(), answer_cache.stats()]
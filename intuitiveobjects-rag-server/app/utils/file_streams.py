@@ -0,0 +1,111 @@
+import asyncio
+import hashlib
+from typing import BinaryIO, Dict, Optional, Tuple
+from bson import ObjectId
+from fastapi import UploadFile
+from googleapiclient.http import MediaIoBaseDownload
+from app.core.config import settings
+from app.db.mongodb import get_fs
+
+
+class UploadTooLarge(Exception):
+    """The upload passed the size limit while it was being streamed."""
+
+
+class HashingWriter:
+    """File-like wrapper that hashes and counts bytes as they are written through it."""
+
+    def __init__(self, fd: BinaryIO):
+        self.fd = fd
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.fd.write(data)
+
+    def digest(self) -> Dict:
+        return {"sha256": self.sha256.hexdigest(), "size": self.size}
+
+
+def download_drive_file(drive_service, file_id: str, fd: BinaryIO) -> Dict:
+    """
+    Blocking chunked Google Drive download into fd; run it in a thread.
+    Returns {"sha256", "size"} computed while the bytes stream through.
+    """
+    writer = HashingWriter(fd)
+    request = drive_service.files().get_media(fileId=file_id)
+    downloader = MediaIoBaseDownload(writer, request, chunksize=settings.STREAM_CHUNK_SIZE)
+    done = False
+    while not done:
+        status, done = downloader.next_chunk()
+        if status:
+            print(f"Download progress: {int(status.progress() * 100)}%")
+    fd.seek(0)
+    return writer.digest()
+
+
+async def upload_to_gridfs(filename: str, fd: BinaryIO, metadata: Dict) -> ObjectId:
+    """Upload fd to GridFS chunk by chunk; the file is never read into memory whole."""
+    grid_in = get_fs().open_upload_stream(
+        filename, chunk_size_bytes=settings.STREAM_CHUNK_SIZE, metadata=metadata
+    )
+    try:
+        while True:
+            chunk = await asyncio.to_thread(fd.read, settings.STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            await grid_in.write(chunk)
+    except Exception:
+        await grid_in.abort()
+        raise
+    await grid_in.close()
+    return grid_in._id
+
+
+async def download_from_gridfs(gridfs_id, fd: BinaryIO) -> Dict:
+    """
+    Stream a GridFS file into fd one stored chunk at a time.
+    Returns {"sha256", "size"}; fd is rewound to the start.
+    """
+    grid_out = await get_fs().open_download_stream(ObjectId(gridfs_id))
+    writer = HashingWriter(fd)
+    while True:
+        chunk = await grid_out.readchunk()
+        if not chunk:
+            break
+        await asyncio.to_thread(writer.write, chunk)
+    await asyncio.to_thread(fd.flush)
+    fd.seek(0)
+    return writer.digest()
+
+
+async def stream_upload_to_gridfs(
+    file: UploadFile, metadata: Dict, max_size: Optional[int] = None
+) -> Tuple[object, Dict]:
+    """
+    Pipe a multipart upload into GridFS chunk by chunk, hashing as it goes.
+    Returns (grid_in, {"sha256", "size"}) with grid_in still open, so the caller
+    can abort() it (e.g. a duplicate) or close() it to commit the file.
+    Raises UploadTooLarge, after aborting the partial file, once max_size is passed.
+    """
+    grid_in = get_fs().open_upload_stream(
+        file.filename, chunk_size_bytes=settings.STREAM_CHUNK_SIZE, metadata=metadata
+    )
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await file.read(settings.STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if max_size is not None and size > max_size:
+                raise UploadTooLarge(file.filename)
+            sha256.update(chunk)
+            await grid_in.write(chunk)
+    except Exception:
+        await grid_in.abort()
+        raise
+    return grid_in, {"sha256": sha256.hexdigest(), "size": size}
@@ -79,17 +79,44 @@
 import ollama
 from typing import List, Dict, Any
 import json
+import asyncio
 import logging
+import weakref
 import re
-from app.db.mongodb import organization_user_collection, category_collection
-
-# Add these imports:
-from bson.objectid import ObjectId
-from app.services.organization_admin_services import get_updated_app_config
+from app.services.user_context_service import get_user_context
+from app.core.executors import stage_slot
 
 logger = logging.getLogger(__name__)
 model_name = "qwen3:8b"
 
+# Async Ollama clients so LLM calls never block the event loop; the underlying httpx
+# client is bound to the loop it was created on, so each event loop gets its own
+_ollama_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ollama.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_ollama_client() -> ollama.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _ollama_clients.get(loop)
+    if client is None:
+        client = ollama.AsyncClient()
+        _ollama_clients[loop] = client
+    return client
+
+
+async def chat_completion(stage: str = "generation", **kwargs):
+    """Call ollama chat asynchronously, bounded by the stage's concurrency limit."""
+    async with stage_slot(stage):
+        return await get_ollama_client().chat(**kwargs)
+
+
+async def chat_completion_stream(**kwargs):
+    """Stream ollama chat chunks as they are generated, holding one generation slot."""
+    async with stage_slot("generation"):
+        async for part in await get_ollama_client().chat(stream=True, **kwargs):
+            yield part
+
 
 def remove_think_tag(text: str) -> str:
     return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL)
@@ -100,10 +127,8 @@ async def expand_user_query(conversation: List[Dict[str, Any]], user_question: s
     Expand user query using Ollama LLM with ONLY relevant conversation info,
     not the full message list.
     """
-    existing_user = await organization_user_collection().find_one({"_id": ObjectId(user_id)})
-    organization_id = existing_user.get("organization_id")
-    config = await get_updated_app_config(organization_id)
-    model_name = config.get("query_model", "qwen3:8b")
+    user_context = await get_user_context(user_id, with_config=True)
+    model_name = user_context["app_config"].get("query_model", "qwen3:8b")
     print(f"model_name in expand_user_query: {model_name}")
     # Extract only the minimal useful context (names/entities)
     # NOT full messages
@@ -149,7 +174,7 @@ Output ONLY the final expanded question.
 
     print("[expand_user_query] Messages sent to Ollama:", messages)
 
-    response = ollama.chat(
+    response = await chat_completion(
         model=model_name,
         messages=messages,
         stream=False
@@ -0,0 +1,142 @@
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, List
+import bson
+from pymongo import UpdateOne
+from app.core.config import settings
+from app.db.mongodb import page_cache_collection
+
+logger = logging.getLogger(__name__)
+
+# Entry kinds
+PAGE_MARKDOWN = "markdown"        # key: sha256 of the single-page PDF bytes
+PAGE_SECTIONS = "sections"        # key: sha256 of the page Markdown
+WINDOW_TAGS = "tags"              # key: sha256 of the tag window text + requested tags
+CHUNK_EMBEDDING = "embedding"     # key: sha256 of the chunk text
+
+
+def content_hash(data) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class PageCache:
+    """
+    Mongo-backed cache of per-page work, keyed by content hash plus the model that produced it.
+
+    A re-ingested or revised document only pays for the pages, windows and chunks whose
+    content changed. Entries record their BSON size; every `evict_every` writes the total
+    is checked and the least recently used entries are removed until it fits `max_bytes`.
+    Shared by every worker process through the database.
+    """
+
+    def __init__(self, max_bytes: int, evict_every: int, enabled: bool = True):
+        self.max_bytes = max_bytes
+        self.evict_every = max(1, evict_every)
+        self.enabled = enabled
+        self._writes_since_check = 0
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.evicted = 0
+
+    @staticmethod
+    def _id(kind: str, model: str, key: str) -> str:
+        return f"{kind}:{model}:{key}"
+
+    async def get_many(self, kind: str, model: str, keys: List[str]) -> Dict[str, object]:
+        """Cached values for the keys that are present; hits refresh their LRU timestamp."""
+        if not self.enabled or not keys:
+            return {}
+        ids = {self._id(kind, model, key): key for key in set(keys)}
+        found = {}
+        try:
+            async for entry in page_cache_collection().find({"_id": {"$in": list(ids)}}, {"value": 1}):
+                found[ids[entry["_id"]]] = entry["value"]
+            if found:
+                await page_cache_collection().update_many(
+                    {"_id": {"$in": [self._id(kind, model, key) for key in found]}},
+                    {"$set": {"last_used_at": datetime.now()}},
+                )
+        except Exception as e:
+            # The cache only saves work; never fail ingestion because of it
+            logger.warning(f"Page cache lookup failed: {e}")
+            return {}
+        self.hits[kind] = self.hits.get(kind, 0) + len(found)
+        self.misses[kind] = self.misses.get(kind, 0) + len(ids) - len(found)
+        return found
+
+    async def get(self, kind: str, model: str, key: str):
+        return (await self.get_many(kind, model, [key])).get(key)
+
+    async def set_many(self, kind: str, model: str, values: Dict[str, object]):
+        if not self.enabled or not values:
+            return
+        now = datetime.now()
+        operations = []
+        for key, value in values.items():
+            entry = {
+                "kind": kind,
+                "model": model,
+                "value": value,
+                "created_at": now,
+                "last_used_at": now,
+            }
+            entry["size_bytes"] = len(bson.encode(entry))
+            operations.append(UpdateOne({"_id": self._id(kind, model, key)}, {"$set": entry}, upsert=True))
+        try:
+            await page_cache_collection().bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.warning(f"Page cache write failed: {e}")
+            return
+
+        self._writes_since_check += len(operations)
+        if self._writes_since_check >= self.evict_every:
+            self._writes_since_check = 0
+            await self.evict()
+
+    async def set(self, kind: str, model: str, key: str, value):
+        await self.set_many(kind, model, {key: value})
+
+    async def total_bytes(self) -> int:
+        result = await page_cache_collection().aggregate(
+            [{"$group": {"_id": None, "bytes": {"$sum": "$size_bytes"}}}]
+        ).to_list(length=1)
+        return result[0]["bytes"] if result else 0
+
+    async def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes."""
+        try:
+            excess = await self.total_bytes() - self.max_bytes
+            if excess <= 0:
+                return
+            doomed = []
+            cursor = page_cache_collection().find({}, {"size_bytes": 1}).sort("last_used_at", 1)
+            async for entry in cursor:
+                doomed.append(entry["_id"])
+                excess -= entry.get("size_bytes", 0)
+                if excess <= 0:
+                    break
+            await page_cache_collection().delete_many({"_id": {"$in": doomed}})
+            self.evicted += len(doomed)
+            logger.info(f"Page cache evicted {len(doomed)} entries")
+        except Exception as e:
+            logger.warning(f"Page cache eviction failed: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "name": "page_cache",
+            "enabled": self.enabled,
+            "max_bytes": self.max_bytes,
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "evicted": self.evicted,
+        }
+
+
+page_cache = PageCache(
+    max_bytes=settings.PAGE_CACHE_MAX_BYTES,
+    evict_every=settings.PAGE_CACHE_EVICT_EVERY,
+    enabled=settings.PAGE_CACHE_ENABLED,
+)
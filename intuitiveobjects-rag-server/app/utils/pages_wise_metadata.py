@@ -1,14 +1,13 @@
 import re
 import asyncio
+import time
 import ast
 import pickle
-from typing import List, Dict, Optional, Iterator, AsyncIterator
+from typing import List, Dict, Optional, AsyncIterator
 from pathlib import Path
-import ollama
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 # from langchain_community.vectorstores import Chroma
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+from app.pipeline.embedding_engine import EmbeddingEngine
 from langchain_core.documents import Document
 import os
 import logging
@@ -16,21 +15,35 @@ logging.getLogger("chromadb").setLevel(logging.WARNING) # Suppress ChromaDB logs
 from langchain_community.llms import Ollama
 from langchain.chains import RetrievalQA
 # from langchain_chroma import Chroma
-from datetime import datetime
 from bson import ObjectId
-from app.db.mongodb import document_collection,organization_file_collection, connect_to_mongodb
-from app.core.rabbitmq_client import rabbitmq_client
+from app.db.mongodb import document_collection, connect_to_mongodb
 import json
 from app.core.config import settings
-from app.services.organization_admin_services import get_updated_app_config,get_organization_app_configs
-from pathlib import Path
+from app.services.user_context_service import get_user_context, get_app_config
+from app.services.document_lifecycle import transition
+from app.core.notification_hub import publish_notification
+from app.pipeline.section_tracker import SectionTracker, parse_headings, extractive_summary
+from app.utils.page_cache import page_cache, content_hash, PAGE_SECTIONS, WINDOW_TAGS, CHUNK_EMBEDDING
+from app.pipeline.tag_extraction import normalize_tags, group_pages_by_file, build_page_windows, merge_tag_votes
+from app.utils.vector_store import VectorStoreManager, PERSIST_DIRECTORY
+from app.core.executors import run_in_stage
+from app.utils.llm import chat_completion, chat_completion_stream
+from app.pipeline.keyword_search.bm25_index import bm25_index
+from app.utils.cache import (
+    CachedQueryEmbeddings,
+    rerank_score_cache,
+    rerank_cache_key,
+    bump_corpus_version,
+    get_corpus_version,
+    answer_cache,
+    SHARED_SCOPE,
+    user_scope,
+)
 BM25_STORE = "app/pipeline/bm25_store"
 Path(BM25_STORE).mkdir(parents=True, exist_ok=True)
 from sentence_transformers import CrossEncoder, SentenceTransformer
-from app.db.mongodb import organization_user_collection, category_collection
 from rank_bm25 import BM25Okapi
 import nltk
-from sentence_transformers import util
 from nltk.tokenize import sent_tokenize, word_tokenize
 from nltk.corpus import stopwords
 nltk.download("punkt")          # sentence & word tokenization
@@ -40,8 +53,10 @@ stop_words = set(stopwords.words("english"))
 import torch
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 print(f"\nLoading models on {DEVICE.upper()}...")
+RERANKER_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 reranker_model = CrossEncoder(
-    "cross-encoder/ms-marco-MiniLM-L-6-v2",
+    RERANKER_MODEL_NAME,
     cache_folder="./models/cross_encoder",
     device=DEVICE
 )
@@ -52,9 +67,6 @@ sentence_transformer = SentenceTransformer(
     device=DEVICE
 )
 
-# Define the directory for ChromaDB persistence
-PERSIST_DIRECTORY = "chromadb_storage"
-
 class PDFProcessor:
     def __init__(self,  persist_directory=PERSIST_DIRECTORY):
 
@@ -65,16 +77,18 @@ class PDFProcessor:
             self.chunk_size = 1000
             self.overlap = 150
             self.embedding_model = self._load_embedding_model()
-            self.vectorstore = None  # Will be initialized when saving documents
+            # Shared by ingestion and querying; opened lazily, reopened after a reset
+            self.vector_store = VectorStoreManager(self.embedding_model, persist_directory=persist_directory)
     
     
     def _load_embedding_model(self):
-        """Load the embedding model for vector storage."""
-        return HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
+        """Load the embedding model for vector storage (query embeddings are cached)."""
+        embeddings = EmbeddingEngine(
+            EMBEDDING_MODEL_NAME,
             cache_folder="./models/embeddings",
-            model_kwargs={'device': DEVICE}  # Use GPU if available
+            device=DEVICE  # Use GPU if available
         )
+        return CachedQueryEmbeddings(embeddings, model_name=embeddings.cache_model())
 
     def _numeric_sort_key(self, filename: Path) -> float:
         """Extract page number for numeric sorting of filenames."""
@@ -88,10 +102,19 @@ class PDFProcessor:
             return float('inf')
 
 
+    def _read_markdown(self, md_file: Path) -> str:
+        with open(md_file, "r", encoding="utf-8") as f:
+            return f.read().strip()
+
     async def create_metadata(self,folder_path: str,category: str,tags: List[str],doc_id: str,user_id: str,source_type ,force_reprocess: bool = True) -> AsyncIterator[Dict]:
-        """Extract text and contextual metadata from Markdown files in a folder or subfolders."""
+        """
+        Extract text and contextual metadata from Markdown files in a folder or subfolders.
+
+        Section titles come from the pages' Markdown headings via SectionTracker. Only
+        pages without headings (or every page, with METADATA_LLM_SUMMARIES) go to the
+        LLM, concurrently, METADATA_CONCURRENCY calls at a time.
+        """
         pages = []
-        last_metadata = None
         folder_path = Path(folder_path)
 
         subfolders = [f for f in folder_path.iterdir() if f.is_dir()]
@@ -99,96 +122,123 @@ class PDFProcessor:
         # Choose iteration target
         folder_targets = sorted(subfolders) if subfolders else [folder_path]
 
+        async def read_page(md_file: Path) -> Optional[Dict]:
+            try:
+                text = await asyncio.to_thread(self._read_markdown, md_file)
+            except Exception as e:
+                logging.error(f"Error processing file {md_file}: {e}")
+                return None
+            return {
+                "md_file": md_file, "text": text, "headings": parse_headings(text),
+                "hash": content_hash(text), "llm": None,
+            }
+
+        async def analyse(page: Dict):
+            page["llm"] = await self._extract_page_sections(page["text"])
+
+        async def publish_progress():
+            # Per-page progress; the API coalesces these per document. Best effort:
+            # a broker hiccup must not fail the document
+            try:
+                await publish_notification({
+                    "event_type": "document_notify",
+                    "doc_id": doc_id,
+                    "user_id": user_id,
+                })
+            except Exception as e:
+                logging.warning(f"Failed to publish progress for {doc_id}: {e}")
+
         for target_folder in folder_targets:
             md_files = sorted(target_folder.glob("*.md"), key=self._numeric_sort_key)
-            subfolder_pages = []
+            start = time.perf_counter()
+            read = await asyncio.gather(*(read_page(md_file) for md_file in md_files))
+            read = [page for page in read if page]
+
+            # Unchanged pages reuse their earlier LLM result (keyed by Markdown hash + model)
+            needs_llm = [page for page in read if settings.METADATA_LLM_SUMMARIES or not page["headings"]]
+            cached = await page_cache.get_many(PAGE_SECTIONS, settings.METADATA_MODEL, [page["hash"] for page in needs_llm])
+            for page in needs_llm:
+                page["llm"] = cached.get(page["hash"])
+            misses = [page for page in needs_llm if page["llm"] is None]
+
+            # stage_slot("metadata") inside the LLM call bounds how many run at once
+            await asyncio.gather(*(analyse(page) for page in misses))
+            await page_cache.set_many(
+                PAGE_SECTIONS, settings.METADATA_MODEL,
+                {page["hash"]: page["llm"] for page in misses if not page["llm"].get("failed")},
+            )
+            logging.info(
+                f"Section metadata for {len(read)} pages of {target_folder.name}: "
+                f"{len(misses)} LLM calls ({len(needs_llm) - len(misses)} cached) in {time.perf_counter() - start:.1f}s"
+            )
 
-            for i, md_file in enumerate(md_files, 1):
-                try:
-                    with open(md_file, "r", encoding="utf-8") as f:
-                        batch = f.read().strip()
-
-                    content = self._extract_section_title_with_context(last_metadata, batch)
-                    last_metadata = content
-                    print(content)
-                    tables = self._extract_tables_from_markdown(batch)
-
-                    title = content.get("title", "Untitled").strip() or "Untitled"
-                    section_title = content.get("section_title", "").strip() or title
-                    page_data = {
-                        "section_num": i,
-                        "category": category,
-                        "source_type": source_type,
-                        "user_id": user_id,
-                        "title": title,
-                        "section_title": section_title,
-                        "summary": content.get("summary", "Content available").strip(),
-                        "text": batch,
-                        "source": str(md_file),
-                        "format": "markdown",
-                        "tables": tables,
-                    }
-                    await rabbitmq_client.send_message(
-                        settings.NOTIFY_QUEUE,
-                        json.dumps({
-                            "event_type": "document_notify",
-                            "doc_id": doc_id,
-                            "user_id": user_id,
-                        })
-                    )
-
-                    subfolder_pages.append(page_data)
-                    yield page_data
-
-                except Exception as e:
-                    logging.error(f"Error processing file {md_file}: {e}")
-                    continue
-            last_metadata = None
+            # Headings carry the section hierarchy across pages, in page order
+            tracker = SectionTracker()
+            subfolder_pages = []
+            for i, page in enumerate(read, 1):
+                batch = page["text"]
+                llm = page["llm"] or {}
+                if page["headings"]:
+                    tracker.observe_headings(page["headings"])
+                    content = tracker.current([title for _, title in page["headings"]])
+                else:
+                    tracker.observe_titles(llm.get("titles", []))
+                    content = tracker.current(llm.get("titles"))
+                content["summary"] = llm.get("summary") or extractive_summary(batch)
+                tables = self._extract_tables_from_markdown(batch)
+
+                title = content.get("title", "Untitled").strip() or "Untitled"
+                section_title = content.get("section_title", "").strip() or title
+                page_data = {
+                    "section_num": i,
+                    "doc_id": doc_id,
+                    "category": category,
+                    "source_type": source_type,
+                    "user_id": user_id,
+                    "title": title,
+                    "section_title": section_title,
+                    "summary": content.get("summary", "Content available").strip(),
+                    "text": batch,
+                    "source": str(page["md_file"]),
+                    "format": "markdown",
+                    "tables": tables,
+                }
+                subfolder_pages.append(page_data)
+                await publish_progress()
+                yield page_data
             pages.extend(subfolder_pages)
 
         # Cache final processed pages
         self.processed_files[folder_path] = pages
-    def _extract_section_title_with_context(self, prev_metadata: Optional[Dict[str, str]], current_markdown: str) -> Dict[str, str]:
+
+    async def _extract_page_sections(self, current_markdown: str) -> Dict:
         """
-        Detect whether current markdown continues previous section or introduces a new one.
-        Returns concise title(s), section title, and contextual summary.
+        Ask the LLM for the section titles and summary of one page, without context
+        from other pages so pages can be analysed concurrently.
+        Returns {"titles", "summary"}; titles is empty when none were found.
         """
-
-        prev_title = prev_metadata.get("title") if prev_metadata else "None"
-        prev_summary = prev_metadata.get("summary") if prev_metadata else "None"
-        
-        if prev_title :
-            prev_title = prev_title.split(" > ")[-1]  # Get the last part of the hierarchical title
-
         # Build prompt using safe concatenation to avoid accidental interpretation of
         # literal braces inside f-strings (which causes "Invalid format specifier" errors).
         prompt = (
-            "You are analyzing two consecutive markdown pages extracted from a context.\n\n"
-            "Previous page metadata:\n"
-            "Title: " + str(prev_title) + "\n"
-            "Summary: " + str(prev_summary) + "\n\n"
+            "You are analyzing one markdown page extracted from a longer document.\n\n"
             "Current page markdown:\n'''"
             + current_markdown +
             "'''\n\n"
             "Rules:\n"
-            "1. If this page clearly continues the same section (same exam, same topic), keep the same title.\n"
-            "2. If it introduces a new section (e.g., new body part, new screening, or 'IMPRESSION'), include both titles:\n"
-            "- First: previous (if still relevant)\n"
-            "- Second: the new heading found on this page\n"
-            "3. If the page only has a new section unrelated to the previous, output only that new title.\n"
-            "4. Do NOT repeat older sections that are not relevant anymore.\n"
-            "5. Return valid JSON only in this format:\n\n"
+            "1. List the section titles introduced on this page, in order of appearance.\n"
+            "2. If the page has no section title of its own, return an empty list.\n"
+            "3. Do not invent titles that are not supported by the page.\n"
+            "4. Return valid JSON only in this format:\n\n"
             "{\n"
-            '"titles": ["relevant titles only"],\n'
-            '"section_title": "Most relevant section title on this page.",\n'
+            '"titles": ["section titles on this page"],\n'
             '"summary": "Brief 2–3 line summary of this page."\n'
             "}\n"
         )
 
-
         try:
-            response = ollama.chat(
-                model="gemma2:2b",
+            response = await chat_completion(
+                stage="metadata",
+                model=settings.METADATA_MODEL,
                 messages=[{"role": "user", "content": prompt}],
             )
 
@@ -209,18 +259,13 @@ class PDFProcessor:
                 titles = [titles]
 
             return {
-                "title": " > ".join(titles),
-                "section_title": result.get("section_title", titles[-1] if titles else "Untitled").strip(),
-                "summary": result.get("summary", "Content available").strip()
+                "titles": [str(t).strip() for t in titles if str(t).strip()],
+                "summary": str(result.get("summary") or "").strip(),
             }
 
         except Exception as e:
             logging.error(f"Error parsing LLM output: {e}")
-            return {
-                "title": prev_title if prev_title != "None" else "Untitled",
-                "section_title": prev_title if prev_title != "None" else "Untitled",
-                "summary": "Content available"
-            }
+            return {"titles": [], "summary": "", "failed": True}
 
     def _extract_tables_from_markdown(self, markdown_text: str) -> List[Dict]:
         """Extract markdown tables into structured dictionaries."""
@@ -236,25 +281,13 @@ class PDFProcessor:
         return tables
 
 
-    def _extract_dynamic_metadata(self,text: str,tags: List[str],model_name: str ) -> Dict[str, str]:
+    async def _extract_dynamic_metadata(self, text: str, tags: List[str], model_name: str) -> Dict:
             """
             Extract only the requested metadata tags from a given text using an LLM.
-            Returns a dict with tag names as keys and extracted values as strings.
-            # """
-            if not model_name:
-                print(f"model in config is null")
-                model_name = "phi4-mini:3.8b"
-            # Normalize tag list (handle comma-separated input)
-            print(f"model_name in _extract_dynamic_metadata: {model_name}")
-            normalized_tags = []
-            for tag in tags:
-                if "," in tag:
-                    normalized_tags.extend([t.strip() for t in tag.split(",")])
-                else:
-                    normalized_tags.append(tag)
-            tags = normalized_tags
-
+            Returns {"values": {tag: value}, "prompt_tokens", "completion_tokens"}.
+            """
             default_metadata = {tag: "Unknown" for tag in tags}
+            usage = {"values": default_metadata, "prompt_tokens": 0, "completion_tokens": 0, "failed": True}
 
             # Build the instruction string dynamically
             tag_instructions = "\n".join(
@@ -281,13 +314,17 @@ class PDFProcessor:
             """
 
             try:
-                response = ollama.chat(
+                response = await chat_completion(
+                    stage="metadata",
                     model=model_name,
                     messages=[
                         {"role": "system", "content": "You are a strict JSON metadata extractor. Output only valid JSON with the requested keys."},
                         {"role": "user", "content": prompt},
                     ],
                 )
+                # Ollama reports token counts; fall back to a chars/4 estimate
+                usage["prompt_tokens"] = response.get("prompt_eval_count") or len(prompt) // 4
+                usage["completion_tokens"] = response.get("eval_count") or 0
 
                 raw_output = (
                     response.get("message", {}).get("content")
@@ -307,7 +344,7 @@ class PDFProcessor:
                     metadata = json.loads(raw_output)
                 except Exception:
                     logging.warning(f"Model returned invalid JSON. Output:\n{raw_output}")
-                    return default_metadata
+                    return usage
 
                 # Keep only requested tags and fill missing ones
                 clean_metadata = {}
@@ -317,11 +354,65 @@ class PDFProcessor:
                         value = json.dumps(value, ensure_ascii=False)
                     clean_metadata[tag] = str(value).strip() or "Unknown"
 
-                return clean_metadata
+                usage["values"] = clean_metadata
+                usage["failed"] = False
+                return usage
 
             except Exception as e:
                 logging.error(f"Metadata extraction failed: {e}")
-                return default_metadata
+                return usage
+
+    async def extract_file_tags(self, pages: List[Dict], tags: List[str], model_name: str) -> Dict:
+        """
+        Map-reduce tag extraction over the pages create_metadata already loaded.
+
+        Each file (each ZIP member folder) is packed into page windows of TAG_WINDOW_CHARS,
+        sampled down to TAG_MAX_WINDOWS; windows are sent concurrently and their values
+        merged by vote. Returns {"file_metadata": {folder: {tag: value}}, "stats": {...}}.
+        """
+        if not model_name:
+            print(f"model in config is null")
+            model_name = "phi4-mini:3.8b"
+        tags = normalize_tags(tags)
+        stats = {"files": 0, "windows": 0, "cached_windows": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        if not tags:
+            return {"file_metadata": {}, "stats": stats}
+
+        start = time.perf_counter()
+        groups = group_pages_by_file(pages)
+        windows = {
+            folder: build_page_windows(folder_pages, settings.TAG_WINDOW_CHARS, settings.TAG_MAX_WINDOWS)
+            for folder, folder_pages in groups.items()
+        }
+        jobs = [(folder, window) for folder, folder_windows in windows.items() for window in folder_windows]
+
+        # Windows seen before with the same tags and model are not sent again
+        keys = [content_hash(window + "\n" + ",".join(tags)) for _, window in jobs]
+        cached = await page_cache.get_many(WINDOW_TAGS, model_name, keys)
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        fresh = await asyncio.gather(
+            *(self._extract_dynamic_metadata(jobs[i][1], tags=tags, model_name=model_name) for i in missing)
+        )
+        await page_cache.set_many(
+            WINDOW_TAGS, model_name,
+            {keys[i]: result["values"] for i, result in zip(missing, fresh) if not result["failed"]},
+        )
+        fresh_by_key = {keys[i]: result for i, result in zip(missing, fresh)}
+        results = [
+            fresh_by_key.get(key) or {"values": cached[key], "prompt_tokens": 0, "completion_tokens": 0}
+            for key in keys
+        ]
+
+        votes: Dict[str, List[Dict]] = {folder: [] for folder in windows}
+        for (folder, _), result in zip(jobs, results):
+            votes[folder].append(result["values"])
+            stats["prompt_tokens"] += result["prompt_tokens"]
+            stats["completion_tokens"] += result["completion_tokens"]
+
+        file_metadata = {folder: merge_tag_votes(values, tags) for folder, values in votes.items()}
+        stats.update(files=len(groups), windows=len(jobs), cached_windows=len(jobs) - len(missing), duration_ms=round((time.perf_counter() - start) * 1000, 1))
+        logging.info(f"Extracted tags with {model_name}: {stats}")
+        return {"file_metadata": file_metadata, "stats": stats}
 
     def _generate_chunk_name(self, chunk_text: str) -> str:
         """Generate a descriptive name for a chunk."""
@@ -332,62 +423,11 @@ class PDFProcessor:
         first_sentence = re.split(r'(?<=[.!?])\s+', chunk_text.strip())[0]
         return first_sentence if len(first_sentence) < 50 else chunk_text.strip()[:50] + "..."
 
-    def create_chunks(self, folder_path: str, tags: List[str],model_name: str, pages: List[Dict]) -> List[Document]:
-        """Chunk extracted pages for vector storage with hierarchical metadata."""
-        
-        # Extract file-level metadata
-        file_metadata = {}
-        
-        # Check if the folder has subfolders (ZIP case)
-        subfolders = [f for f in Path(folder_path).iterdir() if f.is_dir()]
-        
-        if subfolders:
-            # ZIP file case - handle each subfolder
-            try:
-                subfolder_metadata = {}
-                for subfolder in subfolders:
-                    combined_text = ""
-                    md_files = sorted(subfolder.glob("*.md"))
-                    
-                    # Only process if folder contains markdown files
-                    if not list(md_files):
-                        continue
-                        
-                    # Combine all text from the subfolder
-                    for md_file in sorted(subfolder.glob("*.md")):
-                        try:
-                            with open(md_file, "r", encoding="utf-8") as f:
-                                combined_text += f.read() + "\n\n"
-                        except Exception as e:
-                            logging.error(f"Error reading file {md_file}: {e}")
-                            continue
-                    
-                    if combined_text.strip():  # Only process if there's actual content
-                        metadata = self._extract_dynamic_metadata(combined_text, tags=tags, model_name=model_name)
-                        subfolder_metadata[str(subfolder)] = metadata
-                        logging.info(f"Extracted metadata for subfolder {subfolder.name}")
-                    
-                file_metadata = subfolder_metadata
-                
-            except Exception as e:
-                logging.error(f"Error processing ZIP subfolders: {e}")
-                file_metadata = {}
-                
-        else:
-            # Single file case
-            try:
-                combined_text = ""
-                for md_file in sorted(Path(folder_path).glob("*.md")):
-                    with open(md_file, "r", encoding="utf-8") as f:
-                        combined_text += f.read() + "\n\n"
-                        
-                if combined_text.strip():
-                    file_metadata = self._extract_dynamic_metadata(combined_text, tags=tags , model_name=model_name)
-                    logging.info("Extracted metadata for single file")
-                    
-            except Exception as e:
-                logging.error(f"Error extracting metadata from single file: {e}")
-                file_metadata = {}
+    def create_chunks(self, pages: List[Dict], file_metadata: Dict[str, Dict]) -> List[Document]:
+        """
+        Chunk extracted pages for vector storage with hierarchical metadata.
+        file_metadata maps a page's folder to its file-level tags (see extract_file_tags).
+        """
 
         # Create text splitter for chunking
         text_splitter = RecursiveCharacterTextSplitter(
@@ -404,8 +444,7 @@ class PDFProcessor:
             parent_folder = str(source_path.parent)
             
             # Get appropriate metadata
-            metadata = (file_metadata.get(parent_folder, file_metadata) 
-                    if isinstance(file_metadata, dict) else {})
+            metadata = file_metadata.get(parent_folder, {})
             
             # Create chunks
             split_texts = text_splitter.split_text(page['text'])
@@ -419,6 +458,7 @@ class PDFProcessor:
                     'section_title': str(page.get('section_title', '')),
                     'section_num': str(page.get('section_num', '')),
                     'chunk_id': len(documents),
+                    'doc_id': str(page.get('doc_id', '')),
                     'source': str(page['source']),
                     'source_type': str(page.get('source_type', 'unknown')),
                     'user_id' : str(page.get('user_id', 'unknown')).strip().lower(),
@@ -444,25 +484,34 @@ class PDFProcessor:
 
         return documents
             
-    def save_to_chroma(self, chunks: List[Document]):
-        """Store processed chunks into ChromaDB."""
+    async def embed_chunks(self, chunks: List[Document]) -> List[List[float]]:
+        """
+        Embeddings for the chunks, aligned with them. Chunks whose text was embedded before
+        (same hash, same model) come from the page cache; the rest are computed off the loop.
+        """
+        keys = [content_hash(chunk.page_content) for chunk in chunks]
+        # Keyed on backend/quantization/normalization too, so changed settings never mix vectors
+        cache_model = self.embedding_model.embeddings.cache_model()
+        cached = await page_cache.get_many(CHUNK_EMBEDDING, cache_model, keys)
+        missing = {key: chunk.page_content for key, chunk in zip(keys, chunks) if key not in cached}
+        if missing:
+            vectors = await asyncio.to_thread(self.embedding_model.embed_documents, list(missing.values()))
+            computed = {key: list(vector) for key, vector in zip(missing, vectors)}
+            await page_cache.set_many(CHUNK_EMBEDDING, cache_model, computed)
+            cached.update(computed)
+        logging.info(f"Embeddings for {len(chunks)} chunks: {len(missing)} computed, {len(chunks) - len(missing)} cached")
+        return [cached[key] for key in keys]
+
+    def save_to_chroma(self, chunks: List[Document], embeddings: Optional[List[List[float]]] = None):
+        """Store processed chunks into ChromaDB, with precomputed embeddings when given."""
         try:
-            # Ensure the persist directory exists
-            if not os.path.exists(self.persist_directory):
-                os.makedirs(self.persist_directory)
-
-            # Create new collection and add documents
-            vectorstore = Chroma.from_documents(
-                documents=chunks,
-                collection_name="rag-chroma",
-                embedding=self.embedding_model,
-                persist_directory=self.persist_directory
-            )
-
-            # Store the vectorstore reference
-            self.vectorstore = vectorstore
+            # Add documents through the shared collection handle
+            if embeddings is None:
+                self.vector_store.run(lambda store: store.add_documents(chunks))
+            else:
+                self.vector_store.add_documents_with_embeddings(chunks, embeddings)
 
-            logging.info(f"Successfully saved {len(chunks)} chunks to ChromaDB at {self.persist_directory}")
+            logging.info(f"Successfully saved {len(chunks)} chunks to ChromaDB at {self.persist_directory} {self.vector_store.stats()}")
 
         except Exception as e:
             logging.error(f"Error saving to ChromaDB: {str(e)}")
@@ -558,6 +607,7 @@ class PDFProcessor:
                 logging.info(f"BM25 index saved to {file_path}")
             except Exception as e:
                 logging.error(f"Failed to save BM25 index: {e}")
+            return file_path
 
 
     async def index_pdf(self, folder_path: str, category: str, doc_id: str, user_id: str, tags: List[str], source_type ,force_reindex: bool = False): 
@@ -587,32 +637,7 @@ class PDFProcessor:
             except Exception as e:
                 raise Exception(f"Error in metadata extraction: {str(e)}")
 
-            await document_collection().update_one(
-                {"_id": ObjectId(doc_id)},
-                {
-                    "$set": {
-                        "current_stage": "TEXT_CHUNKS_CREATION_STARTED",
-                        "updated_at": datetime.now(),
-                    },
-                    "$push": {
-                        "status_history": {
-                            "stage": "TEXT_CHUNKS_CREATION_STARTED",
-                            "status": "completed",
-                            "timestamp": datetime.now(),
-                            "error_message": None,
-                            "retry_count": 0
-                        }
-                    }
-                }
-            )
-            await rabbitmq_client.send_message(
-                settings.NOTIFY_QUEUE,
-                json.dumps({
-                    "event_type": "document_notify",
-                    "doc_id": doc_id,
-                    "user_id": user_id,
-                })
-            )   
+            await transition(doc_id, "TEXT_CHUNKS_CREATION_STARTED", user_id)
              # Fetch document to get organization_id
             doc_result = await document_collection().find_one({"_id": ObjectId(doc_id)})
             if not doc_result:
@@ -623,11 +648,15 @@ class PDFProcessor:
                 raise ValueError(f"Document {doc_id} has no organization_id")
 
             #configure model per user org settings
-            config = await get_updated_app_config(organization_id)
+            config = await get_app_config(organization_id)
             model_name = config.get("tags_model")
+            # File-level tags from the pages already in memory
+            tag_result = await self.extract_file_tags(processed_pages, tags, model_name)
+
             # Create chunks
             try:
-                chunks = self.create_chunks(folder_path, tags, model_name, processed_pages)
+                # Chunking is CPU-bound; keep it off the loop so other job slots keep running
+                chunks = await asyncio.to_thread(self.create_chunks, processed_pages, tag_result["file_metadata"])
                 for i, doc in enumerate(chunks, start=1):
                     print(f"\n--- Chunk {i} ---")
                     print("ID:", doc.metadata.get("chunk_id", None))
@@ -640,27 +669,11 @@ class PDFProcessor:
             except Exception as e:
                 raise Exception(f"Error in chunk creation: {str(e)}")
 
-            await document_collection().update_one(
-                {"_id": ObjectId(doc_id)},
-                {
-                    "$set": {
-                        "current_stage": "TEXT_CHUNKS_CREATION_COMPLETED",
-                        "updated_at": datetime.now(),
-                    },
-                    "$push": {
-                        "status_history": {
-                            "stage": "TEXT_CHUNKS_CREATION_COMPLETED",
-                            "status": "completed",
-                            "timestamp": datetime.now(),
-                            "error_message": None,
-                            "retry_count": 0
-                        }
-                    }
-                }
-            )
+            await transition(doc_id, "TEXT_CHUNKS_CREATION_COMPLETED", history={"tag_stats": tag_result["stats"]})
             # Save to ChromaDB
             try:
-                self.save_to_chroma(chunks)
+                embeddings = await self.embed_chunks(chunks)
+                await asyncio.to_thread(self.save_to_chroma, chunks, embeddings)
                 logging.info(f"Successfully stored chunks in ChromaDB")
             except Exception as e:
                 raise Exception(f"Error saving to ChromaDB: {str(e)}")
@@ -668,41 +681,20 @@ class PDFProcessor:
             try:
 
                 #Create BM25 corpus with smaller chunks
-                texts, bm25_corpus = self.create_bm25_corpus(processed_pages, chunk_size=50, overlap=10)
-                bm25, texts, tokenized_corpus = self.build_bm25(texts)
-                self.save_bm25_index(doc_id, bm25, texts, bm25_corpus, save_dir=BM25_STORE)
+                texts, bm25_corpus = await asyncio.to_thread(self.create_bm25_corpus, processed_pages, 50, 10)
+                bm25, texts, tokenized_corpus = await asyncio.to_thread(self.build_bm25, texts)
+                # Runs in the ingestion worker: only write the pickle, the API process
+                # picks it up through bm25_index.maybe_sync
+                await asyncio.to_thread(self.save_bm25_index, doc_id, bm25, texts, bm25_corpus, BM25_STORE)
                 logging.info(f"BM25 index created for {folder_path}")
 
             except Exception as e:
                 logging.error(f"Failed to save BM25 index for {folder_path}: {e}")
 
-            await document_collection().update_one(
-                {"_id": ObjectId(doc_id)},
-                {
-                    "$set": {
-                        "current_stage": "VECTORS_STORED",
-                        "updated_at": datetime.now(),
-                    },
-                    "$push": {
-                        "status_history": {
-                            "stage": "VECTORS_STORED",
-                            "status": "completed",
-                            "timestamp": datetime.now(),
-                            "error_message": None,
-                            "retry_count": 0
-                        }
-                    }
-                }
-            )
-            
-            await rabbitmq_client.send_message(
-                settings.NOTIFY_QUEUE,
-                json.dumps({
-                    "event_type": "document_notify",
-                    "doc_id": doc_id,
-                    "user_id": user_id,
-                })
-            )
+            # New chunks are searchable now; drop cached scores/embeddings for this corpus
+            bump_corpus_version(category)
+
+            await transition(doc_id, "VECTORS_STORED", user_id)
             
             # Update indexed files set
             self.indexed_files.add(folder_path)
@@ -716,6 +708,20 @@ class PDFProcessor:
             logging.error(f"Error indexing {folder_path}: {str(e)}")
             raise
 
+    def remove_document(self, doc_id: str):
+        """
+        Remove a document's chunks from Chroma and its BM25 pickle, and drop it from
+        this process's BM25 index. Blocking. Chunks indexed before chunks carried
+        doc_id cannot be matched and stay until the collection is rebuilt.
+        """
+        self.vector_store.run(lambda store: store.delete(where={"doc_id": str(doc_id)}))
+        try:
+            os.remove(os.path.join(BM25_STORE, f"bm25_index_{doc_id}.pkl"))
+        except FileNotFoundError:
+            pass
+        bm25_index.remove_document(str(doc_id))
+        logging.info(f"Removed chunks of {doc_id} from Chroma and BM25")
+
     def _save_indexed_files(self):
         """Save the set of indexed files to a persistent storage."""
         try:
@@ -730,16 +736,8 @@ class PDFProcessor:
         """Setup the retrieval QA system using Ollama."""
  
         try:
-            # Use existing vectorstore if available, otherwise create new one
-            if self.vectorstore is None:
-                self.vectorstore = Chroma(
-                    collection_name="rag-chroma",
-                    embedding_function=self.embedding_model,
-                    persist_directory=self.persist_directory
-                )
-
             # Create retriever
-            retriever = self.vectorstore.as_retriever(
+            retriever = self.vector_store.get().as_retriever(
                 search_kwargs={"k": 3}
             )
 
@@ -813,179 +811,222 @@ class PDFProcessor:
 
 
 
-    async def ask_question(self, user_id: str, question: str, model_name: str = "gemma3:4b") -> dict:
+    def _chroma_search(self, question: str, category_filter: str) -> List[Document]:
+        """Blocking Chroma retrieval: MMR first, falling back to plain similarity search."""
+        retrieved_docs = []
         try:
-            # === Step 1: Load Config & User Info ===
-
-            existing_user = await organization_user_collection().find_one({"_id": ObjectId(user_id)})
-            organization_id = existing_user.get("organization_id")
-            config = await get_updated_app_config(organization_id)
-
-            model_name = config.get("llm_model", model_name)
-            embedding_model = config.get("embedding_model", "sentence-transformers/all-MiniLM-L6-v2")
-            temperature = config.get("temperature", 0.7)
-            query_model = config.get("query_model", "qwen3:8b")  # 'chroma', 'bm25', or 'hybrid'
-            tags_model = config.get("tags_model", "phi4-mini:3.8b")
-            category_id = existing_user.get("category_id", None)
-            user_category = "unknown"
-            if category_id:
-                category_doc = await category_collection().find_one({"_id": ObjectId(category_id)})
-                user_category = category_doc.get("name", "unknown") if category_doc else "unknown"
-            
-            print("=== User & Config Info ===")
-            print("User ID:", user_id)
-            print("Organization ID:", organization_id)
-            print("Model Name:", model_name)
-            print("Embedding Model:", embedding_model)
-            print("Query Model:" ,query_model)
-            print("Tags Model:", tags_model)
-            print("Temperature:", temperature)
-            print("User Category:", user_category)
-
-            metadata_query_result = [w for w in word_tokenize(question.lower()) if w not in stop_words]
-
-            # === Step 2: Chroma Retrieval ===
-            vectorstore = Chroma(
-                collection_name="rag-chroma",
-                embedding_function=self.embedding_model,
-                persist_directory=self.persist_directory,
-            )
-
-            retrieved_docs = []
-            category_filter = user_category.strip().lower()
-
-            # Try MMR first, fallback to similarity_search, then to unfiltered similarity
+            retrieved_docs = self.vector_store.run(lambda store: store.max_marginal_relevance_search(
+                question,
+                k=10,
+                fetch_k=50,
+                lambda_mult=0.5,
+                filter={"category": category_filter},
+            ))
+        except Exception as e:
+            logging.warning(f"MMR failed: {str(e)}; falling back to similarity_search with filter")
             try:
-                retrieved_docs = vectorstore.max_marginal_relevance_search(
+                retrieved_docs = self.vector_store.run(lambda store: store.similarity_search(
                     question,
                     k=10,
-                    fetch_k=50,
-                    lambda_mult=0.5,
-                    filter={"category": category_filter},
-                )
-            except Exception as e:
-                logging.warning(f"MMR failed: {str(e)}; falling back to similarity_search with filter")
-                try:
-                    retrieved_docs = vectorstore.similarity_search(
-                        question,
-                        k=10,
-                        filter={"category": category_filter}
-                    )
-                except Exception as e2:
-                    logging.warning(f"Similarity search with filter failed: {str(e2)}; trying unfiltered similarity_search")
-            # Debug: log count and types
-            logging.debug(f"Retrieved {len(retrieved_docs) if hasattr(retrieved_docs,'__len__') else 'N/A'} chroma docs")
-
-            # Ensure we have Document-like objects before using filter_chunks_by_keywords
-            if not isinstance(retrieved_docs, list):
-                retrieved_docs = list(retrieved_docs)
-
-            filtered_chunks = self.filter_chunks_by_keywords(retrieved_docs, metadata_query_result)
-            # convert to dicts (convert_doc_to_dict expects a Document object)
-            chroma_dicts = []
-            for doc in filtered_chunks:
-                try:
-                    chroma_dicts.append(convert_doc_to_dict(doc))
-                except Exception:
-                    # doc already a dict-like object
-                    if isinstance(doc, dict):
-                        chroma_dicts.append({
-                            "text": doc.get("page_content") or doc.get("text") or "",
-                            "metadata": doc.get("metadata", {}),
-                            "chunk_id": doc.get("metadata", {}).get("chunk_id"),
-                            "score": None
-                        })
-            chroma_dicts = [convert_doc_to_dict(doc) for doc in filtered_chunks]
-
-            # === Step 3: BM25 Retrieval ===
-            bm25_dicts = run_bm25_keyword_search(metadata_query_result, user_category.strip().lower(),user_id=user_id)
-           
+                    filter={"category": category_filter}
+                ))
+            except Exception as e2:
+                logging.warning(f"Similarity search with filter failed: {str(e2)}")
+        logging.debug(f"Retrieved {len(retrieved_docs) if hasattr(retrieved_docs,'__len__') else 'N/A'} chroma docs")
+        return retrieved_docs
+
+    def _rerank_and_merge(
+        self, question: str, chroma_dicts: List[Dict], bm25_dicts: List[Dict], score_cache: Optional[Dict] = None
+    ) -> List[Dict]:
+        """
+        Blocking cross-encoder stage: merge both sources, drop duplicate chunks,
+        then score every unique (question, chunk) pair once in a single batched pass.
+        score_cache is the request's memo of pairs already scored.
+        """
+        combined_chunks = deduplicate_chunks(chroma_dicts + bm25_dicts)
+        return rerank_results(question, combined_chunks, top_k=10, score_cache=score_cache)
+
+    async def _load_user_context(self, user_id: str, model_name: str) -> Dict:
+        """Resolve the user's organization, category and the org's LLM settings."""
+        resolved = await get_user_context(user_id, with_category=True, with_config=True)
+        organization_id = resolved["organization_id"]
+        config = resolved["app_config"]
+
+        model_name = config.get("llm_model", model_name)
+        embedding_model = config.get("embedding_model", "sentence-transformers/all-MiniLM-L6-v2")
+        temperature = config.get("temperature", 0.7)
+        query_model = config.get("query_model", "qwen3:8b")  # 'chroma', 'bm25', or 'hybrid'
+        tags_model = config.get("tags_model", "phi4-mini:3.8b")
+        user_category = resolved["category_name"]
+        
+        print("=== User & Config Info ===")
+        print("User ID:", user_id)
+        print("Organization ID:", organization_id)
+        print("Model Name:", model_name)
+        print("Embedding Model:", embedding_model)
+        print("Query Model:" ,query_model)
+        print("Tags Model:", tags_model)
+        print("Temperature:", temperature)
+        print("User Category:", user_category)
+
+        return {
+            "organization_id": organization_id,
+            "model_name": model_name,
+            "temperature": temperature,
+            "user_category": user_category,
+        }
+
+    async def _prepare_answer(self, user_id: str, question: str, user_context: Dict, rerank_memo: Optional[Dict] = None) -> Dict:
+        """
+        Retrieve and rerank context for the question and build the LLM request.
+        rerank_memo is the per-request memo of (question, chunk) scores.
+        Returns {"model_name", "temperature", "prompt", "sources", "scope"}, or
+        {"result": ...} when there is nothing to send to the LLM.
+        """
+        model_name = user_context["model_name"]
+        temperature = user_context["temperature"]
+        user_category = user_context["user_category"]
 
-            # === Step 4: Rerank & Merge ===
-            reranked_chroma = rerank_results(question, chroma_dicts, top_k=10)
-            reranked_bm25 = rerank_results(question, bm25_dicts, top_k=10)
-
-            combined_chunks = deduplicate_chunks(reranked_chroma + reranked_bm25)
-            top_ranked_chunks = rerank_results(question, combined_chunks, top_k=10)
-            # print("-------------------------------------------------------------------------------------------")
-            # print("=== Reranked Chroma Chunks ===")
-            # print("-------------------------------------------------------------------------------------------")
-            # for i in reranked_chroma:
-            #     print("Reranked Chroma:", i.get("rerank_score"), i.get("metadata"), i.get("text"))
-            # print("-------------------------------------------------------------------------------------------")
-            # print("=== Reranked BM25 ===")
-            # print("-------------------------------------------------------------------------------------------")
-            # for i in reranked_bm25:
-            #     print("Reranked BM25:", i.get("rerank_score"), i.get("metadata", {}), i.get("text"))
-            # print("-------------------------------------------------------------------------------------------")
-            # print("=== Final Combined Chunks ===")
-            # print("-------------------------------------------------------------------------------------------")
-            # for i in top_ranked_chunks:
-            #     print("Final:", i.get("rerank_score"), i.get("metadata", {}), i.get("text"))
-
-            if not top_ranked_chunks:
-                # return a clearer message or include a status field,
-                # so the frontend can distinguish "no context" vs. final answer.
-                return {"answer": "No relevant context found. Try broadening your query or re-ingesting documents.", "sources": [], "status": "no_context"}
-            
-            # Enforce access control: only include PRIVATE_DRIVE chunks owned by querying user
-            visible_chunks = []
-            for chunk in top_ranked_chunks:
-                meta = chunk.get("metadata", {}) if isinstance(chunk, dict) else getattr(chunk, "metadata", {}) or {}
-                source_type = meta.get("source_type", "")
-                if source_type == "PRIVATE_DRIVE" or source_type == "private_drive":
-                    if meta.get("user_id") == user_id:
-                        visible_chunks.append(chunk)
-                else:
-                    visible_chunks.append(chunk)
+        metadata_query_result = [w for w in word_tokenize(question.lower()) if w not in stop_words]
 
-                    
+        # === Step 2 & 3: Chroma + BM25 Retrieval (off the event loop) ===
+        category_filter = user_category.strip().lower()
+        retrieved_docs, bm25_dicts = await asyncio.gather(
+            run_in_stage("retrieval", self._chroma_search, question, category_filter),
+            run_in_stage("retrieval", run_bm25_keyword_search, metadata_query_result, category_filter, user_id=user_id),
+        )
 
-            # === Step 5: Format Context ===
-            context = "\n\n".join([format_chunk_for_context(chunk) for chunk in visible_chunks])
-            print("-------------------------------------------------------------------------------------------")
-            print("=== Final Context for LLM ===")
-            print("-------------------------------------------------------------------------------------------")
-            print(context)
+        # Ensure we have Document-like objects before using filter_chunks_by_keywords
+        if not isinstance(retrieved_docs, list):
+            retrieved_docs = list(retrieved_docs)
 
-            # === Step 6: Query LLM ===
-            prompt = f"""
-            You must answer ONLY using information from the Context Chunks below.
-            If a detail is not directly present in the provided context, reply:
-            "Not enough information in the provided context."
-            STRICT RULES:
-            - Do NOT use prior knowledge
-            - Do NOT guess or assume
-            - Do NOT add features not explicitly stated in the context
-            Context:
-            {context}
-            Question:
-            {question}
-            Your Answer:
-            """
+        filtered_chunks = self.filter_chunks_by_keywords(retrieved_docs, metadata_query_result)
+        # convert to dicts (convert_doc_to_dict expects a Document object)
+        chroma_dicts = [convert_doc_to_dict(doc) for doc in filtered_chunks]
+
+        # === Step 4: Rerank & Merge ===
+        top_ranked_chunks = await run_in_stage(
+            "rerank", self._rerank_and_merge, question, chroma_dicts, bm25_dicts, rerank_memo
+        )
+        # print("-------------------------------------------------------------------------------------------")
+        # print("=== Reranked Chroma Chunks ===")
+        # print("-------------------------------------------------------------------------------------------")
+        # for i in reranked_chroma:
+        #     print("Reranked Chroma:", i.get("rerank_score"), i.get("metadata"), i.get("text"))
+        # print("-------------------------------------------------------------------------------------------")
+        # print("=== Reranked BM25 ===")
+        # print("-------------------------------------------------------------------------------------------")
+        # for i in reranked_bm25:
+        #     print("Reranked BM25:", i.get("rerank_score"), i.get("metadata", {}), i.get("text"))
+        # print("-------------------------------------------------------------------------------------------")
+        # print("=== Final Combined Chunks ===")
+        # print("-------------------------------------------------------------------------------------------")
+        # for i in top_ranked_chunks:
+        #     print("Final:", i.get("rerank_score"), i.get("metadata", {}), i.get("text"))
+
+        if not top_ranked_chunks:
+            # return a clearer message or include a status field,
+            # so the frontend can distinguish "no context" vs. final answer.
+            return {"result": {"answer": "No relevant context found. Try broadening your query or re-ingesting documents.", "sources": [], "status": "no_context"}}
+        
+        # Enforce access control: only include PRIVATE_DRIVE chunks owned by querying user
+        visible_chunks = []
+        uses_private_chunks = False
+        for chunk in top_ranked_chunks:
+            meta = chunk.get("metadata", {}) if isinstance(chunk, dict) else getattr(chunk, "metadata", {}) or {}
+            source_type = meta.get("source_type", "")
+            if source_type == "PRIVATE_DRIVE" or source_type == "private_drive":
+                if meta.get("user_id") == user_id:
+                    visible_chunks.append(chunk)
+                    uses_private_chunks = True
+            else:
+                visible_chunks.append(chunk)
 
-            response = ollama.chat(
-                model=model_name,
-                messages=[{"role": "user", "content": prompt}],
-                options={"temperature": temperature},
                 
+
+        # === Step 5: Format Context ===
+        context = "\n\n".join([format_chunk_for_context(chunk) for chunk in visible_chunks])
+        print("-------------------------------------------------------------------------------------------")
+        print("=== Final Context for LLM ===")
+        print("-------------------------------------------------------------------------------------------")
+        print(context)
+
+        # === Step 6: Query LLM ===
+        prompt = f"""
+        You must answer ONLY using information from the Context Chunks below.
+        If a detail is not directly present in the provided context, reply:
+        "Not enough information in the provided context."
+        STRICT RULES:
+        - Do NOT use prior knowledge
+        - Do NOT guess or assume
+        - Do NOT add features not explicitly stated in the context
+        Context:
+        {context}
+        Question:
+        {question}
+        Your Answer:
+        """
+
+        return {
+            "model_name": model_name,
+            "temperature": temperature,
+            "prompt": prompt,
+            "sources": format_sources(visible_chunks[:3]),
+            # Answers that used the user's private chunks must not be shared with others
+            "scope": user_scope(user_id) if uses_private_chunks else SHARED_SCOPE,
+        }
+
+    async def _lookup_cached_answer(self, user_id: str, question: str, user_context: Dict) -> Dict:
+        """
+        Embed the (expanded) question and look it up in the semantic answer cache.
+        Returns {"result": cached result or None, "embedding", "version"}; the corpus
+        version is read before retrieval so an answer is never stored under a newer one.
+        """
+        if not settings.ANSWER_CACHE_ENABLED:
+            return {"result": None}
+        category = user_context["user_category"].strip().lower()
+        version = get_corpus_version(category)
+        embedding = await run_in_stage("retrieval", self.embedding_model.embed_query, question)
+        result = answer_cache.lookup(str(user_context["organization_id"]), category, user_id, embedding)
+        return {"result": result, "embedding": embedding, "version": version}
+
+    def _remember_answer(self, question: str, user_context: Dict, cache_lookup: Dict, prepared: Dict, result: Dict):
+        if "embedding" not in cache_lookup or not result.get("answer"):
+            return
+        answer_cache.store(
+            str(user_context["organization_id"]),
+            user_context["user_category"].strip().lower(),
+            prepared["scope"],
+            question,
+            cache_lookup["embedding"],
+            cache_lookup["version"],
+            result,
+        )
+
+    async def ask_question(self, user_id: str, question: str, model_name: str = "gemma3:4b") -> dict:
+        try:
+            user_context = await self._load_user_context(user_id, model_name)
+            cache_lookup = await self._lookup_cached_answer(user_id, question, user_context)
+            if cache_lookup["result"] is not None:
+                return cache_lookup["result"]
+
+            # One rerank memo per request
+            prepared = await self._prepare_answer(user_id, question, user_context, rerank_memo={})
+            if "result" in prepared:
+                return prepared["result"]
+
+            response = await chat_completion(
+                model=prepared["model_name"],
+                messages=[{"role": "user", "content": prepared["prompt"]}],
+                options={"temperature": prepared["temperature"]},
             )
 
             # === Step 7: Return Answer & Sources ===
             result = {
                 "answer": response.get("message", {}).get("content", "").strip(),
-                "sources": [],
+                "sources": prepared["sources"],
             }
-
-            for chunk in visible_chunks[:3]:
-                metadata = chunk.get("metadata", {})
-                source = str(metadata.get("source", "Unknown")).replace("\\", "/")
-                result["sources"].append({
-                    "file": source.split("/")[-1],
-                    "content": chunk.get("text", ""),
-                    "category": metadata.get("category", "unknown"),
-                })
-
+            self._remember_answer(question, user_context, cache_lookup, prepared, result)
             return result
 
         except Exception as e:
@@ -996,6 +1037,57 @@ class PDFProcessor:
                 "error": str(e),
             }
 
+    async def ask_question_stream(self, user_id: str, question: str, model_name: str = "gemma3:4b") -> AsyncIterator[Dict]:
+        """
+        Streaming variant of ask_question.
+        Yields {"type": "token", "content": ...} as Ollama generates, then one
+        {"type": "done", "answer": ..., "sources": ...} event with the full answer.
+        If generation fails midway, the done event carries the text already streamed
+        plus "error"; a failed answer is never cached.
+        """
+        answer_parts = []
+        try:
+            user_context = await self._load_user_context(user_id, model_name)
+            cache_lookup = await self._lookup_cached_answer(user_id, question, user_context)
+            if cache_lookup["result"] is not None:
+                yield {"type": "token", "content": cache_lookup["result"]["answer"]}
+                yield {"type": "done", **cache_lookup["result"]}
+                return
+
+            # One rerank memo per request
+            prepared = await self._prepare_answer(user_id, question, user_context, rerank_memo={})
+            if "result" in prepared:
+                yield {"type": "done", **prepared["result"]}
+                return
+
+            async for part in chat_completion_stream(
+                model=prepared["model_name"],
+                messages=[{"role": "user", "content": prepared["prompt"]}],
+                options={"temperature": prepared["temperature"]},
+            ):
+                token = part.get("message", {}).get("content", "")
+                if token:
+                    answer_parts.append(token)
+                    yield {"type": "token", "content": token}
+
+            result = {
+                "answer": "".join(answer_parts).strip(),
+                "sources": prepared["sources"],
+            }
+            self._remember_answer(question, user_context, cache_lookup, prepared, result)
+            yield {"type": "done", **result}
+
+        except Exception as e:
+            logging.error(f"Error in streaming question answering: {str(e)}")
+            # Keep what the client already saw rather than replacing it with the apology
+            partial_answer = "".join(answer_parts).strip()
+            yield {
+                "type": "done",
+                "answer": partial_answer or "I apologize, but I encountered an error while processing your question. Please try again.",
+                "sources": [],
+                "error": str(e),
+            }
+
 
     def search_similar(self, query: str, n_results: int = 3):
         """
@@ -1006,13 +1098,7 @@ class PDFProcessor:
                 n_results (int): Number of results to return
         """
         try:
-            vectorstore = Chroma(
-                collection_name="rag-chroma",
-                embedding_function=self.embedding_model,
-                persist_directory=self.persist_directory
-            )
-
-            results = vectorstore.similarity_search_with_score(query, k=n_results)
+            results = self.vector_store.run(lambda store: store.similarity_search_with_score(query, k=n_results))
             # print("Resultant Chunks ----------------------",results)
             formatted_results = []
             for doc, score in results:
@@ -1033,74 +1119,24 @@ processor = PDFProcessor()
 
 
 
-def run_bm25_keyword_search(query: List[str], category: str, user_id: str = None, bm25_dir="./app/pipeline/bm25_store", top_n: int = 10) -> List[Dict]:
+def run_bm25_keyword_search(query: List[str], category: str, user_id: str = None, bm25_dir=BM25_STORE, top_n: int = 10) -> List[Dict]:
     """
-    Performs BM25 keyword search across all saved indexes.
-    Returns top-N dicts strictly from the requested category.
+    Performs BM25 keyword search against the resident BM25 index.
+    Returns the global top-N dicts strictly from the requested category.
     Filters PRIVATE_DRIVE chunks by user_id (only owner can see them).
     
     Args:
         query: list of query tokens
         category: user's category filter
         user_id: current user id (for PRIVATE_DRIVE access control)
-        bm25_dir: directory of BM25 indexes
+        bm25_dir: directory of per-document BM25 pickles backing the index
         top_n: number of top results to return
     """
-    results = []
     print(f"Running BM25 keyword search for query: {query}, category: {category}, user_id: {user_id}")
 
-    if not os.path.isdir(bm25_dir):
-        print(f"BM25 directory not found: {bm25_dir}")
-        return []
-
-    query_tokens = [q.lower() for q in query]
-
-    for filename in os.listdir(bm25_dir):
-        if not filename.endswith(".pkl"):
-            continue
-
-        file_path = os.path.join(bm25_dir, filename)
-        try:
-            with open(file_path, "rb") as f:
-                data = pickle.load(f)
-                bm25 = data["bm25"]
-                corpus = data["corpus"]  # [{text, category, user_id, source_type}, ...]
-
-            # Filter by category
-            filtered_corpus = [c for c in corpus if c.get("category") == category]
-            if not filtered_corpus:
-                continue
-            # Apply access control: exclude PRIVATE_DRIVE chunks not owned by user
-            for c in filtered_corpus:
-                if c.get("source_type") == "private_drive":
-                    if c.get("user_id") != user_id:
-                        print(f"Excluding PRIVATE_DRIVE chunk for user {user_id}")
-                        print(f"Excluded Chunk: {c}")
-                        filtered_corpus.remove(c)
-            
-            filtered_texts = [c["text"] for c in filtered_corpus]
-
-            # Run BM25 on filtered texts
-            top_results = bm25.get_top_n(query_tokens, filtered_texts, n=top_n)
-
-            # Convert back into dicts (with metadata preserved)
-            for t in top_results:
-                match = next((c for c in filtered_corpus if c["text"] == t), None)
-                if match:
-                    results.append({
-                        "text": t,
-                        "metadata": {
-                            "category": match.get("category", "unknown"),
-                            "source": match.get("source", "unknown"),
-                            "user_id": match.get("user_id", "unknown"),
-                            "source_type": match.get("source_type", "unknown")
-                        }
-                    })
-
-        except Exception as e:
-            print(f"Failed to process BM25 index for {filename}: {e}")
-
-    return results
+    # Picks up documents indexed by other processes (the ingestion workers)
+    bm25_index.maybe_sync(bm25_dir, interval=settings.BM25_SYNC_INTERVAL)
+    return bm25_index.search(query, category, user_id=user_id, top_n=top_n)
 
 def convert_doc_to_dict(doc):
     return {
@@ -1112,17 +1148,31 @@ def convert_doc_to_dict(doc):
 
 import hashlib
 
+def chunk_text_hash(text: str) -> str:
+    return hashlib.md5(text.strip().encode("utf-8")).hexdigest()
+
 def deduplicate_chunks(chunks: List[Dict]) -> List[Dict]:
     seen_hashes = set()
     unique = []
     for chunk in chunks:
-        text = chunk.get("text", "").strip()
-        hash_val = hashlib.md5(text.encode("utf-8")).hexdigest()
+        hash_val = chunk_text_hash(chunk.get("text", ""))
         if hash_val not in seen_hashes:
             seen_hashes.add(hash_val)
             unique.append(chunk)
     return unique
 
+def format_sources(chunks: List[Dict]) -> List[Dict]:
+    sources = []
+    for chunk in chunks:
+        metadata = chunk.get("metadata", {})
+        source = str(metadata.get("source", "Unknown")).replace("\\", "/")
+        sources.append({
+            "file": source.split("/")[-1],
+            "content": chunk.get("text", ""),
+            "category": metadata.get("category", "unknown"),
+        })
+    return sources
+
 def format_chunk_for_context(chunk: dict) -> str:
     metadata = chunk.get("metadata", {})
     chunk_id = chunk.get("chunk_id", "N/A")
@@ -1140,19 +1190,49 @@ def format_chunk_for_context(chunk: dict) -> str:
 
 
 
-def rerank_results(query: str, chunks: List[Dict], top_k: int = 3) -> List[Dict]:
+def rerank_results(
+    query: str,
+    chunks: List[Dict],
+    top_k: int = 3,
+    score_cache: Optional[Dict] = None,
+    batch_size: Optional[int] = None,
+) -> List[Dict]:
     """
     Reranks chunks using a cross-encoder model based on relevance to the query.
-    Filters out chunks below min_score if specified.
+    Pairs already present in score_cache (the per-request memo) or in the process-wide
+    rerank_score_cache are not scored again; the rest go through reranker_model.predict
+    in one batched call.
     """
     if not chunks:
         return []
 
-    pairs = [(query, chunk["text"]) for chunk in chunks]
-    scores = reranker_model.predict(pairs)
+    score_cache = score_cache if score_cache is not None else {}
+
+    keys = [rerank_cache_key(query, chunk["text"]) for chunk in chunks]
+    pending = {}
+    for key, chunk in zip(keys, chunks):
+        if key not in score_cache and key not in pending:
+            pending[key] = chunk["text"]
+
+    if pending:
+        cached = rerank_score_cache.get_many(RERANKER_MODEL_NAME, list(pending))
+        score_cache.update(cached)
+        for key in cached:
+            del pending[key]
+
+    if pending:
+        pairs = [(query, text) for text in pending.values()]
+        scores = reranker_model.predict(
+            pairs,
+            batch_size=batch_size or settings.RERANK_BATCH_SIZE,
+            show_progress_bar=False,
+        )
+        for key, score in zip(pending, scores):
+            score_cache[key] = float(score)
+            rerank_score_cache.set(RERANKER_MODEL_NAME, key, float(score))
 
-    for i, score in enumerate(scores):
-        chunks[i]["rerank_score"] = float(score)
+    for key, chunk in zip(keys, chunks):
+        chunk["rerank_score"] = score_cache[key]
 
     sorted_chunks = sorted(chunks, key=lambda x: x["rerank_score"], reverse=True)
 
@@ -1265,8 +1345,9 @@ async def main():
     try:
         await connect_to_mongodb()
         await ensure_models_available()
-        global processor
-        processor = PDFProcessor()
+        # The module-level processor already holds the models; don't load a second copy
+        # Load the resident BM25 index once at startup
+        bm25_index.sync_from_disk(BM25_STORE)
         # Initialize ChromaDB and other components if needed
         logging.info("PDFProcessor initialized successfully")
     except Exception as e:
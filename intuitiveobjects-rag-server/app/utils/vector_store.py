@@ -0,0 +1,134 @@
+import os
+import logging
+import threading
+import uuid
+import weakref
+from typing import Callable, List, TypeVar
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+PERSIST_DIRECTORY = "chromadb_storage"
+COLLECTION_NAME = "rag-chroma"
+
+T = TypeVar("T")
+
+# Every live manager in this process, so a collection reset can invalidate them all
+_managers: "weakref.WeakSet[VectorStoreManager]" = weakref.WeakSet()
+
+
+def _is_stale_handle(error: Exception) -> bool:
+    """True when Chroma reports that the collection behind a cached handle is gone."""
+    name = type(error).__name__
+    message = str(error).lower()
+    return name in ("NotFoundError", "InvalidCollectionException") or "does not exist" in message
+
+
+class VectorStoreManager:
+    """
+    Long-lived, thread-safe handle on the Chroma collection.
+
+    The store is opened lazily on first use and reused afterwards, so the
+    SQLite/HNSW persistence and the embedding function are bound once per
+    process instead of once per query.
+    """
+
+    def __init__(
+        self,
+        embedding_function,
+        persist_directory: str = PERSIST_DIRECTORY,
+        collection_name: str = COLLECTION_NAME,
+    ):
+        self.embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self._store = None
+        self._lock = threading.Lock()
+        self._opens = 0
+        self._reuses = 0
+        self._invalidations = 0
+        _managers.add(self)
+
+    def get(self) -> Chroma:
+        """Return the shared store, opening it if needed."""
+        store = self._store
+        if store is not None:
+            with self._lock:
+                self._reuses += 1
+            return store
+
+        with self._lock:
+            if self._store is None:
+                os.makedirs(self.persist_directory, exist_ok=True)
+                self._store = Chroma(
+                    collection_name=self.collection_name,
+                    embedding_function=self.embedding_function,
+                    persist_directory=self.persist_directory,
+                )
+                self._opens += 1
+                logger.info(
+                    f"Opened Chroma collection '{self.collection_name}' at {self.persist_directory} "
+                    f"(opens={self._opens})"
+                )
+            else:
+                self._reuses += 1
+            return self._store
+
+    def invalidate(self):
+        """Drop the cached handle; the next call to get() reopens the collection."""
+        with self._lock:
+            if self._store is not None:
+                self._invalidations += 1
+            self._store = None
+
+    def run(self, operation: Callable[[Chroma], T]) -> T:
+        """
+        Run operation against the shared store.
+        If the collection was reset underneath us (e.g. by another process),
+        reopen once and retry.
+        """
+        try:
+            return operation(self.get())
+        except Exception as e:
+            if not _is_stale_handle(e):
+                raise
+            logger.warning(f"Chroma handle is stale ({e}); reopening collection")
+            self.invalidate()
+            return operation(self.get())
+
+    def add_documents_with_embeddings(self, documents: List[Document], embeddings: List[List[float]]) -> List[str]:
+        """
+        Upsert documents with precomputed vectors; ids and metadata follow Chroma.add_documents
+        (document id when set, a new uuid otherwise). Returns the ids.
+        """
+        ids = [doc.id or str(uuid.uuid4()) for doc in documents]
+
+        def upsert(store: Chroma):
+            # Chroma.add_documents always re-embeds; write to the chromadb collection the
+            # shared store already holds, so there is one client per process
+            store._collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                metadatas=[doc.metadata or None for doc in documents],
+                documents=[doc.page_content for doc in documents],
+            )
+
+        self.run(upsert)
+        return ids
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "collection": self.collection_name,
+                "open": self._store is not None,
+                "opens": self._opens,
+                "reuses": self._reuses,
+                "invalidations": self._invalidations,
+            }
+
+
+def invalidate_all_vector_stores():
+    """Invalidate every manager in this process (called after a collection reset)."""
+    for manager in list(_managers):
+        manager.invalidate()
@@ -99,16 +99,21 @@ from app.db.mongodb import (
     get_fs
 )
 from app.core.rabbitmq_client import rabbitmq_client
+from app.core.worker_runtime import WorkerRuntime
 from app.core.config import settings
 import asyncio
 import aio_pika
 import json
 from bson import ObjectId
-from docling.document_converter import DocumentConverter
+from app.pipeline.docling_converter import DoclingConverterPool
+from app.services.document_lifecycle import transition
 from datetime import datetime
 import os
 from pathlib import Path
 
+# Created once per worker process; models are loaded in main() before consuming
+converter_pool = DoclingConverterPool()
+
 async def upload_markdown_to_gridfs(doc_id: str, filename: str, content: bytes):
     gridfs_id = await get_fs().upload_from_stream(
         filename,
@@ -130,6 +135,7 @@ async def on_message(message: aio_pika.IncomingMessage):
         
         # check if doc id present or not
         if not doc_id:
+            await message.ack()
             return
         
         #fetch document details
@@ -137,12 +143,14 @@ async def on_message(message: aio_pika.IncomingMessage):
 
         # Check if document exists
         if not doc:
+            await message.ack()
             return
 
         # get gridfs raw file id
         raw_gridfs_id = doc.get("raw_gridfs_id")
 
         if not raw_gridfs_id:
+            await message.ack()
             return
 
         #fetch raw file from grids
@@ -159,8 +167,7 @@ async def on_message(message: aio_pika.IncomingMessage):
             f.write(file_bytes)
 
         # Convert to Markdown
-        converter = DocumentConverter()
-        result = converter.convert(temp_path)
+        result = await converter_pool.convert(temp_path)
 
         if result and result.document:
             md_filename = original_filename.rsplit(".", 1)[0] + ".md"
@@ -177,33 +184,7 @@ async def on_message(message: aio_pika.IncomingMessage):
             print(f"Uploaded Markdown to GridFS with id: {gridfs_id}")
 
             # Update status
-            await organization_file_collection().update_one(
-                {"_id": ObjectId(doc_id)},
-                {
-                    "$set": {
-                        "current_stage": "FILE_TO_MD_CONVERTED",
-                        "updated_at": datetime.now(),
-                    },
-                    "$push": {
-                        "status_history": {
-                            "stage": "FILE_TO_MD_CONVERTED",
-                            "status": "completed",
-                            "timestamp": datetime.now(),
-                            "error_message": None,
-                            "retry_count": 0
-                        }
-                    }
-                }
-            )
-
-            await rabbitmq_client.send_message(
-                settings.NOTIFY_QUEUE,
-                json.dumps({
-                    "event_type": "document_notify",
-                    "doc_id": doc_id,
-                    "user_id": user_id,
-                })
-            )
+            await transition(doc_id, "FILE_TO_MD_CONVERTED", user_id)
         else:
             print(f"Conversion failed for: {temp_path}")
 
@@ -216,9 +197,11 @@ async def on_message(message: aio_pika.IncomingMessage):
 async def main():
     await connect_to_mongodb()
     await rabbitmq_client.connect()
-    await rabbitmq_client.channel.set_qos(prefetch_count=1)
-    await rabbitmq_client.consume_message(settings.FILE_PROCESSING_CHANNEL, on_message)
-    await asyncio.Future()
+    await converter_pool.warm_up()
+    health = await converter_pool.health_check()
+    print(f"Docling converter health check: {health}")
+    runtime = WorkerRuntime(settings.FILE_PROCESSING_CHANNEL, on_message, slots=settings.DOCUMENT_WORKER_SLOTS)
+    await runtime.run_forever()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,6 @@
+import os
+
+# app.core.config reads these at import time; the unit tests never connect to them
+os.environ.setdefault("RABBITMQ_HOST", "localhost")
+os.environ.setdefault("RABBITMQ_PORT", "5672")
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
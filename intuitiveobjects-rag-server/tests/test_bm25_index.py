@@ -0,0 +1,120 @@
+import math
+import os
+import pickle
+import time
+import pytest
+from app.pipeline.keyword_search.bm25_index import BM25Index, BM25_FILE_PREFIX, BM25_FILE_SUFFIX
+
+
+def chunk(text, category="finance", source_type="LOCAL_DRIVE", user_id="alice", source="doc.md"):
+    return {"text": text, "category": category, "source_type": source_type, "user_id": user_id, "source": source}
+
+
+@pytest.fixture
+def index():
+    return BM25Index(tokenizer=str.split)
+
+
+def texts(results):
+    return [r["text"] for r in results]
+
+
+def test_scores_match_bm25_formula(index):
+    index.add_document("d1", [chunk("apple banana"), chunk("banana cherry cherry")])
+
+    results = index.search(["cherry"], "finance")
+
+    # Single matching chunk: idf = ln((N - df + 0.5) / (df + 0.5) + 1), tf = 2, len = avgdl * 6/5
+    n, df, tf, length, avgdl = 2, 1, 2, 3, 2.5
+    idf = math.log((n - df + 0.5) / (df + 0.5) + 1)
+    norm = 1.5 * (1 - 0.75 + 0.75 * length / avgdl)
+    assert texts(results) == ["banana cherry cherry"]
+    assert results[0]["score"] == pytest.approx(idf * tf * 2.5 / (tf + norm))
+
+
+def test_more_matches_rank_higher(index):
+    index.add_document("d1", [chunk("tax report"), chunk("tax tax report summary"), chunk("unrelated text")])
+
+    assert texts(index.search(["tax"], "finance")) == ["tax tax report summary", "tax report"]
+
+
+def test_search_is_limited_to_the_category(index):
+    index.add_document("d1", [chunk("budget plan", category="finance")])
+    index.add_document("d2", [chunk("budget plan", category="hr")])
+
+    results = index.search(["budget"], "HR ")
+
+    assert [r["metadata"]["category"] for r in results] == ["hr"]
+
+
+def test_private_chunks_are_only_returned_to_their_owner(index):
+    index.add_document("shared", [chunk("salary bands", source_type="LOCAL_DRIVE", user_id="alice")])
+    index.add_document("private", [chunk("salary review", source_type="PRIVATE_DRIVE", user_id="bob")])
+
+    assert texts(index.search(["salary"], "finance", user_id="alice")) == ["salary bands"]
+    assert sorted(texts(index.search(["salary"], "finance", user_id="Bob"))) == ["salary bands", "salary review"]
+
+
+def test_equal_scores_come_back_in_a_stable_order(index):
+    index.add_document("d1", [chunk(f"term filler{i}") for i in range(6)])
+
+    first = texts(index.search(["term"], "finance", top_n=3))
+
+    assert first == ["term filler0", "term filler1", "term filler2"]
+    assert texts(index.search(["term"], "finance", top_n=3)) == first
+
+
+def test_remove_document_drops_its_chunks_and_partition(index):
+    index.add_document("d1", [chunk("alpha")])
+    index.add_document("d2", [chunk("alpha", category="legal")])
+
+    index.remove_document("d2")
+
+    assert index.search(["alpha"], "legal") == []
+    assert index.stats()["partitions"] == {"finance/local_drive": 1}
+
+
+def test_replacing_a_document_does_not_double_count(index):
+    index.add_document("d1", [chunk("alpha beta")])
+    index.add_document("d1", [chunk("alpha gamma")])
+
+    assert index.stats()["chunks"] == 1
+    assert texts(index.search(["beta"], "finance")) == []
+    assert texts(index.search(["gamma"], "finance")) == ["alpha gamma"]
+
+
+def test_empty_query_or_index_returns_nothing(index):
+    assert index.search(["anything"], "finance") == []
+    index.add_document("d1", [chunk("alpha")])
+    assert index.search([], "finance") == []
+    assert index.search(["alpha"], "finance", top_n=0) == []
+
+
+def _write_pickle(store_dir, doc_id, corpus):
+    path = os.path.join(store_dir, f"{BM25_FILE_PREFIX}{doc_id}{BM25_FILE_SUFFIX}")
+    with open(path, "wb") as f:
+        pickle.dump({"corpus": corpus}, f)
+    return path
+
+
+def test_sync_from_disk_loads_and_drops_pickles(index, tmp_path):
+    path = _write_pickle(tmp_path, "d1", [chunk("ledger entry")])
+    index.sync_from_disk(str(tmp_path))
+    assert texts(index.search(["ledger"], "finance")) == ["ledger entry"]
+
+    os.remove(path)
+    index.sync_from_disk(str(tmp_path))
+    assert index.search(["ledger"], "finance") == []
+
+
+def test_maybe_sync_reloads_in_the_background_once(index, tmp_path):
+    _write_pickle(tmp_path, "d1", [chunk("ledger entry")])
+
+    index.maybe_sync(str(tmp_path), interval=0)
+    # A second caller inside the same interval neither blocks nor starts another reload
+    index.maybe_sync(str(tmp_path), interval=60)
+
+    deadline = time.monotonic() + 5
+    while index.stats()["documents"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert texts(index.search(["ledger"], "finance")) == ["ledger entry"]
@@ -0,0 +1,125 @@
+import pytest
+from app.utils import cache
+from app.utils.cache import (
+    ModelCache,
+    SemanticAnswerCache,
+    SHARED_SCOPE,
+    bump_corpus_version,
+    get_corpus_version,
+    rerank_cache_key,
+    user_scope,
+)
+
+
+@pytest.fixture(autouse=True)
+def version_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CORPUS_VERSION_DIR", str(tmp_path))
+    return tmp_path
+
+
+def result(answer):
+    return {"answer": answer, "sources": [{"source": f"{answer}.md"}]}
+
+
+def test_version_is_zero_before_any_bump():
+    assert get_corpus_version() == "0"
+    assert get_corpus_version("Finance") == "0:0"
+
+
+def test_bumping_a_category_also_bumps_the_corpus():
+    corpus, finance, hr = get_corpus_version(), get_corpus_version("finance"), get_corpus_version("hr")
+
+    bump_corpus_version("Finance ")
+
+    assert get_corpus_version() != corpus
+    assert get_corpus_version("finance") != finance
+    # Other categories only change in their corpus-wide part
+    assert get_corpus_version("hr").split(":")[1] == hr.split(":")[1]
+
+
+def test_version_markers_are_written_atomically(version_dir):
+    bump_corpus_version("finance")
+
+    assert sorted(p.suffix for p in version_dir.iterdir()) == [".version", ".version"]
+
+
+def test_model_cache_clears_on_corpus_change():
+    model_cache = ModelCache("test", maxsize=10, ttl=60, version_check_interval=0)
+    model_cache.get("m", "warm-up")
+    model_cache.set("m", "key", 1.5)
+    assert model_cache.get("m", "key") == 1.5
+
+    bump_corpus_version("finance")
+
+    assert model_cache.get("m", "key") is None
+    assert model_cache.stats()["invalidations"] == 1
+
+
+def test_corpus_independent_cache_survives_corpus_change():
+    model_cache = ModelCache("test", maxsize=10, ttl=60, version_check_interval=0, corpus_dependent=False)
+    model_cache.set("m", "key", [0.1])
+
+    bump_corpus_version()
+
+    assert model_cache.get("m", "key") == [0.1]
+
+
+def test_model_cache_keys_include_the_model():
+    model_cache = ModelCache("test", maxsize=10, ttl=60)
+    model_cache.set("model-a", "key", 1)
+
+    assert model_cache.get_many("model-b", ["key"]) == {}
+    assert model_cache.stats()["misses"] == 1
+
+
+def test_rerank_key_ignores_whitespace():
+    assert rerank_cache_key("what  is\nBM25?", "some  text") == rerank_cache_key("what is BM25?", "some text")
+
+
+@pytest.fixture
+def answers():
+    return SemanticAnswerCache(maxsize=10, ttl=60, threshold=0.9)
+
+
+def test_similar_question_is_served_from_cache(answers):
+    version = get_corpus_version("finance")
+    answers.store("org", "finance", SHARED_SCOPE, "What is the budget?", [1.0, 0.0], version, result("budget"))
+
+    assert answers.lookup("org", "finance", "alice", [0.99, 0.05]) == result("budget")
+    assert answers.lookup("org", "finance", "alice", [0.0, 1.0]) is None
+    assert answers.stats()["hits"] == 1
+
+
+def test_lookup_is_bucketed_by_organization_and_category(answers):
+    version = get_corpus_version("finance")
+    answers.store("org", "finance", SHARED_SCOPE, "q", [1.0, 0.0], version, result("a"))
+
+    assert answers.lookup("other-org", "finance", "alice", [1.0, 0.0]) is None
+    assert answers.lookup("org", "hr", "alice", [1.0, 0.0]) is None
+
+
+def test_private_answers_are_only_served_to_their_owner(answers):
+    version = get_corpus_version("finance")
+    answers.store("org", "finance", user_scope("bob"), "my salary?", [1.0, 0.0], version, result("private"))
+
+    assert answers.lookup("org", "finance", "alice", [1.0, 0.0]) is None
+    assert answers.lookup("org", "finance", "bob", [1.0, 0.0]) == result("private")
+
+
+def test_best_match_wins_across_scopes(answers):
+    version = get_corpus_version("finance")
+    answers.store("org", "finance", SHARED_SCOPE, "shared", [1.0, 0.3], version, result("shared"))
+    answers.store("org", "finance", user_scope("bob"), "own", [1.0, 0.0], version, result("own"))
+
+    assert answers.lookup("org", "finance", "bob", [1.0, 0.0]) == result("own")
+
+
+def test_answers_go_stale_when_the_category_changes(answers):
+    version = get_corpus_version("finance")
+    answers.store("org", "finance", SHARED_SCOPE, "q", [1.0, 0.0], version, result("a"))
+
+    bump_corpus_version("finance")
+
+    assert answers.lookup("org", "finance", "alice", [1.0, 0.0]) is None
+    assert answers.stats()["stale_evictions"] == 1
+    assert answers.stats()["size"] == 0
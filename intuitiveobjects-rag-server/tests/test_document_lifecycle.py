@@ -0,0 +1,156 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from app.services import document_lifecycle
+from app.services.document_lifecycle import status_entry, transition
+
+DOC_ID = "65f000000000000000000001"
+
+
+def evaluate(expr, doc):
+    """Evaluate the aggregation operators transition() uses against an in-memory document."""
+    if isinstance(expr, str) and expr.startswith("$"):
+        value = doc
+        for part in expr[1:].split("."):
+            if isinstance(value, list):
+                value = [item.get(part) for item in value]
+            else:
+                value = (value or {}).get(part)
+        return value
+    if isinstance(expr, list):
+        return [evaluate(item, doc) for item in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if len(expr) == 1:
+        op, args = next(iter(expr.items()))
+        if op == "$literal":
+            return args
+        if op == "$ifNull":
+            value = evaluate(args[0], doc)
+            return evaluate(args[1], doc) if value is None else value
+        if op == "$concatArrays":
+            return [item for array in evaluate(args, doc) for item in array]
+        if op == "$arrayElemAt":
+            array, index = evaluate(args, doc)
+            return array[index] if array else None
+        if op == "$subtract":
+            left, right = evaluate(args, doc)
+            if left is None or right is None:
+                return None
+            # Date minus date is milliseconds in MongoDB
+            return int((left - right) / timedelta(milliseconds=1))
+    return {key: evaluate(value, doc) for key, value in expr.items()}
+
+
+class FakeCollection:
+    def __init__(self, doc):
+        self.doc = doc
+        self.calls = []
+
+    async def find_one_and_update(self, filter, pipeline, return_document=None):
+        self.calls.append((filter, pipeline))
+        if self.doc is None or filter["_id"] != self.doc["_id"]:
+            return None
+        for stage in pipeline:
+            updates = {key: evaluate(value, self.doc) for key, value in stage["$set"].items()}
+            self.doc.update(updates)
+        return self.doc
+
+
+@pytest.fixture
+def events(monkeypatch):
+    published = []
+
+    async def publish(event):
+        published.append(event)
+
+    monkeypatch.setattr(document_lifecycle, "publish_notification", publish)
+    return published
+
+
+def use_collection(monkeypatch, doc):
+    collection = FakeCollection(doc)
+    monkeypatch.setattr(document_lifecycle, "document_collection", lambda: collection)
+    return collection
+
+
+def record(**extra):
+    started = datetime.now() - timedelta(seconds=2)
+    return {
+        "_id": ObjectId(DOC_ID),
+        "filename": "report.pdf",
+        "current_stage": "RAW_FILE_UPLOADED",
+        "status_history": [status_entry("RAW_FILE_UPLOADED", timestamp=started)],
+        **extra,
+    }
+
+
+def test_transition_appends_a_history_entry_with_duration(monkeypatch, events):
+    collection = use_collection(monkeypatch, record())
+
+    doc = asyncio.run(transition(DOC_ID, "MD_CONVERSION_JOB_QUEUED"))
+
+    assert collection.calls[0][0] == {"_id": ObjectId(DOC_ID)}
+    assert doc["current_stage"] == "MD_CONVERSION_JOB_QUEUED"
+    entry = doc["status_history"][-1]
+    assert entry["stage"] == "MD_CONVERSION_JOB_QUEUED"
+    assert entry["status"] == "completed"
+    assert entry["retry_count"] == 0
+    assert entry["timestamp"] == doc["updated_at"]
+    assert 1900 <= entry["duration_ms"] <= 10000
+    assert len(doc["status_history"]) == 2
+
+
+def test_first_transition_has_no_duration(monkeypatch, events):
+    use_collection(monkeypatch, record(status_history=None))
+
+    doc = asyncio.run(transition(DOC_ID, "RAW_FILE_UPLOADED"))
+
+    assert [entry["stage"] for entry in doc["status_history"]] == ["RAW_FILE_UPLOADED"]
+    assert doc["status_history"][0]["duration_ms"] is None
+
+
+def test_values_are_stored_literally(monkeypatch, events):
+    collection = use_collection(monkeypatch, record())
+
+    doc = asyncio.run(transition(
+        DOC_ID, "Processing_Failed", status="failed", error_message="$bad path",
+        fields={"tags": ["$money"], "meta": {"$gt": 1}}, history={"worker": "md"},
+    ))
+
+    update = collection.calls[0][1][0]["$set"]
+    assert update["tags"] == {"$literal": ["$money"]}
+    assert doc["tags"] == ["$money"]
+    assert doc["meta"] == {"$gt": 1}
+    entry = doc["status_history"][-1]
+    assert (entry["status"], entry["error_message"], entry["worker"]) == ("failed", "$bad path", "md")
+
+
+def test_notification_carries_the_serialized_document(monkeypatch, events):
+    use_collection(monkeypatch, record())
+
+    asyncio.run(transition(DOC_ID, "MD_FILE_UPLOADED", "user-1"))
+
+    assert len(events) == 1
+    event = events[0]
+    assert (event["event_type"], event["doc_id"], event["user_id"]) == ("document_notify", DOC_ID, "user-1")
+    assert event["document"]["id"] == DOC_ID
+    assert event["document"]["current_stage"] == "MD_FILE_UPLOADED"
+    assert isinstance(event["document"]["status_history"][-1]["timestamp"], str)
+
+
+def test_no_notification_without_user_or_when_disabled(monkeypatch, events):
+    use_collection(monkeypatch, record())
+
+    asyncio.run(transition(DOC_ID, "MD_FILE_UPLOADED"))
+    asyncio.run(transition(DOC_ID, "MD_FILE_UPLOADED", "user-1", notify=False))
+
+    assert events == []
+
+
+def test_missing_document_returns_none(monkeypatch, events):
+    use_collection(monkeypatch, None)
+
+    assert asyncio.run(transition(DOC_ID, "MD_FILE_UPLOADED", "user-1")) is None
+    assert events == []
@@ -0,0 +1,163 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from app.core import notification_hub
+from app.core.notification_hub import NotificationHub, user_room
+
+DOC_A = "65f000000000000000000001"
+DOC_B = "65f000000000000000000002"
+
+
+class FakeSio:
+    def __init__(self):
+        self.rooms = []
+        self.emitted = []
+
+    async def enter_room(self, sid, room):
+        self.rooms.append((sid, room))
+
+    async def emit(self, event, data, room=None):
+        self.emitted.append((event, data, room))
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = {str(doc["_id"]): doc for doc in docs}
+        self.queries = []
+
+    def find(self, query):
+        self.queries.append(query)
+        ids = {str(_id) for _id in query["_id"]["$in"]}
+        return FakeCursor([doc for doc_id, doc in self.docs.items() if doc_id in ids])
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    collection = FakeCollection([
+        {"_id": ObjectId(DOC_A), "filename": "a.pdf", "current_stage": "MD_FILE_UPLOADED"},
+        {"_id": ObjectId(DOC_B), "filename": "b.pdf", "current_stage": "RAW_FILE_UPLOADED"},
+    ])
+    monkeypatch.setattr(notification_hub, "document_collection", lambda: collection)
+    return collection
+
+
+def run(coro_fn):
+    """Run a test body inside an event loop, since the hub schedules its flush as a task."""
+    return asyncio.run(coro_fn())
+
+
+def test_clients_join_their_user_room():
+    async def body():
+        hub = NotificationHub(FakeSio(), window_ms=0)
+        await hub.add_client("alice", "sid-1")
+        await hub.add_client("alice", "sid-2")
+        assert hub.sio.rooms == [("sid-1", user_room("alice")), ("sid-2", user_room("alice"))]
+        assert hub.remove_client("sid-1") == "alice"
+        assert hub.is_online("alice")
+        assert hub.remove_client("sid-2") == "alice"
+        assert not hub.is_online("alice")
+        assert hub.remove_client("unknown") is None
+
+    run(body)
+
+
+def test_offline_users_are_skipped_without_db_reads(collection):
+    async def body():
+        hub = NotificationHub(FakeSio(), window_ms=0)
+        hub.document_event("bob", DOC_A)
+        hub.document_event(None, DOC_A)
+        await hub.flush()
+        assert hub.sio.emitted == []
+        assert collection.queries == []
+        assert hub.stats()["skipped_offline"] == 2
+
+    run(body)
+
+
+def test_events_for_the_same_document_are_coalesced(collection):
+    async def body():
+        hub = NotificationHub(FakeSio(), window_ms=0)
+        await hub.add_client("alice", "sid-1")
+        hub.document_event("alice", DOC_A, {"id": DOC_A, "current_stage": "RAW_FILE_UPLOADED"})
+        hub.document_event("alice", DOC_A, {"id": DOC_A, "current_stage": "MD_FILE_UPLOADED"})
+        await hub.flush()
+        assert hub.sio.emitted == [
+            ("document_notify", {"id": DOC_A, "current_stage": "MD_FILE_UPLOADED"}, user_room("alice")),
+        ]
+        assert collection.queries == []
+        assert hub.stats()["coalesced"] == 1
+
+    run(body)
+
+
+def test_payloadless_event_keeps_the_earlier_payload(collection):
+    async def body():
+        hub = NotificationHub(FakeSio(), window_ms=0)
+        await hub.add_client("alice", "sid-1")
+        hub.document_event("alice", DOC_A, {"id": DOC_A})
+        hub.document_event("alice", DOC_A)
+        await hub.flush()
+        assert [data for _, data, _ in hub.sio.emitted] == [{"id": DOC_A}]
+        assert collection.queries == []
+
+    run(body)
+
+
+def test_missing_payloads_are_read_in_one_query(collection):
+    async def body():
+        hub = NotificationHub(FakeSio(), window_ms=0)
+        await hub.add_client("alice", "sid-1")
+        await hub.add_client("carol", "sid-2")
+        hub.document_event("alice", DOC_A)
+        hub.document_event("alice", DOC_B)
+        hub.document_event("carol", DOC_A)
+        await hub.flush()
+        assert len(collection.queries) == 1
+        emitted = sorted((room, data["id"], data["filename"]) for _, data, room in hub.sio.emitted)
+        assert emitted == [
+            (user_room("alice"), DOC_A, "a.pdf"),
+            (user_room("alice"), DOC_B, "b.pdf"),
+            (user_room("carol"), DOC_A, "a.pdf"),
+        ]
+        assert hub.stats()["db_reads"] == 1
+
+    run(body)
+
+
+def test_users_who_disconnect_before_the_flush_get_nothing(collection):
+    async def body():
+        hub = NotificationHub(FakeSio(), window_ms=0)
+        await hub.add_client("alice", "sid-1")
+        hub.document_event("alice", DOC_A)
+        hub.remove_client("sid-1")
+        await hub.flush()
+        assert hub.sio.emitted == []
+        assert collection.queries == []
+
+    run(body)
+
+
+def test_flush_is_scheduled_after_the_window(collection):
+    async def body():
+        hub = NotificationHub(FakeSio(), window_ms=20)
+        await hub.add_client("alice", "sid-1")
+        hub.document_event("alice", DOC_A, {"id": DOC_A})
+        hub.document_event("alice", DOC_B, {"id": DOC_B})
+        assert hub.sio.emitted == []
+        await hub._flush_task
+        assert sorted(data["id"] for _, data, _ in hub.sio.emitted) == [DOC_A, DOC_B]
+        assert hub.stats()["emitted"] == 2
+
+    run(body)
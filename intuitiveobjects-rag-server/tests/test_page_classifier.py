@@ -0,0 +1,120 @@
+import os
+import fitz
+import pytest
+from app.pipeline.page_classifier import (
+    ROUTE_DOCLING,
+    ROUTE_PYMUPDF,
+    classify_page,
+    extract_page_features,
+    summarize_routing,
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "tables")
+
+THRESHOLDS = {
+    "max_blocks": 40,
+    "max_wide_blocks": 8,
+    "min_text_chars": 20,
+    "max_image_area_ratio": 0.5,
+    "max_vector_lines": 150,
+}
+
+
+def features(**overrides):
+    base = {
+        "text_chars": 1200,
+        "block_count": 6,
+        "wide_blocks": 2,
+        "image_count": 0,
+        "image_area_ratio": 0.0,
+        "vector_lines": 0,
+        "table_count": 0,
+        "needs_ocr": False,
+    }
+    base.update(overrides)
+    return base
+
+
+def test_plain_text_page_goes_to_pymupdf():
+    assert classify_page(features(), THRESHOLDS) == {"route": ROUTE_PYMUPDF, "reasons": []}
+
+
+@pytest.mark.parametrize("overrides, reason", [
+    ({"needs_ocr": True, "text_chars": 0}, "ocr"),
+    ({"text_chars": 5}, "no_text"),
+    ({"table_count": 1}, "table"),
+    ({"image_count": 1, "image_area_ratio": 0.8}, "images"),
+    ({"block_count": 41}, "dense_blocks"),
+    ({"wide_blocks": 9}, "row_layout"),
+    ({"vector_lines": 151}, "vector_graphics"),
+])
+def test_each_feature_routes_to_docling(overrides, reason):
+    assert classify_page(features(**overrides), THRESHOLDS) == {"route": ROUTE_DOCLING, "reasons": [reason]}
+
+
+def test_small_images_and_limits_stay_on_pymupdf():
+    page = features(image_count=2, image_area_ratio=0.5, block_count=40, wide_blocks=8, vector_lines=150)
+
+    assert classify_page(page, THRESHOLDS)["route"] == ROUTE_PYMUPDF
+
+
+def test_ocr_is_reported_instead_of_no_text_and_reasons_accumulate():
+    page = features(needs_ocr=True, text_chars=0, table_count=2, vector_lines=400)
+
+    assert classify_page(page, THRESHOLDS)["reasons"] == ["ocr", "table", "vector_graphics"]
+
+
+def _page(build):
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    build(page)
+    return doc, page
+
+
+def test_features_of_a_text_page():
+    doc, page = _page(lambda p: p.insert_text((72, 72), "Quarterly revenue grew in every region."))
+
+    result = extract_page_features(page)
+    doc.close()
+
+    assert result["text_chars"] == len("Quarterly revenue grew in every region.")
+    assert result["block_count"] == 1
+    assert (result["image_count"], result["vector_lines"], result["table_count"]) == (0, 0, 0)
+    assert result["needs_ocr"] is False
+
+
+def test_painted_page_without_text_needs_ocr():
+    doc, page = _page(lambda p: p.draw_rect(fitz.Rect(50, 50, 300, 300)))
+
+    result = extract_page_features(page)
+    doc.close()
+
+    assert result["needs_ocr"] is True
+    assert classify_page(result, THRESHOLDS)["reasons"] == ["ocr"]
+
+
+def test_table_page_is_routed_to_docling():
+    doc = fitz.open(os.path.join(FIXTURES, "invoice.pdf"))
+    result = extract_page_features(doc[0])
+    doc.close()
+
+    assert result["table_count"] >= 1
+    assert len(result["table_bboxes"]) == result["table_count"]
+    assert "table" in classify_page(result, THRESHOLDS)["reasons"]
+
+
+def test_summarize_routing_counts_pages_and_timings():
+    summary = summarize_routing([
+        {"route": ROUTE_PYMUPDF, "reasons": [], "convert_ms": 10.0},
+        {"route": ROUTE_PYMUPDF, "reasons": [], "convert_ms": 20.25},
+        {"route": ROUTE_DOCLING, "reasons": ["table", "images"], "convert_ms": 900.0},
+        {"route": None, "reasons": ["table"]},
+    ])
+
+    assert summary["pages"] == 4
+    assert summary["routes"] == {
+        ROUTE_PYMUPDF: {"pages": 2, "total_ms": 30.2, "avg_ms": 15.1},
+        ROUTE_DOCLING: {"pages": 1, "total_ms": 900.0, "avg_ms": 900.0},
+        "failed": {"pages": 1, "total_ms": 0.0, "avg_ms": 0.0},
+    }
+    assert summary["reasons"] == {"table": 2, "images": 1}
@@ -0,0 +1,83 @@
+from app.pipeline.section_tracker import SectionTracker, extractive_summary, parse_headings
+
+
+def test_parse_headings_returns_levels_and_clean_titles():
+    markdown = "\n".join([
+        "# **Annual Report** #",
+        "Intro text",
+        "## _Revenue_",
+        "#NotAHeading",
+        "### `Q1` results ###",
+    ])
+
+    assert parse_headings(markdown) == [(1, "Annual Report"), (2, "Revenue"), (3, "Q1 results")]
+
+
+def test_parse_headings_skips_fenced_code_and_empty_titles():
+    markdown = "\n".join([
+        "```python",
+        "# a comment, not a heading",
+        "```",
+        "## **",
+        "~~~",
+        "## also code",
+        "~~~",
+        "## Real",
+    ])
+
+    assert parse_headings(markdown) == [(2, "Real")]
+
+
+def test_extractive_summary_skips_headings_tables_and_fences():
+    markdown = "\n".join([
+        "# Title",
+        "| a | b |",
+        "First sentence. Second sentence!",
+        "```",
+        "Third sentence?",
+    ])
+
+    assert extractive_summary(markdown) == "First sentence. Second sentence! Third sentence?"
+
+
+def test_extractive_summary_stops_at_sentence_boundaries():
+    markdown = "One two three. Four five six. Seven eight nine."
+
+    assert extractive_summary(markdown, max_chars=30) == "One two three. Four five six."
+    assert extractive_summary("x" * 50, max_chars=10) == "x" * 10
+
+
+def test_extractive_summary_of_an_empty_page():
+    assert extractive_summary("# Only a heading\n| table |") == "Content available"
+
+
+def test_tracker_before_any_heading_is_untitled():
+    assert SectionTracker().current() == {"title": "Untitled", "section_title": "Untitled"}
+
+
+def test_headings_build_a_hierarchy_across_pages():
+    tracker = SectionTracker()
+
+    tracker.observe_headings([(1, "Chapter 1"), (2, "Setup")])
+    assert tracker.current(["Chapter 1", "Setup"]) == {"title": "Chapter 1 > Setup", "section_title": "Setup"}
+
+    # A headingless page stays in the open section
+    tracker.observe_headings([])
+    assert tracker.current() == {"title": "Chapter 1 > Setup", "section_title": "Setup"}
+
+    tracker.observe_headings([(3, "Details"), (2, "Usage")])
+    assert tracker.current(["Details", "Usage"]) == {"title": "Chapter 1 > Usage", "section_title": "Usage"}
+
+    tracker.observe_headings([(1, "Chapter 2")])
+    assert tracker.current() == {"title": "Chapter 2", "section_title": "Chapter 2"}
+
+
+def test_inferred_titles_replace_the_current_section():
+    tracker = SectionTracker()
+    tracker.observe_titles(["Overview"])
+    assert tracker.stack == [(1, "Overview")]
+
+    tracker.observe_headings([(1, "Chapter"), (2, "Part A")])
+    tracker.observe_titles(["Part B"])
+
+    assert tracker.current(["Part B"]) == {"title": "Chapter > Part B", "section_title": "Part B"}
@@ -0,0 +1,49 @@
+import json
+import shutil
+from pathlib import Path
+import fitz
+import pytest
+from app.pipeline.table_detection import detect_tables
+from app.pipeline.benchmark_table_detection import run_benchmark
+
+FIXTURES = Path(__file__).parent / "fixtures" / "tables"
+LABELS = FIXTURES / "labels.json"
+
+
+def _labelled_pages():
+    labels = json.loads(LABELS.read_text())
+    for pdf_path in sorted(FIXTURES.glob("*.pdf")):
+        with fitz.open(pdf_path) as pdf_doc:
+            for page_index in range(len(pdf_doc)):
+                yield pdf_path.name, page_index + 1, page_index + 1 in labels[pdf_path.name]
+
+
+@pytest.mark.parametrize("name,page_number,has_table", list(_labelled_pages()))
+def test_pymupdf_detector_matches_labels(name, page_number, has_table):
+    with fitz.open(FIXTURES / name) as pdf_doc:
+        result = detect_tables(pdf_doc[page_number - 1])
+    assert result["has_table"] == has_table
+    assert bool(result["bboxes"]) == has_table
+
+
+def test_single_rules_and_boxes_are_not_tables():
+    # memo.pdf has a header rule and a boxed signature: 1-row / 1-cell grids
+    with fitz.open(FIXTURES / "memo.pdf") as pdf_doc:
+        assert detect_tables(pdf_doc[0]) == {"has_table": False, "bboxes": []}
+
+
+def test_benchmark_scores_pymupdf_against_labels():
+    pytest.importorskip("tabula")
+    if shutil.which("java") is None:
+        pytest.skip("tabula needs a Java runtime")
+
+    report = run_benchmark(str(FIXTURES), str(LABELS))
+
+    assert report["reference"] == "labels"
+    assert report["pages"] == 5
+    assert report["pymupdf"]["accuracy"] == 1.0
+    # Both detectors find every labelled table; tabula's stream mode may also flag
+    # plain text pages, so the new detector must be at least as accurate
+    assert report["tabula"]["recall"] == 1.0
+    assert report["pymupdf"]["recall"] == report["tabula"]["recall"]
+    assert report["pymupdf"]["accuracy"] >= report["tabula"]["accuracy"]
@@ -0,0 +1,80 @@
+from app.pipeline.tag_extraction import (
+    UNKNOWN,
+    build_page_windows,
+    group_pages_by_file,
+    merge_tag_votes,
+    normalize_tags,
+)
+
+
+def pages(*texts):
+    return [{"text": text, "source": f"store/doc/page_{i + 1}.md"} for i, text in enumerate(texts)]
+
+
+def test_normalize_tags_splits_comma_separated_entries():
+    assert normalize_tags(["author, date", " title ", ",", ""]) == ["author", "date", "title"]
+    assert normalize_tags(None) == []
+
+
+def test_pages_are_grouped_by_their_folder():
+    grouped = group_pages_by_file([
+        {"source": "store/a/page_1.md"},
+        {"source": "store/b/page_1.md"},
+        {"source": "store/a/page_2.md"},
+    ])
+
+    assert {key: len(value) for key, value in grouped.items()} == {"store/a": 2, "store/b": 1}
+
+
+def test_consecutive_pages_are_packed_into_windows():
+    windows = build_page_windows(pages("aaaa", "bbbb", "", "cccc"), max_chars=10, max_windows=5)
+
+    assert windows == ["aaaa\n\nbbbb", "cccc"]
+
+
+def test_long_pages_are_cut_to_the_window_size():
+    windows = build_page_windows(pages("x" * 25, "short"), max_chars=10, max_windows=5)
+
+    assert windows == ["x" * 10, "short"]
+
+
+def test_extra_windows_are_sampled_evenly_keeping_the_first():
+    texts = [f"page{i}" for i in range(10)]
+
+    windows = build_page_windows(pages(*texts), max_chars=5, max_windows=4)
+
+    assert windows == ["page0", "page3", "page6", "page9"]
+    assert build_page_windows(pages(*texts), max_chars=5, max_windows=1) == ["page0"]
+
+
+def test_empty_document_has_no_windows():
+    assert build_page_windows(pages("", "   "), max_chars=100, max_windows=3) == []
+
+
+def test_majority_value_wins_ignoring_case_and_whitespace():
+    merged = merge_tag_votes(
+        [{"author": "Jane  Doe"}, {"author": "jane doe"}, {"author": "John Roe"}],
+        ["author"],
+    )
+
+    # The first spelling of the winning value is kept
+    assert merged == {"author": "Jane  Doe"}
+
+
+def test_unknown_never_beats_a_real_value():
+    merged = merge_tag_votes(
+        [{"date": UNKNOWN}, {"date": UNKNOWN}, {"date": "2024-03-01"}, {}],
+        ["date", "title"],
+    )
+
+    assert merged == {"date": "2024-03-01", "title": UNKNOWN}
+
+
+def test_ties_go_to_the_earliest_window():
+    merged = merge_tag_votes([{"title": "Draft"}, {"title": "Final"}, {"title": " "}], ["title"])
+
+    assert merged == {"title": "Draft"}
+
+
+def test_non_string_values_are_stringified():
+    assert merge_tag_votes([{"year": 2024}, {"year": "2024"}], ["year"]) == {"year": "2024"}